@@ -0,0 +1,122 @@
+# benchmarks/bench_excel_writer.py
+"""
+Confronto writer Excel: pandas.ExcelWriter + loop Alignment (storico) contro ExcelStreamWriter.
+
+Uso (dalla cartella del plugin):
+    python benchmarks/bench_excel_writer.py            # 1k, 10k, 100k righe
+    python benchmarks/bench_excel_writer.py 1000 5000
+
+Ogni caso gira in un processo separato, così il picco RSS (ru_maxrss) non è sporcato dai casi precedenti.
+"""
+import os
+import sys
+import json
+import time
+import subprocess
+import tempfile
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+REQUIRED_KEYS = [
+    "Chapter/Paragraph  No.",
+    "Chapter/Paragraph Title",
+    "Requirement/Standard Description",
+    "Required Data / Configuration",
+    "Regulatory References",
+]
+EXTRA_EMPTY_COLUMNS = [
+    "Attached Documentation",
+    "Value / Design Choice",
+    "Designer Notes",
+    "Risk Assessment",
+    "Mitigation Measures",
+    "Compliant (YES/NO)",
+]
+FINAL_COLUMNS = REQUIRED_KEYS + EXTRA_EMPTY_COLUMNS
+
+
+def _synthetic_rows(n: int) -> list[dict]:
+    rows = []
+    for i in range(n):
+        clause = f"{i // 400 + 1}.{i // 20 % 20 + 1}.{i % 20 + 1}"
+        rows.append({
+            "Chapter/Paragraph No.": clause,
+            "Chapter/Paragraph Title": f"Requirements group {i // 20}",
+            "Requirement/Standard Description": (
+                f"The appliance shall be constructed so that requirement {i} is met "
+                "under normal operating conditions, as verified by inspection and test. " * 3
+            ),
+            "Required Data / Configuration": "Test method as per 8.1" if i % 3 == 0 else "",
+            "Regulatory References": "8.1, Annex B" if i % 5 == 0 else "",
+        })
+    return rows
+
+
+def _legacy_writer(rows, file_path):
+    # Implementazione storica (pandas.ExcelWriter + formattazione cella per cella), riportata qui come baseline
+    import pandas as pd
+    from openpyxl.styles import Alignment
+    from openpyxl.utils import get_column_letter
+    from legacy_export import normalize_rows_to_dataframe
+
+    df = normalize_rows_to_dataframe(rows, FINAL_COLUMNS)
+    with pd.ExcelWriter(file_path, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name="Sheet1")
+        ws = writer.sheets["Sheet1"]
+        for col_idx in range(1, ws.max_column + 1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = 60 if col_idx == 3 else 20
+        for row in ws.iter_rows(min_row=1, max_row=ws.max_row, min_col=1, max_col=ws.max_column):
+            for cell in row:
+                cell.alignment = Alignment(
+                    horizontal=(cell.alignment.horizontal if cell.alignment else None),
+                    vertical="top",
+                    wrap_text=True
+                )
+
+
+def _stream_writer(rows, file_path):
+    from legacy_export import normalize_rows_and_write_excel
+
+    normalize_rows_and_write_excel(rows, FINAL_COLUMNS, file_path)
+
+
+WRITERS = {"legacy": _legacy_writer, "stream": _stream_writer}
+
+
+def _run_case(writer: str, n: int) -> dict:
+    import resource
+
+    sys.path.insert(0, PLUGIN_DIR)
+    rows = _synthetic_rows(n)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "out.xlsx")
+        t0 = time.perf_counter()
+        WRITERS[writer](rows, path)
+        seconds = time.perf_counter() - t0
+        size = os.path.getsize(path)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"writer": writer, "rows": n, "seconds": round(seconds, 3), "peak_rss_mb": round(peak_kb / 1024, 1), "bytes": size}
+
+
+def main(argv: list[str]) -> None:
+    if argv[:1] == ["--case"]:
+        print(json.dumps(_run_case(argv[1], int(argv[2]))))
+        return
+
+    sizes = [int(a) for a in argv] or [1_000, 10_000, 100_000]
+    results = []
+    for n in sizes:
+        for writer in WRITERS:
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--case", writer, str(n)],
+                capture_output=True, text=True, check=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"{'rows':>8} {'writer':>8} {'seconds':>9} {'peak RSS MB':>12} {'bytes':>10}")
+    for r in results:
+        print(f"{r['rows']:>8} {r['writer']:>8} {r['seconds']:>9.3f} {r['peak_rss_mb']:>12.1f} {r['bytes']:>10}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,91 @@
+# benchmarks/bench_export.py
+"""
+Export delle righe per formato (xlsx, csv, jsonl, parquet): tempo di scrittura, dimensione del file
+e picco RSS, a partire dallo stesso RowStore (stesse colonne FINAL_COLUMNS, righe già de-duplicate).
+
+Uso (dalla cartella del plugin):
+    python benchmarks/bench_export.py                  # 50k righe, tutti i formati
+    python benchmarks/bench_export.py 10000 200000 --formats csv parquet
+
+Ogni formato gira in un processo separato: il picco RSS (ru_maxrss) è quello del solo export
+(sopra la base del processo con lo store già pieno). Parquet richiede pyarrow.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FORMATS = ["xlsx", "csv", "jsonl", "parquet"]
+
+
+def _run_case(fmt: str, n: int) -> dict:
+    import resource
+    import importlib
+
+    sys.path.insert(0, BENCH_DIR)
+    from stub_cat import load_plugin, PLUGIN_PACKAGE
+    from bench_excel_writer import FINAL_COLUMNS, _synthetic_rows
+
+    load_plugin()
+    helpers = importlib.import_module(f"{PLUGIN_PACKAGE}.helpers")
+    exporters = importlib.import_module(f"{PLUGIN_PACKAGE}.exporters")
+    RowStore = importlib.import_module(f"{PLUGIN_PACKAGE}.row_store").RowStore
+
+    if fmt == "parquet" and not exporters.parquet_available():
+        return {"format": fmt, "rows": n, "error": "pyarrow non installato"}
+
+    store = RowStore(helpers.RowSchema(FINAL_COLUMNS))
+    store.add_many(_synthetic_rows(n))
+    base_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        res = exporters.export_rows(store.iter_values, FINAL_COLUMNS, os.path.join(tmp, "out"), [fmt])[fmt]
+        seconds = time.perf_counter() - t0
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "format": fmt,
+        "rows": res.get("rows", 0),
+        "seconds": round(seconds, 3),
+        "mb": round(res.get("bytes", 0) / 1024 / 1024, 2),
+        "export_rss_mb": round((peak_kb - base_kb) / 1024, 1),
+        "error": res.get("error"),
+    }
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("sizes", type=int, nargs="*", default=[50_000])
+    parser.add_argument("--formats", nargs="+", default=FORMATS, choices=FORMATS)
+    parser.add_argument("--case", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        print(json.dumps(_run_case(args.case[0], int(args.case[1]))))
+        return
+
+    results = []
+    for n in args.sizes:
+        for fmt in args.formats:
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--case", fmt, str(n)],
+                capture_output=True, text=True, check=True,
+            )
+            results.append((n, json.loads(out.stdout.strip().splitlines()[-1])))
+
+    print(f"{'rows':>8} {'format':>8} {'seconds':>8} {'rows/s':>9} {'file MB':>8} {'export RSS MB':>14}")
+    for n, r in results:
+        if r.get("error"):
+            print(f"{n:>8} {r['format']:>8}  saltato: {r['error']}")
+            continue
+        rate = r["rows"] / r["seconds"] if r["seconds"] else 0.0
+        print(
+            f"{n:>8} {r['format']:>8} {r['seconds']:>8.2f} {rate:>9.0f} {r['mb']:>8.2f} {r['export_rss_mb']:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,128 @@
+# benchmarks/bench_memory_chunks.py
+"""
+Chunk di memoria prodotti dalla pipeline con memory_chunk_mode = json / row / row_batch:
+numero di chunk, caratteri e token da embeddare, byte dei vettori e del testo in memoria,
+quota di requisiti che stanno interi in un solo chunk (quelli che una ricerca può restituire completi).
+
+Uso (dalla cartella del plugin):
+    python benchmarks/bench_memory_chunks.py                    # 100 pagine
+    python benchmarks/bench_memory_chunks.py --pages 500 --dim 1536 --batch-chars 2000
+    python benchmarks/bench_memory_chunks.py --model sentence-transformers/all-MiniLM-L6-v2
+
+Senza --model il tempo di embedding è stimato da token / --embed-tps (il costo di un embedder
+cresce con i token e, per batch, con il numero di chunk); con --model (sentence-transformers
+installato) i chunk vengono embeddati davvero. Ogni modalità gira in un processo separato.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+MODES = ["json", "row", "row_batch"]
+
+
+def run_mode(mode: str, args) -> dict:
+    sys.path.insert(0, BENCH_DIR)
+    import pandas as pd
+    import stub_cat
+
+    bot = stub_cat.load_plugin()
+    before = stub_cat.hook_function(bot.before_rabbithole_splits_text)
+    after = stub_cat.hook_function(bot.after_rabbithole_splitted_text)
+    llm = stub_cat.FakeLLM(latency=0, seed=args.seed, content_marker="## Testo normativo da analizzare:")
+    docs = stub_cat.synthetic_standard(args.pages, seed=args.seed)
+
+    with tempfile.TemporaryDirectory() as root:
+        stub_cat.prepare_workdir(root)
+        settings = {
+            "memory_chunk_mode": mode,
+            "memory_batch_chars": args.batch_chars,
+            "llm_cache_dir": os.path.join(root, "llm_cache"),
+            "journal_dir": os.path.join(root, "journals"),
+        }
+        cat = stub_cat.StubCat(llm, settings)
+        chunks = after(stub_cat.split_pages(before(docs, cat)), cat)
+        static_dir = os.path.join(root, "cat", "static")
+        xlsx = [n for n in os.listdir(static_dir) if n.endswith(".xlsx")]
+        rows = pd.read_excel(os.path.join(static_dir, xlsx[0]), dtype=str).fillna("") if xlsx else None
+
+    texts = [c.page_content or "" for c in chunks]
+    chars = sum(len(t) for t in texts)
+    tokens = sum((len(t) + 3) // 4 for t in texts)
+    meta_bytes = sum(len(json.dumps(c.metadata or {}, ensure_ascii=False).encode("utf-8")) for c in chunks)
+
+    if args.model:
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(args.model)
+        t0 = time.perf_counter()
+        vectors = model.encode(texts, batch_size=32)
+        embed_seconds = time.perf_counter() - t0
+        dim = int(vectors.shape[1])
+    else:
+        embed_seconds = tokens / args.embed_tps
+        dim = args.dim
+
+    complete = 0
+    n_rows = 0
+    if rows is not None:
+        descriptions = rows["Requirement/Standard Description"].tolist()
+        n_rows = len(descriptions)
+        complete = sum(1 for d in descriptions if d and any(d in t for t in texts))
+    return {
+        "mode": mode,
+        "chunks": len(chunks),
+        "chars": chars,
+        "tokens": tokens,
+        "embed_seconds": round(embed_seconds, 3),
+        "estimated": not args.model,
+        "vector_bytes": len(chunks) * dim * 4,
+        "text_bytes": sum(len(t.encode("utf-8")) for t in texts) + meta_bytes,
+        "rows": n_rows,
+        "rows_whole": complete,
+    }
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--modes", nargs="+", default=MODES, choices=MODES)
+    parser.add_argument("--batch-chars", type=int, default=1500, help="memory_batch_chars per row_batch")
+    parser.add_argument("--dim", type=int, default=384, help="dimensione dei vettori (stima)")
+    parser.add_argument("--embed-tps", type=float, default=5000.0, help="token/s dell'embedder (stima)")
+    parser.add_argument("--model", help="modello sentence-transformers per embedding reali")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        print(json.dumps(run_mode(args.case, args)))
+        return
+
+    results = []
+    for mode in args.modes:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--case", mode] + argv,
+            capture_output=True, text=True, check=True,
+        )
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    label = "embed s" + ("" if args.model else " (st.)")
+    print(
+        f"{'mode':>10} {'chunks':>7} {'chars':>9} {'tokens':>8} {label:>14} "
+        f"{'vectors KB':>11} {'text KB':>8} {'rows whole':>11}"
+    )
+    for r in results:
+        whole = f"{r['rows_whole']}/{r['rows']}"
+        print(
+            f"{r['mode']:>10} {r['chunks']:>7} {r['chars']:>9} {r['tokens']:>8} {r['embed_seconds']:>14.2f} "
+            f"{r['vector_bytes'] / 1024:>11.1f} {r['text_bytes'] / 1024:>8.1f} {whole:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
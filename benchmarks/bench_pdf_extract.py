@@ -0,0 +1,90 @@
+# benchmarks/bench_pdf_extract.py
+"""
+Throughput dell'estrazione PDF (pagine/s): StandardPDFParser su 1 processo e sul pool,
+più pdfminer (parser PDF predefinito del Cat) se installato.
+
+Uso (dalla cartella del plugin):
+    python benchmarks/bench_pdf_extract.py                      # PDF sintetico da 500 pagine
+    python benchmarks/bench_pdf_extract.py --pages 2000 --image-pages 0.02
+    python benchmarks/bench_pdf_extract.py --pdf norma.pdf --workers 1 4 8
+
+Il PDF sintetico usa il testo di stub_cat.synthetic_standard; una quota di pagine è solo
+immagine (nessun layer di testo) e passa dall'OCR se Tesseract è disponibile.
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def build_pdf(path: str, pages: int, image_pages: float, seed: int = 0) -> None:
+    import random
+    import pymupdf
+    import stub_cat
+
+    rnd = random.Random(seed)
+    doc = pymupdf.open()
+    for d in stub_cat.synthetic_standard(pages, seed=seed):
+        page = doc.new_page()
+        page.insert_textbox(page.rect + (36, 36, -36, -36), d.page_content, fontsize=7)
+        if rnd.random() < image_pages:
+            # pagina scansionata: stessa grafica, nessun testo selezionabile
+            pix = page.get_pixmap(dpi=100)
+            doc.delete_page(-1)
+            doc.new_page().insert_image(pymupdf.Rect(0, 0, pix.width * 0.72, pix.height * 0.72), pixmap=pix)
+    doc.save(path, garbage=3, deflate=True)
+
+
+def _pdfminer_pages(path: str) -> int:
+    from pdfminer.high_level import extract_pages
+
+    return sum(1 for _ in extract_pages(path))
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf", help="PDF da misurare (default: sintetico)")
+    parser.add_argument("--pages", type=int, default=500)
+    parser.add_argument("--image-pages", type=float, default=0.01, help="quota di pagine solo immagine")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 0], help="0 = automatico")
+    parser.add_argument("--no-ocr", action="store_true")
+    args = parser.parse_args(argv)
+
+    sys.path.insert(0, BENCH_DIR)
+    import stub_cat
+
+    stub_cat.load_plugin()
+    from importlib import import_module
+
+    pdf_parser = import_module(f"{stub_cat.PLUGIN_PACKAGE}.pdf_parser")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.pdf
+        if not path:
+            path = os.path.join(tmp, "synthetic.pdf")
+            build_pdf(path, args.pages, args.image_pages)
+        size_mb = os.path.getsize(path) / 1024 / 1024
+        print(f"{os.path.basename(path)}: {size_mb:.1f} MB")
+        print(f"{'parser':>22} {'pages':>6} {'seconds':>8} {'pages/s':>8} {'ocr':>5} {'empty':>6} {'chars':>10}")
+        for workers in args.workers:
+            pages, stats = pdf_parser.extract_pdf_pages(path, workers=workers, ocr=not args.no_ocr)
+            chars = sum(len(t) for t, _ in pages)
+            label = f"pymupdf x{stats['workers']}"
+            print(
+                f"{label:>22} {stats['pages']:>6} {stats['seconds']:>8.2f} {stats['pages_per_second']:>8.1f} "
+                f"{stats['ocr_pages']:>5} {stats['empty_pages']:>6} {chars:>10}"
+            )
+        try:
+            t0 = time.perf_counter()
+            n = _pdfminer_pages(path)
+            seconds = time.perf_counter() - t0
+            print(f"{'pdfminer (default Cat)':>22} {n:>6} {seconds:>8.2f} {n / seconds:>8.1f} {'-':>5} {'-':>6} {'-':>10}")
+        except ImportError:
+            print("pdfminer non installato: confronto con il parser predefinito del Cat saltato")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,286 @@
+# benchmarks/bench_pipeline.py
+"""
+Benchmark offline della pipeline di ingestion (before_rabbithole_splits_text + after_rabbithole_splitted_text)
+con StubCat e FakeLLM: nessun Cheshire Cat e nessun modello reale.
+
+Uso (dalla cartella del plugin):
+    python benchmarks/bench_pipeline.py                         # 10, 100, 500, 2000 pagine
+    python benchmarks/bench_pipeline.py --pages 10 200 --latency 0.05
+    python benchmarks/bench_pipeline.py --set parallel_extraction=true --set max_concurrency=8
+    python benchmarks/bench_pipeline.py --set extraction_mode=hybrid --ms-per-output-token 1
+    python benchmarks/bench_pipeline.py --compare results/A.json results/B.json
+
+Ogni dimensione gira in un processo separato (picco RSS pulito). I risultati vanno in
+benchmarks/results/<timestamp>_<commit>.json e si confrontano tra commit con --compare.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import subprocess
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+STAGES = [
+    "cleaning",
+    "grouping",
+    "llm_wait",
+    "json_parsing",
+    "dedup",
+    "excel_write",
+]
+
+
+class StageTimer:
+    """
+    Accumula i tempi per stage avvolgendo le funzioni del plugin (monkeypatch sul modulo che le usa).
+    """
+
+    def __init__(self):
+        self.seconds = {s: 0.0 for s in STAGES}
+        self.calls = {s: 0 for s in STAGES}
+
+    def wrap(self, module, attr: str, stage: str, consume: bool = False) -> None:
+        original = getattr(module, attr)
+
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            try:
+                out = original(*args, **kwargs)
+                if consume:
+                    # generatori: il tempo di parsing è quello del consumo
+                    out = iter(list(out))
+                return out
+            finally:
+                self.seconds[stage] += time.perf_counter() - t0
+                self.calls[stage] += 1
+
+        setattr(module, attr, timed)
+
+
+def _parse_setting(raw: str):
+    key, _, value = raw.partition("=")
+    try:
+        return key, json.loads(value)
+    except ValueError:
+        return key, value
+
+
+def _instrument(bot, timer: StageTimer) -> None:
+    timer.wrap(bot, "_clean_cid_and_control_chars", "cleaning")
+    for attr in ("plan_chunk_groups", "plan_fixed_groups"):
+        if hasattr(bot, attr):
+            timer.wrap(bot, attr, "grouping")
+    timer.wrap(bot, "iter_json_rows", "json_parsing", consume=True)
+    timer.wrap(bot.RowStore, "add_many", "dedup")
+    timer.wrap(bot, "export_rows", "excel_write")
+
+
+def run_case(pages: int, args) -> dict:
+    sys.path.insert(0, BENCH_DIR)
+    import stub_cat
+
+    settings = dict(_parse_setting(s) for s in args.set)
+    bot = stub_cat.load_plugin()
+    before = stub_cat.hook_function(bot.before_rabbithole_splits_text)
+    after = stub_cat.hook_function(bot.after_rabbithole_splitted_text)
+
+    timer = StageTimer()
+    _instrument(bot, timer)
+
+    llm = stub_cat.FakeLLM(
+        latency=args.latency,
+        jitter=args.jitter,
+        rows_per_clause=args.rows_per_clause,
+        row_chars=args.row_chars,
+        fail_rate=args.fail_rate,
+        truncate_rate=args.truncate_rate,
+        seed=args.seed,
+        content_marker="## Testo normativo da analizzare:",
+        ms_per_output_token=args.ms_per_output_token,
+        error_rate=args.error_rate,
+        repeat_rate=args.repeat_rate,
+    )
+    docs = stub_cat.synthetic_standard(pages, seed=args.seed, front_matter=args.front_matter)
+
+    with tempfile.TemporaryDirectory() as root:
+        stub_cat.prepare_workdir(root)
+        settings.setdefault("llm_cache_dir", os.path.join(root, "llm_cache"))
+        settings.setdefault("journal_dir", os.path.join(root, "journals"))
+        cat = stub_cat.StubCat(llm, settings)
+
+        if args.tracemalloc:
+            tracemalloc.start()
+        t0 = time.perf_counter()
+        docs = before(docs, cat)
+        chunks = stub_cat.split_pages(docs)
+        chunks = after(chunks, cat)
+        if settings.get("background_jobs"):
+            # l'hook accoda e ritorna: si misura fino al completamento dei job
+            queue = bot._job_queue(settings)
+            while queue.stats()["queued"] or queue.stats()["running"]:
+                time.sleep(0.01)
+        total = time.perf_counter() - t0
+        traced_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+        if args.tracemalloc:
+            tracemalloc.stop()
+
+        static_dir = os.path.join(root, "cat", "static")
+        outputs = {
+            name: os.path.getsize(os.path.join(static_dir, name))
+            for name in os.listdir(static_dir)
+            if name.endswith((".xlsx", ".csv", ".jsonl", ".parquet", ".json")) and name != "tools_status.json"
+        }
+        run_stats = {}
+        for name in outputs:
+            if name.endswith("_stats.json"):
+                with open(os.path.join(static_dir, name), encoding="utf-8") as f:
+                    run_stats = json.load(f).get("summary", {})
+
+    stages = dict(timer.seconds)
+    stages["llm_wait"] = llm.wait_seconds
+    return {
+        "pages": pages,
+        "chunks": len(chunks),
+        "llm_calls": llm.calls,
+        "prompt_chars": llm.prompt_chars,
+        "response_chars": llm.response_chars,
+        "total_seconds": round(total, 4),
+        "stages_seconds": {k: round(v, 4) for k, v in stages.items()},
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peak_traced_mb": round(traced_peak / 1024 / 1024, 1) if traced_peak is not None else None,
+        "outputs_bytes": outputs,
+        "rows_produced": run_stats.get("rows_produced"),
+        "duplicates_dropped": run_stats.get("duplicates_dropped"),
+        "rows_kept": run_stats.get("rows_kept"),
+        "retry_calls": run_stats.get("retry_calls"),
+        "recovered_rows": run_stats.get("recovered_rows"),
+        "parse_failures": run_stats.get("parse_failures"),
+        "messages": len(cat.messages),
+    }
+
+
+def _git_revision() -> str:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        )
+        dirty = subprocess.run(["git", "status", "--porcelain"], cwd=BENCH_DIR, capture_output=True, text=True)
+        return out.stdout.strip() + ("-dirty" if dirty.stdout.strip() else "")
+    except Exception:
+        return "unknown"
+
+
+def _print_table(results: list[dict]) -> None:
+    header = f"{'pages':>6} {'chunks':>7} {'calls':>6} {'total s':>9} " + " ".join(f"{s[:12]:>12}" for s in STAGES) + f" {'RSS MB':>8}"
+    print(header)
+    for r in results:
+        st = r["stages_seconds"]
+        print(
+            f"{r['pages']:>6} {r['chunks']:>7} {r['llm_calls']:>6} {r['total_seconds']:>9.3f} "
+            + " ".join(f"{st.get(s, 0.0):>12.3f}" for s in STAGES)
+            + f" {r['peak_rss_mb']:>8.1f}"
+        )
+    print(
+        f"\n{'pages':>6} {'prompt chars':>13} {'resp chars':>11} {'rows':>7} {'dup dropped':>12} {'rows kept':>10}"
+        f" {'in tok/row':>11} {'out tok/row':>12}"
+    )
+    for r in results:
+        rows = r['rows_produced'] or 0
+        print(
+            f"{r['pages']:>6} {r['prompt_chars']:>13} {r['response_chars']:>11} {rows:>7} "
+            f"{r['duplicates_dropped'] or 0:>12} {r['rows_kept'] or 0:>10}"
+            f" {r['prompt_chars'] / 4 / rows if rows else 0:>11.1f} {r['response_chars'] / 4 / rows if rows else 0:>12.1f}"
+        )
+
+
+def compare(path_a: str, path_b: str) -> None:
+    with open(path_a, encoding="utf-8") as f:
+        a = json.load(f)
+    with open(path_b, encoding="utf-8") as f:
+        b = json.load(f)
+    print(f"A = {a['revision']} ({a['timestamp']})   B = {b['revision']} ({b['timestamp']})")
+    by_pages = {r["pages"]: r for r in a["results"]}
+    for rb in b["results"]:
+        ra = by_pages.get(rb["pages"])
+        if ra is None:
+            continue
+        print(f"\n{rb['pages']} pagine")
+        rows = [("total", ra["total_seconds"], rb["total_seconds"]), ("llm_calls", ra["llm_calls"], rb["llm_calls"])]
+        rows += [(k, ra.get(k) or 0, rb.get(k) or 0) for k in ("prompt_chars", "response_chars", "duplicates_dropped", "rows_kept")]
+        rows += [(s, ra["stages_seconds"].get(s, 0.0), rb["stages_seconds"].get(s, 0.0)) for s in STAGES]
+        rows += [("peak_rss_mb", ra["peak_rss_mb"], rb["peak_rss_mb"])]
+        for name, va, vb in rows:
+            delta = (vb - va) / va * 100 if va else 0.0
+            print(f"  {name:<20} {va:>12.3f} {vb:>12.3f} {delta:>+8.1f}%")
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 100, 500, 2000])
+    parser.add_argument("--latency", type=float, default=0.02, help="secondi per chiamata LLM finta")
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--ms-per-output-token", type=float, default=0.0, help="tempo di generazione per token di risposta")
+    parser.add_argument("--rows-per-clause", type=int, default=2)
+    parser.add_argument("--row-chars", type=int, default=240, help="dimensione della descrizione per riga")
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--truncate-rate", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="quota di chiamate che sollevano un errore")
+    parser.add_argument("--front-matter", action="store_true", help="copertina, sommario, premessa, bibliografia e indice")
+    parser.add_argument("--repeat-rate", type=float, default=0.0, help="quota di righe ripetute dal modello con spazi diversi")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="override dei settings del plugin")
+    parser.add_argument("--tracemalloc", action="store_true", help="misura anche il picco delle allocazioni Python")
+    parser.add_argument("--label", default="")
+    parser.add_argument("--no-save", action="store_true")
+    parser.add_argument("--compare", nargs=2, metavar=("A", "B"))
+    parser.add_argument("--case", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if args.case is not None:
+        print(json.dumps(run_case(args.case, args)))
+        return
+
+    passthrough = [a for a in argv if a not in ("--no-save",)]
+    results = []
+    for pages in args.pages:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), *passthrough, "--case", str(pages)],
+            capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            sys.stderr.write(out.stderr)
+            raise SystemExit(f"caso {pages} pagine fallito")
+        results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    _print_table(results)
+
+    if not args.no_save:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        revision = _git_revision()
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        payload = {
+            "revision": revision,
+            "timestamp": timestamp,
+            "label": args.label,
+            "params": {k: v for k, v in vars(args).items() if k not in ("compare", "case", "no_save")},
+            "python": sys.version.split()[0],
+            "results": results,
+        }
+        name = f"{timestamp}_{revision}{'_' + args.label if args.label else ''}.json"
+        with open(os.path.join(RESULTS_DIR, name), "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+        print(f"\nRisultati salvati in {os.path.join(RESULTS_DIR, name)}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,171 @@
+# benchmarks/bench_rate_limiter.py
+"""
+Equità e throttling del limitatore LLM condiviso con più utenti che caricano norme insieme.
+
+Un provider finto rifiuta le chiamate oltre la sua quota (finestra scorrevole, come un 429).
+Tre scenari, ognuno in un processo separato (limitatore di processo nuovo):
+- none:        nessun limitatore, ogni analisi chiama il modello per conto suo
+- fifo:        limitatore con un'unica coda (turni per utente disattivati): chi accoda di più passa prima
+- round-robin: limitatore con turni per utente (comportamento del plugin)
+
+Uso (dalla cartella del plugin):
+    python benchmarks/bench_rate_limiter.py
+    python benchmarks/bench_rate_limiter.py --users alice=300:32 bob=20:4 carol=20:4 --provider-rpm 600
+
+Utenti come nome=pagine:chiamate_parallele; dopo il primo gli utenti partono ogni --stagger secondi
+(un'analisi grande è già in corso quando arrivano le piccole). Per utente: chiamate (rifiutate incluse),
+attesa in coda (somma sulle chiamate), secondi al completamento; in totale i rifiuti del provider.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+import subprocess
+import tempfile
+from collections import deque
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS = ["none", "fifo", "round-robin"]
+
+
+class ThrottledProvider:
+    """Quota del provider: al massimo rpm * window / 60 chiamate in ogni finestra di 'window' secondi."""
+
+    def __init__(self, rpm: int, window: float):
+        self.limit = max(1, int(rpm * window / 60))
+        self.window = window
+        self.calls = deque()
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def admit(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            while self.calls and now - self.calls[0] > self.window:
+                self.calls.popleft()
+            if len(self.calls) >= self.limit:
+                self.rejected += 1
+                raise RuntimeError("429 Too Many Requests (fake provider)")
+            self.calls.append(now)
+
+
+def run_scenario(scenario: str, args) -> dict:
+    sys.path.insert(0, BENCH_DIR)
+    import stub_cat
+
+    bot = stub_cat.load_plugin()
+    before = stub_cat.hook_function(bot.before_rabbithole_splits_text)
+    after = stub_cat.hook_function(bot.after_rabbithole_splitted_text)
+    provider = ThrottledProvider(args.provider_rpm, args.window)
+    users = {}
+    for spec in args.users:
+        user_id, _, rest = spec.partition("=")
+        pages, _, concurrency = rest.partition(":")
+        users[user_id] = (int(pages), int(concurrency or 4))
+
+    if scenario == "fifo":
+        # stessa coda per tutti: il limitatore ignora l'utente
+        limiter_cls = sys.modules[f"{stub_cat.PLUGIN_PACKAGE}.rate_limiter"].LLMRateLimiter
+        acquire = limiter_cls.acquire
+        limiter_cls.acquire = lambda self, user_id, tokens=0: acquire(self, "shared", tokens)
+
+    settings = {
+        "parallel_extraction": True,
+        "llm_cache_enabled": False,
+        "resumable_runs": False,
+        "partial_snapshots": False,
+        "retry_backoff_seconds": 0.2,
+        "retry_budget": 1000,
+    }
+    if scenario != "none":
+        settings.update(llm_requests_per_minute=args.limit_rpm, llm_burst_seconds=1.0)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as root:
+        stub_cat.prepare_workdir(root, extra_users=tuple(users))
+        static_dir = os.path.join(root, "cat", "static")
+
+        def ingest(user_id: str, pages: int, concurrency: int) -> None:
+            llm = stub_cat.FakeLLM(latency=args.latency, content_marker="## Testo normativo da analizzare:")
+            attempts = [0]
+
+            def call(prompt: str) -> str:
+                attempts[0] += 1
+                provider.admit()
+                return llm(prompt)
+
+            cat = stub_cat.StubCat(call, dict(settings, max_concurrency=concurrency), user_id=user_id)
+            docs = stub_cat.synthetic_standard(pages, seed=len(user_id))
+            t0 = time.perf_counter()
+            after(stub_cat.split_pages(before(docs, cat)), cat)
+            results[user_id] = {"pages": pages, "calls": attempts[0], "seconds": round(time.perf_counter() - t0, 2)}
+
+        threads = [threading.Thread(target=ingest, args=(u, p, c)) for u, (p, c) in users.items()]
+        t0 = time.perf_counter()
+        for i, t in enumerate(threads):
+            if i:
+                time.sleep(args.stagger)
+            t.start()
+        for t in threads:
+            t.join()
+        wall = time.perf_counter() - t0
+
+        # attesa in coda per utente dal sidecar delle statistiche di ogni analisi
+        for name in os.listdir(static_dir):
+            if name.endswith("_stats.json"):
+                with open(os.path.join(static_dir, name), encoding="utf-8") as f:
+                    summary = json.load(f)["summary"]
+                results[summary["user_id"]]["wait_seconds"] = summary.get("rate_limit_wait_seconds", 0.0)
+
+    limiter = bot._rate_limiter(settings)
+    stats = limiter.stats() if limiter is not None else {}
+    return {
+        "scenario": scenario,
+        "wall_seconds": round(wall, 2),
+        "rejected": provider.rejected,
+        "queue_depth_max": stats.get("queue_depth_max", 0),
+        "wait_p95": stats.get("wait_p95", 0.0),
+        "users": results,
+    }
+
+
+def main(argv: list[str]) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--users", nargs="+", default=["alice=300:32", "bob=20:4", "carol=20:4"], help="utente=pagine:parallele"
+    )
+    parser.add_argument("--stagger", type=float, default=1.0, help="secondi tra l'avvio di un utente e il successivo")
+    parser.add_argument("--provider-rpm", type=int, default=600, help="quota del provider finto")
+    parser.add_argument("--window", type=float, default=5.0, help="finestra della quota del provider (s)")
+    parser.add_argument("--limit-rpm", type=int, default=450, help="llm_requests_per_minute del plugin")
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.case:
+        print(json.dumps(run_scenario(args.case, args)))
+        return
+
+    print(
+        f"provider {args.provider_rpm} req/min (finestra {args.window:.0f}s), limitatore {args.limit_rpm} req/min"
+    )
+    print(f"{'scenario':>12} {'user':>8} {'pages':>6} {'calls':>6} {'wait s':>8} {'done s':>8} {'rejected':>9} {'wall s':>7}")
+    for scenario in args.scenarios:
+        out = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--case", scenario] + argv,
+            capture_output=True, text=True, check=True,
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        for i, (user_id, u) in enumerate(r["users"].items()):
+            tail = f" {r['rejected']:>9} {r['wall_seconds']:>7.1f}" if i == 0 else ""
+            print(
+                f"{scenario if i == 0 else '':>12} {user_id:>8} {u['pages']:>6} {u['calls']:>6} "
+                f"{u.get('wait_seconds', 0.0):>8.1f} {u['seconds']:>8.1f}{tail}"
+            )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
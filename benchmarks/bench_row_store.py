@@ -0,0 +1,126 @@
+# benchmarks/bench_row_store.py
+"""
+Accumulo + export delle righe: percorso storico (lista di dict, set di tuple, round-trip JSON,
+json_normalize/DataFrame, Excel) contro RowStore (colonne compatte, digest di dedup, Excel diretto).
+
+Uso (dalla cartella del plugin):
+    python benchmarks/bench_row_store.py            # 50k righe
+    python benchmarks/bench_row_store.py 10000 100000
+
+Ogni caso gira in un processo separato: picco RSS (ru_maxrss) e picco tracemalloc non sono
+sporcati dai casi precedenti. Le righe arrivano a gruppi da 25 come dal modello, con circa il 10%
+di duplicati (righe ripetute dai gruppi sovrapposti).
+"""
+import os
+import sys
+import json
+import time
+import subprocess
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PLUGIN_DIR = os.path.dirname(BENCH_DIR)
+GROUP_ROWS = 25
+
+
+def _groups(n: int):
+    """Gruppi di righe come li restituisce il modello: ogni gruppo ripete le ultime righe del precedente."""
+    from bench_excel_writer import _synthetic_rows
+
+    rows = _synthetic_rows(n)
+    for start in range(0, n, GROUP_ROWS):
+        overlap = rows[max(0, start - 3):start]
+        # copie nuove: ogni risposta del modello produce dict e stringhe propri
+        yield [dict(r) for r in overlap + rows[start:start + GROUP_ROWS]]
+
+
+def _legacy(n: int, file_path: str) -> int:
+    # Percorso storico di _run_extraction senza journal, riportato qui come baseline
+    from legacy_export import normalize_rows_and_write_excel
+    from bench_excel_writer import FINAL_COLUMNS
+
+    all_rows, seen_keys = [], set()
+    for group_rows in _groups(n):
+        for r in group_rows:
+            key = (
+                (r.get("Chapter/Paragraph  No.", "") or "").strip(),
+                (r.get("Requirement/Standard Description", "") or "").strip(),
+                (r.get("Regulatory References", "") or "").strip(),
+            )
+            if key in seen_keys:
+                continue
+            seen_keys.add(key)
+            all_rows.append(r)
+    rows = json.loads(json.dumps({"rows": all_rows}, ensure_ascii=False)).get("rows", [])
+    df = normalize_rows_and_write_excel(rows, FINAL_COLUMNS, file_path)
+    return len(df)
+
+
+def _store(n: int, file_path: str) -> int:
+    import importlib
+    from stub_cat import load_plugin, PLUGIN_PACKAGE
+    from bench_excel_writer import FINAL_COLUMNS
+
+    load_plugin()
+    RowStore = importlib.import_module(f"{PLUGIN_PACKAGE}.row_store").RowStore
+    RowSchema = importlib.import_module(f"{PLUGIN_PACKAGE}.helpers").RowSchema
+    write_values_excel = importlib.import_module(f"{PLUGIN_PACKAGE}.exporters").write_values_excel
+
+    store = RowStore(RowSchema(FINAL_COLUMNS))
+    for group_rows in _groups(n):
+        store.add_many(group_rows)
+    return write_values_excel(store.iter_values(), FINAL_COLUMNS, file_path)
+
+
+PATHS = {"legacy": _legacy, "store": _store}
+
+
+def _run_case(path: str, n: int) -> dict:
+    import resource
+    import tracemalloc
+
+    sys.path[:0] = [PLUGIN_DIR, BENCH_DIR]
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, "out.xlsx")
+        tracemalloc.start()
+        t0 = time.perf_counter()
+        rows = PATHS[path](n, out)
+        seconds = time.perf_counter() - t0
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        "path": path,
+        "rows_in": n,
+        "rows_out": rows,
+        "seconds": round(seconds, 2),
+        "peak_py_mb": round(peak / 1024 / 1024, 1),
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+    }
+
+
+def main(argv: list[str]) -> None:
+    if argv[:1] == ["--case"]:
+        print(json.dumps(_run_case(argv[1], int(argv[2]))))
+        return
+
+    sizes = [int(a) for a in argv] or [50_000]
+    results = []
+    for n in sizes:
+        for path in PATHS:
+            out = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--case", path, str(n)],
+                capture_output=True, text=True, check=True,
+            )
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    print(f"{'rows':>8} {'path':>7} {'rows out':>9} {'seconds':>8} {'peak py MB':>11} {'peak RSS MB':>12}")
+    for r in results:
+        print(
+            f"{r['rows_in']:>8} {r['path']:>7} {r['rows_out']:>9} {r['seconds']:>8.2f} "
+            f"{r['peak_py_mb']:>11.1f} {r['peak_rss_mb']:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
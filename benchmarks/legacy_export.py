@@ -0,0 +1,58 @@
+# benchmarks/legacy_export.py
+"""
+Percorso di export precedente a RowStore/exporters (righe -> DataFrame -> Excel), tenuto solo
+come baseline per bench_excel_writer e bench_row_store. helpers viene importato dentro le funzioni,
+con la cartella del plugin in sys.path (come fanno i benchmark): il Cat importa anche questo file.
+"""
+from typing import Any, Dict, List, Sequence
+
+import pandas as pd
+
+
+def normalize_rows_to_dataframe(
+    rows: List[dict],
+    final_columns: Sequence[str],
+    dedup_keys: Sequence[str] | None = None,
+) -> pd.DataFrame:
+    """
+    Converte 'rows' in DataFrame con:
+    - normalizzazione riga per riga con RowSchema (nomi canonici, spazi/NBSP/alias, spazi nei valori)
+    - dedup su dedup_keys (default DEDUP_KEYS, stessa chiave del dedup in tempo reale)
+    - colonne final_columns, nell'ordine, vuote se mai valorizzate
+    """
+    from helpers import DEDUP_KEYS, RowSchema
+
+    schema = RowSchema(final_columns, dedup_keys=dedup_keys or DEDUP_KEYS)
+    records, present, seen = [], set(), set()
+    for r in schema.normalize_rows(rows):
+        key = schema.dedup_key(r)
+        if key in seen:
+            continue
+        seen.add(key)
+        present.update(r)
+        records.append(r)
+
+    df = pd.DataFrame.from_records(records, columns=list(final_columns))
+    for col in final_columns:
+        if col not in present:
+            df[col] = ""
+    return df
+
+
+def normalize_rows_and_write_excel(
+    rows: List[dict],
+    final_columns: Sequence[str],
+    file_path: str,
+    sheet_name: str = "Sheet1",
+    extra_sheets: Dict[str, Sequence[Sequence[Any]]] | None = None,
+) -> pd.DataFrame:
+    """Normalizza con normalize_rows_to_dataframe e scrive l'Excel in streaming (stesso formato dell'export)."""
+    from helpers import ExcelStreamWriter
+
+    df = normalize_rows_to_dataframe(rows, final_columns)
+    with ExcelStreamWriter(file_path, list(df.columns), sheet_name=sheet_name) as writer:
+        for values in df.itertuples(index=False, name=None):
+            writer.append(values)
+        for name, sheet_rows in (extra_sheets or {}).items():
+            writer.add_sheet(name, sheet_rows)
+    return df
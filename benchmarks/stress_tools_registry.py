@@ -0,0 +1,89 @@
+# benchmarks/stress_tools_registry.py
+"""
+Stress test multi-processo del registry tools_status.json.
+
+Uso (dalla cartella del plugin):
+    python benchmarks/stress_tools_registry.py [writers] [readers] [seconds]
+
+- i writer fanno read-modify-write con update_tools_status (lock + scrittura atomica)
+- i reader interrogano is_tool_enabled in loop stretto, come farebbero tante ingestion concorrenti
+Verifica che nessun reader veda mai un file troncato/vuoto e confronta le letture su disco con i lookup.
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import multiprocessing as mp
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TOOL = "Analizzatore normative"
+
+
+def _writer(root: str, worker: int, seconds: float, out) -> None:
+    os.environ["CCAT_ROOT"] = root
+    sys.path.insert(0, PLUGIN_DIR)
+    import tools_registry
+
+    writes = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        def _toggle(data):
+            users = data["tools"].setdefault(TOOL, {}).setdefault("user_id_tool_status", {})
+            users[f"w{worker}"] = not users.get(f"w{worker}", False)
+            users["always_on"] = True
+            # padding: il file deve essere abbastanza grande da rendere visibili scritture a metà
+            data["padding"] = "x" * 20000
+        tools_registry.update_tools_status(_toggle)
+        writes += 1
+        time.sleep(0.002)
+    out.put({"role": "writer", "writes": writes})
+
+
+def _reader(root: str, seconds: float, out) -> None:
+    os.environ["CCAT_ROOT"] = root
+    sys.path.insert(0, PLUGIN_DIR)
+    import tools_registry
+
+    torn = 0
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        # "always_on" è sempre True in ogni versione completa del file
+        if not tools_registry.is_tool_enabled(TOOL, "always_on"):
+            torn += 1
+    stats = tools_registry.registry_stats()
+    out.put({"role": "reader", "torn": torn, **stats})
+
+
+def main(argv: list[str]) -> None:
+    writers = int(argv[0]) if len(argv) > 0 else 4
+    readers = int(argv[1]) if len(argv) > 1 else 8
+    seconds = float(argv[2]) if len(argv) > 2 else 5.0
+
+    with tempfile.TemporaryDirectory() as root:
+        os.makedirs(os.path.join(root, "cat", "static"))
+        with open(os.path.join(root, "cat", "static", "tools_status.json"), "w", encoding="utf-8") as f:
+            json.dump({"tools": {TOOL: {"user_id_tool_status": {"always_on": True}}}}, f)
+
+        out = mp.Queue()
+        procs = [mp.Process(target=_writer, args=(root, w, seconds, out)) for w in range(writers)]
+        procs += [mp.Process(target=_reader, args=(root, seconds, out)) for _ in range(readers)]
+        for p in procs:
+            p.start()
+        results = [out.get() for _ in procs]
+        for p in procs:
+            p.join()
+
+    writes = sum(r["writes"] for r in results if r["role"] == "writer")
+    rd = [r for r in results if r["role"] == "reader"]
+    torn = sum(r["torn"] for r in rd)
+    lookups = sum(r["lookups"] for r in rd)
+    file_reads = sum(r["file_reads"] for r in rd)
+    print(f"writes: {writes}")
+    print(f"reader lookups: {lookups}, file reads: {file_reads} ({file_reads / max(1, lookups):.2%} dei lookup)")
+    print(f"torn/empty reads: {torn}")
+    sys.exit(1 if torn else 0)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,338 @@
+# benchmarks/stub_cat.py
+"""
+Strumenti per eseguire gli hook del plugin offline, senza Cheshire Cat né modello reale:
+- load_plugin(): importa il plugin come package (con stub di `cat` se il framework non è installato)
+- StubCat: llm, send_ws_message, mad_hatter settings, user_id
+- FakeLLM: risposte JSON deterministiche con latenza e dimensione configurabili
+- synthetic_standard() / split_pages(): normative sintetiche e chunking simile al rabbit hole
+"""
+import os
+import re
+import sys
+import json
+import time
+import types
+import random
+import hashlib
+import threading
+import importlib
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLUGIN_PACKAGE = "standard_analist_plugin"
+TOOL_NAME = "Analizzatore normative"
+
+
+def _install_cat_stub() -> None:
+    try:
+        import cat.mad_hatter.decorators  # noqa: F401
+        import cat.utils  # noqa: F401
+        return
+    except ImportError:
+        pass
+
+    def _decorator(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda f: f
+
+    modules = {
+        "cat": types.ModuleType("cat"),
+        "cat.mad_hatter": types.ModuleType("cat.mad_hatter"),
+        "cat.mad_hatter.decorators": types.ModuleType("cat.mad_hatter.decorators"),
+        "cat.utils": types.ModuleType("cat.utils"),
+    }
+    for name in ("hook", "plugin", "tool"):
+        setattr(modules["cat.mad_hatter.decorators"], name, _decorator)
+    modules["cat.utils"].get_static_url = lambda: "http://localhost:1865/static/"
+    sys.modules.update(modules)
+
+
+def load_plugin():
+    """
+    Importa standard_analysis_bot come modulo del package PLUGIN_PACKAGE.
+    """
+    _install_cat_stub()
+    if PLUGIN_PACKAGE not in sys.modules:
+        pkg = types.ModuleType(PLUGIN_PACKAGE)
+        pkg.__path__ = [PLUGIN_DIR]
+        sys.modules[PLUGIN_PACKAGE] = pkg
+    return importlib.import_module(f"{PLUGIN_PACKAGE}.standard_analysis_bot")
+
+
+def hook_function(obj):
+    # con il framework reale @hook restituisce un CatHook: la funzione è in .function
+    return getattr(obj, "function", obj)
+
+
+def prepare_workdir(root: str, user_id: str = "bench_user", extra_users: tuple = ()) -> None:
+    """
+    Crea cat/static con tools_status.json che abilita il tool per user_id (ed extra_users) e si sposta in root.
+    """
+    static_dir = os.path.join(root, "cat", "static")
+    os.makedirs(static_dir, exist_ok=True)
+    status = {u: True for u in (user_id, *extra_users)}
+    with open(os.path.join(static_dir, "tools_status.json"), "w", encoding="utf-8") as f:
+        json.dump({"tools": {TOOL_NAME: {"user_id_tool_status": status}}}, f)
+    os.environ["CCAT_ROOT"] = root
+    os.chdir(root)
+
+
+class Doc:
+    """Equivalente minimo di langchain Document."""
+
+    def __init__(self, page_content: str, metadata: dict | None = None):
+        self.page_content = page_content
+        self.metadata = metadata or {}
+
+
+class _StubPlugin:
+    def __init__(self, settings: dict):
+        self._settings = settings
+
+    def load_settings(self) -> dict:
+        return dict(self._settings)
+
+
+class StubCat:
+    def __init__(self, llm, settings: dict | None = None, user_id: str = "bench_user"):
+        self.user_id = user_id
+        self._llm = llm
+        self.messages: list[str] = []
+        base = {"tool_name": TOOL_NAME}
+        base.update(settings or {})
+        plugin = _StubPlugin(base)
+        self.mad_hatter = types.SimpleNamespace(get_plugin=lambda: plugin)
+
+    def llm(self, prompt: str, *args, **kwargs) -> str:
+        return self._llm(prompt)
+
+    def send_ws_message(self, content, msg_type: str = "chat") -> None:
+        self.messages.append(str(content))
+
+
+# il cleaning rimuove i newline: le intestazioni si riconoscono da numero + parola maiuscola
+_CLAUSE_LINE = re.compile(r"(?<![\d])(?<!\d\.)(\d+(?:\.\d+){1,3})\s+([A-Z][a-z]+(?: [a-z]+){1,4})")
+# chiavi dello schema di output dichiarato nel prompt ('"rows": [ { "chiave": "", ... } ]')
+_SCHEMA_BLOCK = re.compile(r'"rows":\s*\[\s*\{(?P<body>[^{}]*)\}')
+_SCHEMA_KEY = re.compile(r'"([^"]+)"\s*:')
+# formato compatto: righe come array nell'ordine dichiarato
+_COMPACT_COLUMNS = re.compile(r"Colonne \(in ordine\): (\[[^\]]*\])")
+
+
+class FakeLLM:
+    """
+    Modello finto e deterministico:
+    - latency: secondi di attesa per chiamata (+ jitter relativo)
+    - rows_per_clause / row_chars: dimensione della risposta
+    - fail_rate / truncate_rate: quota di risposte non JSON o troncate
+    - error_rate: quota di chiamate che sollevano un'eccezione (errore transitorio del modello)
+    - ms_per_output_token: tempo di generazione aggiuntivo per token di risposta (~4 caratteri)
+    - repeat_rate: quota di righe ripetute subito dopo con spazi diversi (duplicati tipici dei modelli)
+    Le righe vengono ricavate dalle intestazioni di clausola presenti nel testo del gruppo e
+    contengono solo le chiavi dello schema dichiarato nel prompt (o sono array, se il prompt
+    chiede il formato compatto).
+    """
+    model_name = "fake-llm"
+
+    def __init__(
+        self,
+        latency: float = 0.02,
+        jitter: float = 0.0,
+        rows_per_clause: int = 2,
+        row_chars: int = 240,
+        fail_rate: float = 0.0,
+        truncate_rate: float = 0.0,
+        seed: int = 0,
+        content_marker: str = "",
+        ms_per_output_token: float = 0.0,
+        error_rate: float = 0.0,
+        repeat_rate: float = 0.0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.rows_per_clause = rows_per_clause
+        self.row_chars = row_chars
+        self.fail_rate = fail_rate
+        self.truncate_rate = truncate_rate
+        self.seed = seed
+        self.content_marker = content_marker
+        self.ms_per_output_token = ms_per_output_token
+        self.error_rate = error_rate
+        self.repeat_rate = repeat_rate
+        self.errors = 0
+        self.calls = 0
+        self.wait_seconds = 0.0
+        self.prompt_chars = 0
+        self.response_chars = 0
+        self._lock = threading.Lock()
+
+    def _content(self, prompt: str) -> str:
+        if self.content_marker and self.content_marker in prompt:
+            return prompt.split(self.content_marker, 1)[1]
+        return prompt
+
+    @staticmethod
+    def _schema_keys(prompt: str) -> list[str] | None:
+        m = _SCHEMA_BLOCK.search(prompt)
+        return _SCHEMA_KEY.findall(m.group("body")) if m else None
+
+    def __call__(self, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        rnd = random.Random(int.from_bytes(digest[:8], "big") ^ self.seed)
+        wait = max(0.0, self.latency * (1 + self.jitter * (2 * rnd.random() - 1)))
+        if self.error_rate and random.random() < self.error_rate:
+            # errore transitorio: non deterministico, un nuovo tentativo può riuscire
+            time.sleep(wait)
+            with self._lock:
+                self.calls += 1
+                self.errors += 1
+                self.wait_seconds += wait
+                self.prompt_chars += len(prompt)
+            raise RuntimeError("fake LLM: servizio temporaneamente non disponibile")
+
+        content = self._content(prompt)
+        keys = self._schema_keys(prompt)
+        compact = _COMPACT_COLUMNS.search(prompt)
+        rows = []
+        for m in _CLAUSE_LINE.finditer(content):
+            for k in range(self.rows_per_clause):
+                start = m.end() + k * self.row_chars
+                rows.append({
+                    "Chapter/Paragraph No.": m.group(1),
+                    "Chapter/Paragraph Title": m.group(2).strip(),
+                    "Requirement/Standard Description": content[start:start + self.row_chars].strip(),
+                    "Required Data / Configuration": "Test method as per 8.1" if rnd.random() < 0.2 else "",
+                    "Regulatory References": "8.1, Annex B" if rnd.random() < 0.3 else "",
+                })
+                if rnd.random() < self.repeat_rate:
+                    dup = dict(rows[-1])
+                    dup["Requirement/Standard Description"] = dup["Requirement/Standard Description"].replace(" ", "  ", 2) + " "
+                    rows.append(dup)
+        if compact:
+            columns = json.loads(compact.group(1))
+            rows = [[r.get(k, "") for k in columns] for r in rows]
+        elif keys:
+            rows = [{k: r.get(k, "") for k in keys} for r in rows]
+        response = json.dumps({"rows": rows}, ensure_ascii=False)
+        r = rnd.random()
+        if r < self.fail_rate:
+            response = "Mi dispiace, non riesco a produrre il JSON richiesto."
+        elif r < self.fail_rate + self.truncate_rate:
+            response = response[: int(len(response) * 0.7)]
+        wait += self.ms_per_output_token / 1000.0 * len(response) / 4
+        time.sleep(wait)
+
+        with self._lock:
+            self.calls += 1
+            self.wait_seconds += wait
+            self.prompt_chars += len(prompt)
+            self.response_chars += len(response)
+        return response
+
+
+_WORDS = (
+    "the appliance shall be constructed so that live parts are not accessible under normal use "
+    "compliance is checked by inspection and by the tests of clause with the test probe applied "
+    "enclosure insulation temperature rise leakage current earthing terminal marking instructions"
+).split()
+
+
+def _front_matter(rnd: random.Random) -> list[str]:
+    """Copertina, copyright, sommario, premessa e pagina bianca di una norma EN."""
+    toc = [
+        f"{c}.{s} " + " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(2, 5))).capitalize()
+        + " " + "." * rnd.randint(8, 40) + f" {rnd.randint(5, 120)}"
+        for c in range(1, 12) for s in range(1, rnd.randint(3, 6))
+    ]
+    return [
+        "EUROPEAN STANDARD NORME EUROPÉENNE EUROPÄISCHE NORM EN 99999-1 March 2021 ICS 13.120 "
+        "English Version Household and similar electrical appliances - Safety - Part 1: General requirements",
+        "© 2021 CENELEC All rights of exploitation in any form and by any means reserved worldwide for CENELEC "
+        "Members. Ref. No. EN 99999-1:2021 E. All rights reserved.",
+        "Contents Page " + " ".join(toc[: len(toc) // 2]),
+        " ".join(toc[len(toc) // 2:]),
+        "European foreword This document (EN 99999-1:2021) has been prepared by CLC/TC 61. The following dates "
+        "are fixed: latest date by which this document has to be implemented at national level by publication of "
+        "an identical national standard or by endorsement (dop) 2022-03-01; latest date by which the national "
+        "standards conflicting with this document have to be withdrawn (dow) 2024-03-01. Attention is drawn to "
+        "the possibility that some of the elements of this document may be the subject of patent rights. "
+        "This document supersedes EN 99999-1:2012 and all of its amendments and corrigenda.",
+        "",
+    ]
+
+
+def _back_matter(rnd: random.Random) -> list[str]:
+    """Bibliografia e indice analitico."""
+    words = [w for w in _WORDS if w != "shall"]
+    refs = " ".join(
+        f"{rnd.choice(['EN', 'IEC', 'ISO', 'EN IEC'])} {rnd.randint(1000, 63000)}-{rnd.randint(1, 9)}:{rnd.randint(1995, 2021)}, "
+        + " ".join(rnd.choice(words) for _ in range(rnd.randint(4, 9))).capitalize()
+        for _ in range(25)
+    )
+    index = " ".join(
+        f"{rnd.choice(words)} {rnd.choice(words)} " + ", ".join(str(rnd.randint(1, 120)) for _ in range(rnd.randint(1, 4)))
+        for _ in range(260)
+    )
+    return ["Bibliography " + refs, "Index " + index[:3000], index[3000:6000]]
+
+
+def synthetic_standard(pages: int, seed: int = 0, chars_per_page: int = 3000, front_matter: bool = False) -> list[Doc]:
+    """
+    Normativa sintetica: una pagina per Doc, con numerazione di clausole, titoli,
+    riferimenti, qualche tabella e artefatti (cid:NN) da ripulire.
+    front_matter: aggiunge copertina, sommario, premessa, bibliografia e indice analitico.
+    """
+    rnd = random.Random(seed)
+    docs = []
+    chapter, section, sub = 1, 1, 0
+    for page in range(1, pages + 1):
+        lines = []
+        size = 0
+        while size < chars_per_page:
+            sub += 1
+            if sub > rnd.randint(3, 8):
+                sub, section = 1, section + 1
+                if section > rnd.randint(4, 9):
+                    section, chapter = 1, chapter + 1
+            title = " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(2, 5))).capitalize()
+            lines.append(f"{chapter}.{section}.{sub} {title}")
+            for _ in range(rnd.randint(1, 3)):
+                sentence = " ".join(rnd.choice(_WORDS) for _ in range(rnd.randint(20, 60)))
+                if rnd.random() < 0.3:
+                    sentence += f" (see {rnd.randint(1, 30)}.{rnd.randint(1, 9)} and Annex {rnd.choice('ABCDEF')})"
+                if rnd.random() < 0.1:
+                    sentence += " (cid:31)(cid:12)"
+                lines.append(sentence.capitalize() + ".")
+            if rnd.random() < 0.05:
+                lines.append("Table " + str(rnd.randint(1, 40)) + " – " + " | ".join(str(rnd.randint(0, 999)) for _ in range(12)))
+            size = sum(len(x) + 1 for x in lines)
+        docs.append(Doc("\n".join(lines), {"source": f"synthetic_{pages}p.pdf", "page": page}))
+    if front_matter:
+        extra = random.Random(seed + 1)
+        front = [Doc(text, {"source": f"synthetic_{pages}p.pdf"}) for text in _front_matter(extra)]
+        back = [Doc(text, {"source": f"synthetic_{pages}p.pdf"}) for text in _back_matter(extra)]
+        docs = front + docs + back
+        for page, d in enumerate(docs, 1):
+            d.metadata["page"] = page
+    return docs
+
+
+def split_pages(docs: list[Doc], chunk_chars: int = 1024, overlap_chars: int = 256) -> list[Doc]:
+    """
+    Chunking simile al text splitter del rabbit hole (dimensione fissa con overlap, tagli su newline).
+    """
+    chunks = []
+    for doc in docs:
+        text = doc.page_content
+        start = 0
+        while start < len(text):
+            end = min(len(text), start + chunk_chars)
+            if end < len(text):
+                nl = text.rfind("\n", start + chunk_chars // 2, end)
+                if nl != -1:
+                    end = nl
+            chunks.append(Doc(text[start:end], dict(doc.metadata)))
+            if end >= len(text):
+                break
+            start = max(end - overlap_chars, start + 1)
+    return chunks
@@ -0,0 +1,184 @@
+# exporters.py
+import os
+import csv
+import json
+import time
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet opzionale: senza pyarrow il formato viene saltato
+    pa = pq = None
+
+from .helpers import ExcelStreamWriter, RowSchema
+
+EXPORT_FORMATS = ("xlsx", "csv", "jsonl", "parquet")
+FORMAT_LABELS = {"xlsx": "Excel", "csv": "CSV", "jsonl": "JSONL", "parquet": "Parquet"}
+_PARQUET_BATCH_ROWS = 10_000
+
+
+def parse_export_formats(raw: str | Iterable[str]) -> List[str]:
+    """'xlsx, csv' -> ["xlsx", "csv"]: formati noti, senza ripetizioni, nell'ordine indicato."""
+    items = raw.replace(";", ",").split(",") if isinstance(raw, str) else raw
+    out = []
+    for item in items:
+        fmt = str(item).strip().lower().lstrip(".")
+        if fmt in EXPORT_FORMATS and fmt not in out:
+            out.append(fmt)
+    return out
+
+
+def parquet_available() -> bool:
+    return pq is not None
+
+
+def _csv_value(v: Any) -> Any:
+    if v is None or (isinstance(v, float) and v != v):
+        return ""
+    if isinstance(v, (list, dict)):
+        return json.dumps(v, ensure_ascii=False)
+    return v
+
+
+def _text_value(v: Any) -> str | None:
+    # Parquet: colonne stringa, celle vuote come null
+    if v is None or (isinstance(v, float) and v != v) or v == "":
+        return None
+    if isinstance(v, (list, dict)):
+        return json.dumps(v, ensure_ascii=False)
+    return str(v)
+
+
+@contextmanager
+def _atomic_output(file_path: str):
+    """Percorso temporaneo nella stessa cartella, rinominato su file_path solo a scrittura completata."""
+    directory = os.path.dirname(file_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=os.path.splitext(file_path)[1], dir=directory)
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def iter_unique_values(rows: Iterable[Dict[str, Any]], schema: RowSchema) -> Iterator[List[Any]]:
+    """Righe (anche grezze, es. dal journal) normalizzate, de-duplicate e in ordine di colonna."""
+    seen = set()
+    for row in schema.normalize_rows(rows):
+        key = schema.dedup_key(row)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield [row.get(c, "") for c in schema.columns]
+
+
+def write_values_csv(values: Iterable[Sequence[Any]], columns: Sequence[str], file_path: str) -> int:
+    """CSV in streaming, UTF-8 con BOM (Excel apre gli accenti correttamente)."""
+    n = 0
+    with _atomic_output(file_path) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for v in values:
+                writer.writerow([_csv_value(x) for x in v])
+                n += 1
+    return n
+
+
+def write_values_jsonl(values: Iterable[Sequence[Any]], columns: Sequence[str], file_path: str) -> int:
+    """Un oggetto JSON per riga, chiavi nell'ordine delle colonne."""
+    n = 0
+    with _atomic_output(file_path) as tmp_path:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for v in values:
+                row = {c: ("" if x is None else x) for c, x in zip(columns, v)}
+                f.write(json.dumps(row, ensure_ascii=False))
+                f.write("\n")
+                n += 1
+    return n
+
+
+def write_values_parquet(values: Iterable[Sequence[Any]], columns: Sequence[str], file_path: str) -> int:
+    """Parquet colonnare (pyarrow), scritto a blocchi di righe: memoria limitata al blocco."""
+    if pq is None:
+        raise ImportError("pyarrow non installato")
+    schema = pa.schema([(c, pa.string()) for c in columns])
+    n = 0
+    with _atomic_output(file_path) as tmp_path:
+        with pq.ParquetWriter(tmp_path, schema, compression="zstd") as writer:
+            batch: List[List[str | None]] = [[] for _ in columns]
+            for v in values:
+                for col, x in zip(batch, v):
+                    col.append(_text_value(x))
+                n += 1
+                if len(batch[0]) >= _PARQUET_BATCH_ROWS:
+                    writer.write_table(pa.Table.from_arrays([pa.array(c, pa.string()) for c in batch], schema=schema))
+                    batch = [[] for _ in columns]
+            if batch[0] or not n:
+                writer.write_table(pa.Table.from_arrays([pa.array(c, pa.string()) for c in batch], schema=schema))
+    return n
+
+
+def write_values_excel(
+    values: Iterable[Sequence[Any]],
+    columns: Sequence[str],
+    file_path: str,
+    extra_sheets: Dict[str, Sequence[Sequence[Any]]] | None = None,
+) -> int:
+    with ExcelStreamWriter(file_path, columns) as writer:
+        for v in values:
+            writer.append(v)
+        for name, sheet_rows in (extra_sheets or {}).items():
+            writer.add_sheet(name, sheet_rows)
+    return writer.rows_written
+
+
+def export_rows(
+    values: Callable[[], Iterable[Sequence[Any]]],
+    columns: Sequence[str],
+    base_path: str,
+    formats: Sequence[str],
+    extra_sheets: Dict[str, Sequence[Sequence[Any]]] | None = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Scrive le stesse righe (stesse colonne, stesso ordine, già de-duplicate) in ogni formato richiesto.
+    'values' restituisce a ogni chiamata un nuovo iteratore di righe come liste nell'ordine di 'columns'
+    (es. RowStore.iter_values o iter_unique_values sul journal): ogni formato è scritto in streaming.
+    I fogli extra (es. "Run Stats") vanno solo nell'Excel.
+    Restituisce {formato: {"path", "rows", "seconds", "bytes"}} oppure {"error"} se il formato non è disponibile.
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    for fmt in formats:
+        path = f"{base_path}.{fmt}"
+        t0 = time.perf_counter()
+        try:
+            if fmt == "xlsx":
+                n = write_values_excel(values(), columns, path, extra_sheets=extra_sheets)
+            elif fmt == "csv":
+                n = write_values_csv(values(), columns, path)
+            elif fmt == "jsonl":
+                n = write_values_jsonl(values(), columns, path)
+            elif fmt == "parquet":
+                n = write_values_parquet(values(), columns, path)
+            else:
+                raise ValueError(f"formato non supportato: {fmt}")
+        except ImportError as e:
+            results[fmt] = {"error": str(e)}
+            continue
+        results[fmt] = {
+            "path": path,
+            "rows": n,
+            "seconds": round(time.perf_counter() - t0, 4),
+            "bytes": os.path.getsize(path),
+        }
+    return results
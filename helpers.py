@@ -1,198 +1,469 @@
-# helpers.py
-import re, json
-import os
-from typing import Sequence, Any, List, Dict
-import pandas as pd
-from openpyxl.styles import Alignment
-from openpyxl.utils import get_column_letter
-
-def _clean_cid_and_control_chars(text: str) -> str:
-    text = re.sub(r'\(cid:\d+\)', '', text)
-    return re.sub(r'[\x00-\x1f\x7f-\x9f\u200b-\u200f\u2028-\u202e]', '', text)
-
-# --- Util per estrazione JSON robusta (riuso inline) ---
-def _extract_json_object(text: str):
-    fence = re.search(r"```(?:json|python)?\s*([\s\S]*?)```", text, flags=re.IGNORECASE)
-    candidates = []
-    if fence:
-        candidates.append(fence.group(1).strip())
-    candidates.append(text)
-
-    for cand in candidates:
-        try:
-            obj = json.loads(cand)
-            if isinstance(obj, list):
-                return {"rows": obj}
-            return obj
-        except Exception:
-            # prova bounding {} o [] nel fallback
-            s, e = cand.find("{"), cand.rfind("}")
-            if s != -1 and e != -1 and e > s:
-                try:
-                    obj = json.loads(cand[s:e+1])
-                    if isinstance(obj, list):
-                        return {"rows": obj}
-                    return obj
-                except Exception:
-                    pass
-            s, e = cand.find("["), cand.rfind("]")
-            if s != -1 and e != -1 and e > s:
-                try:
-                    arr = json.loads(cand[s:e+1])
-                    return {"rows": arr if isinstance(arr, list) else [arr]}
-                except Exception:
-                    pass
-    raise ValueError("Impossibile estrarre un JSON valido dalla risposta del modello.")
-
-# ----------------- Normalizzazione nomi colonna (spazi/NBSP/alias) -----------------
-_WS = re.compile(r"\s+")
-
-def _norm_key(s: str) -> str:
-    if s is None:
-        return ""
-    s = str(s).replace("\xa0", " ")   # NBSP -> spazio normale
-    s = _WS.sub(" ", s).strip()       # collassa spazi multipli
-    return s
-
-def _rename_to_canonical(
-    df: pd.DataFrame,
-    final_columns: Sequence[str],
-    aliases: Dict[str, Sequence[str]] | None = None
-) -> pd.DataFrame:
-    """
-    Rinomina le colonne correnti ai nomi canonici in final_columns:
-    - matching case-insensitive su chiavi normalizzate (spazi multipli → singolo, NBSP rimossi)
-    - supporta alias espliciti per varianti note
-    """
-    # base: tutte le colonne canoniche
-    norm_to_canon = {_norm_key(c): c for c in final_columns}
-
-    # alias comuni per "Chapter/Paragraph  No." (due spazi)
-    default_aliases: Dict[str, List[str]] = {
-        "Chapter/Paragraph  No.": [
-            "Chapter/Paragraph No.",
-            "Chapter / Paragraph No.",
-            "Chapter / Paragraph  No.",
-            "Chapter-Paragraph No.",
-        ],
-    }
-    if aliases:
-        # mergia alias extra
-        for canon, alist in aliases.items():
-            default_aliases.setdefault(canon, []).extend(alist)
-
-    # registra alias normalizzati
-    for canon, alist in default_aliases.items():
-        norm_to_canon[_norm_key(canon)] = canon
-        for a in alist:
-            norm_to_canon[_norm_key(a)] = canon
-
-    # costruisci rename map
-    rename_map = {}
-    for col in df.columns:
-        key = _norm_key(col)
-        if key in norm_to_canon and col != norm_to_canon[key]:
-            rename_map[col] = norm_to_canon[key]
-
-    if rename_map:
-        df = df.rename(columns=rename_map)
-    return df
-
-# ----------------- DataFrame normalize + Excel writer -----------------
-def normalize_rows_to_dataframe(
-    rows: List[dict],
-    required_keys: Sequence[str],
-    extra_empty_columns: Sequence[str],
-    final_columns: Sequence[str],
-    dedup_keys: Sequence[str] = (
-        "Chapter/Paragraph  No.",
-        "Requirement/Standard Description",
-        "Regulatory References",
-    ),
-) -> pd.DataFrame:
-    """
-    Converte 'rows' in DataFrame con:
-    - json_normalize
-    - rinomina colonne ai nomi canonici (gestione spazi/NBSP/alias)
-    - garanzia colonne richieste/extra
-    - dedup su dedup_keys
-    - ordine colonne final_columns
-    """
-    df = pd.json_normalize(rows) if rows else pd.DataFrame()
-
-    # 1) rinomina ai nomi canonici (es. "Chapter/Paragraph No." -> "Chapter/Paragraph  No.")
-    df = _rename_to_canonical(df, final_columns)
-
-    # 2) garantisce colonne richieste/extra/finali
-    for col in required_keys:
-        if col not in df.columns:
-            df[col] = ""
-    for col in extra_empty_columns:
-        if col not in df.columns:
-            df[col] = ""
-    for col in final_columns:
-        if col not in df.columns:
-            df[col] = ""
-
-    # 3) dedup su colonne chiave (se presenti)
-    existing = [c for c in dedup_keys if c in df.columns]
-    if existing:
-        df = df.drop_duplicates(subset=existing, keep="first").reset_index(drop=True)
-
-    # 4) ordine finale
-    df = df.reindex(columns=final_columns)
-    return df
-
-
-def normalize_rows_and_write_excel(
-    rows: List[dict],
-    required_keys: Sequence[str],
-    extra_empty_columns: Sequence[str],
-    final_columns: Sequence[str],
-    file_path: str,
-    sheet_name: str = "Sheet1",
-) -> pd.DataFrame:
-    """
-    Normalizza + scrive Excel con formattazione colonne/word-wrap:
-      - Col 1: 20; Col 2: 20; Col 3: 60; resto: 20
-      - Tutte le celle wrap_text e vertical='top'
-    """
-    df = normalize_rows_to_dataframe(rows, required_keys, extra_empty_columns, final_columns)
-
-    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
-    with pd.ExcelWriter(file_path, engine="openpyxl") as writer:
-        df.to_excel(writer, index=False, sheet_name=sheet_name)
-        ws = writer.sheets[sheet_name]
-
-        # larghezze colonne
-        for col_idx in range(1, ws.max_column + 1):
-            letter = get_column_letter(col_idx)
-            ws.column_dimensions[letter].width = 60 if col_idx == 3 else 20
-
-        # wrap text + vertical top
-        for row in ws.iter_rows(min_row=1, max_row=ws.max_row, min_col=1, max_col=ws.max_column):
-            for cell in row:
-                cell.alignment = Alignment(
-                    horizontal=(cell.alignment.horizontal if cell.alignment else None),
-                    vertical="top",
-                    wrap_text=True
-                )
-
-    return df
-
-# ----------------- utility testo -----------------
-def split_text_into_n_parts(text: str, n: int) -> list[str]:
-    if n <= 1 or not text:
-        return [text]
-    length = len(text)
-    approx = max(1, length // n)
-    parts, start = [], 0
-    for _ in range(n - 1):
-        cut = start + approx
-        newline_pos = text.rfind("\n", start, min(length, cut + approx // 2))
-        if newline_pos != -1 and newline_pos > start:
-            cut = newline_pos + 1
-        parts.append(text[start:cut])
-        start = cut
-    parts.append(text[start:])
-    return parts
+# helpers.py
+import re, json
+import os
+import tempfile
+from typing import Sequence, Any, List, Dict, Iterable
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, NamedStyle
+from openpyxl.utils import get_column_letter
+
+# Glifi non mappati "(cid:NN)" + caratteri di controllo/zero-width (regex compilate una volta)
+_CID = re.compile(r'\(cid:\d+\)')
+_CONTROL_CHARS = re.compile(r'[\x00-\x1f\x7f-\x9f\u200b-\u200f\u2028-\u202e]+')
+
+def _clean_cid_and_control_chars(text: str) -> str:
+    return _CONTROL_CHARS.sub('', _CID.sub('', text))
+
+# --- Util per estrazione JSON robusta (riuso inline) ---
+_JSON_DECODER = json.JSONDecoder()
+_FENCE_OPEN = re.compile(r"```(?:json|python)?", re.IGNORECASE)
+_ROWS_ARRAY = re.compile(r'"rows"\s*:\s*\[')
+_JSON_SKIP = frozenset(" \t\r\n,")
+_MAX_JSON_CANDIDATES = 32  # parentesi della prosa provate prima di rinunciare
+
+
+def iter_json_rows(text: str, stats: Dict[str, Any] | None = None) -> Iterable[Any]:
+    """
+    Parser a passata singola della risposta del modello: restituisce ogni riga dell'array "rows"
+    (o dell'array top-level) appena si chiude, senza attendere la fine del testo.
+    - salta code-fence e testo prima del JSON; se la prima "{"/"[" della prosa non dà nulla
+      ("Sure [see below]: {...}") riprova dalla successiva
+    - con risposta troncata o spazzatura finale si ferma all'ultima riga completa
+    - una risposta con un solo oggetto senza "rows" viene trattata come riga singola
+    Se passato, 'stats' viene riempito con: rows, salvaged_bytes, total_bytes, complete.
+    """
+    text = text if isinstance(text, str) else str(text or "")
+    info = {"rows": 0, "salvaged_bytes": 0, "total_bytes": len(text), "complete": False}
+    if stats is not None:
+        stats.update(info)
+
+    fence = _FENCE_OPEN.search(text)
+    pos = fence.end() if fence else 0
+    rows_match = _ROWS_ARRAY.search(text, pos)
+    for _ in range(_MAX_JSON_CANDIDATES):
+        starts = [p for p in (text.find("{", pos), text.find("[", pos)) if p != -1]
+        if not starts:
+            break
+        pos = min(starts)
+        if rows_match is not None and rows_match.start() < pos:
+            rows_match = _ROWS_ARRAY.search(text, pos)
+        yield from _iter_json_rows_at(text, pos, rows_match, info, stats)
+        if info["rows"] or info["complete"]:
+            break
+        pos += 1
+    if stats is not None:
+        stats.update(info)
+
+
+def _iter_json_rows_at(
+    text: str, pos: int, rows_match, info: Dict[str, Any], stats: Dict[str, Any] | None
+) -> Iterable[Any]:
+    """Righe a partire dal candidato text[pos] ("{" o "["); nessuna riga se il candidato non è JSON."""
+    if text[pos] == "{":
+        if rows_match is None:
+            # oggetto singolo senza "rows"
+            try:
+                obj, end = _JSON_DECODER.raw_decode(text, pos)
+            except ValueError:
+                return
+            info.update(rows=1, salvaged_bytes=end - pos, complete=True)
+            if stats is not None:
+                stats.update(info)
+            yield obj
+            return
+        array_start = rows_match.end()
+    else:
+        array_start = pos + 1
+
+    p, n = array_start, len(text)
+    while True:
+        while p < n and text[p] in _JSON_SKIP:
+            p += 1
+        if p >= n:
+            break
+        ch = text[p]
+        if ch == "]":
+            info["complete"] = True
+            break
+        if ch not in "{[":
+            break
+        try:
+            value, p = _JSON_DECODER.raw_decode(text, p)
+        except ValueError:
+            break  # riga troncata
+        info["rows"] += 1
+        info["salvaged_bytes"] = p - array_start
+        if stats is not None:
+            stats.update(info)
+        yield value
+
+
+# ----------------- Protocollo compatto (righe come array posizionali) -----------------
+def decode_compact_rows(rows: Iterable[Any], columns: Sequence[str]) -> List[Dict[str, Any]]:
+    """
+    Espande le righe posizionali del formato compatto nei nomi colonna canonici.
+    - array più corti: campi mancanti = ""; elementi in eccesso ignorati
+    - righe già a oggetto (il modello ha ignorato il formato) passano invariate
+    - valori non stringa (numeri, null) convertiti come farebbe il formato a oggetti
+    """
+    out: List[Dict[str, Any]] = []
+    n = len(columns)
+    for r in rows:
+        if isinstance(r, dict):
+            out.append(r)
+        elif isinstance(r, (list, tuple)):
+            values = list(r[:n]) + [""] * (n - len(r))
+            out.append({c: ("" if v is None else v if isinstance(v, str) else str(v)) for c, v in zip(columns, values)})
+    return out
+
+
+def encode_compact_rows(rows: Iterable[Dict[str, Any]], columns: Sequence[str]) -> List[List[Any]]:
+    """Inverso di decode_compact_rows: righe a oggetto -> array nell'ordine di 'columns'."""
+    return [[r.get(c, "") or "" for c in columns] for r in rows]
+
+# ----------------- Normalizzazione nomi colonna (spazi/NBSP/alias) -----------------
+_WS = re.compile(r"\s+")
+
+def _norm_key(s: str) -> str:
+    if s is None:
+        return ""
+    s = str(s).replace("\xa0", " ")   # NBSP -> spazio normale
+    s = _WS.sub(" ", s).strip()       # collassa spazi multipli
+    return s
+
+def _canonical_key_map(
+    final_columns: Sequence[str],
+    aliases: Dict[str, Sequence[str]] | None = None
+) -> Dict[str, str]:
+    """
+    Mappa chiave normalizzata -> nome canonico (colonne finali + alias noti).
+    """
+    # base: tutte le colonne canoniche
+    norm_to_canon = {_norm_key(c): c for c in final_columns}
+
+    # alias comuni per "Chapter/Paragraph  No." (due spazi)
+    default_aliases: Dict[str, List[str]] = {
+        "Chapter/Paragraph  No.": [
+            "Chapter/Paragraph No.",
+            "Chapter / Paragraph No.",
+            "Chapter / Paragraph  No.",
+            "Chapter-Paragraph No.",
+        ],
+    }
+    if aliases:
+        # mergia alias extra
+        for canon, alist in aliases.items():
+            default_aliases.setdefault(canon, []).extend(alist)
+
+    # registra alias normalizzati
+    for canon, alist in default_aliases.items():
+        norm_to_canon[_norm_key(canon)] = canon
+        for a in alist:
+            norm_to_canon[_norm_key(a)] = canon
+    return norm_to_canon
+
+# Chiavi di dedup delle righe: (No., Description, References)
+DEDUP_KEYS = (
+    "Chapter/Paragraph  No.",
+    "Requirement/Standard Description",
+    "Regulatory References",
+)
+_HSPACE = re.compile(r"[ \t\f\v\xa0]+")
+
+
+class RowSchema:
+    """
+    Schema delle righe compilato una volta (colonne finali + alias) e applicato a ogni riga
+    appena arriva dal modello:
+    - chiavi rinominate ai nomi canonici (spazi/NBSP/alias), con cache per chiave grezza
+    - valori testuali con spazi orizzontali collassati e senza spazi ai bordi
+    - chiave di dedup su dedup_keys, con tutti gli spazi (anche a capo) collassati
+    Le chiavi che non corrispondono a nessuna colonna restano invariate.
+    """
+
+    def __init__(
+        self,
+        columns: Sequence[str],
+        aliases: Dict[str, Sequence[str]] | None = None,
+        dedup_keys: Sequence[str] = DEDUP_KEYS,
+    ):
+        self.columns = list(columns)
+        self.dedup_keys = list(dedup_keys)
+        self._norm_to_canon = _canonical_key_map(self.columns, aliases)
+        self._keys: Dict[str, str] = {}
+
+    def canonical_key(self, key: str) -> str:
+        canon = self._keys.get(key)
+        if canon is None:
+            canon = self._norm_to_canon.get(_norm_key(key), key)
+            self._keys[key] = canon
+        return canon
+
+    @staticmethod
+    def normalize_value(v: Any) -> Any:
+        if isinstance(v, str):
+            return _HSPACE.sub(" ", v.replace("\r\n", "\n")).strip()
+        return v
+
+    def normalize_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Riga con chiavi canoniche e valori normalizzati (a parità di chiave vince la prima)."""
+        out: Dict[str, Any] = {}
+        for k, v in row.items():
+            canon = self.canonical_key(k)
+            if canon not in out:
+                out[canon] = self.normalize_value(v)
+        return out
+
+    def normalize_rows(self, rows: Iterable[Any]) -> List[Dict[str, Any]]:
+        return [self.normalize_row(r) for r in rows if isinstance(r, dict)]
+
+    def dedup_key(self, row: Dict[str, Any]) -> tuple:
+        """Chiave di dedup di una riga già normalizzata."""
+        return tuple(_WS.sub(" ", str(row.get(k) or "")).strip() for k in self.dedup_keys)
+
+
+# ----------------- Excel writer -----------------
+# Stile condiviso per tutte le celle: wrap + allineamento in alto
+_EXCEL_STYLE_NAME = "std_wrap_top"
+
+
+def _excel_column_width(col_idx: int) -> int:
+    return 60 if col_idx == 3 else 20
+
+
+class ExcelStreamWriter:
+    """
+    Writer Excel in streaming (openpyxl write-only):
+    - le righe vanno su disco man mano che vengono aggiunte, memoria costante
+    - formattazione tramite un unico named style condiviso (wrap_text + vertical='top')
+    - larghezze colonne impostate una sola volta, prima della prima riga
+    """
+
+    def __init__(self, file_path: str, columns: Sequence[str], sheet_name: str = "Sheet1"):
+        self.file_path = file_path
+        self.columns = list(columns)
+        self.rows_written = 0
+        self._wb = Workbook(write_only=True)
+        self._wb.add_named_style(NamedStyle(
+            name=_EXCEL_STYLE_NAME,
+            alignment=Alignment(vertical="top", wrap_text=True),
+        ))
+        self._ws = self._add_sheet(sheet_name, len(self.columns))
+        self._append(self._ws, self.columns)
+
+    def _add_sheet(self, sheet_name: str, n_columns: int):
+        ws = self._wb.create_sheet(sheet_name)
+        for col_idx in range(1, n_columns + 1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = _excel_column_width(col_idx)
+        return ws
+
+    def _append(self, ws, values: Sequence[Any]) -> None:
+        cells = []
+        for v in values:
+            cell = WriteOnlyCell(ws, value=_excel_value(v))
+            cell.style = _EXCEL_STYLE_NAME
+            cells.append(cell)
+        ws.append(cells)
+
+    def append(self, values: Sequence[Any]) -> None:
+        """Aggiunge una riga nell'ordine di self.columns."""
+        self._append(self._ws, values)
+        self.rows_written += 1
+
+    def append_dict(self, row: Dict[str, Any]) -> None:
+        self.append([row.get(c, "") for c in self.columns])
+
+    def add_sheet(self, sheet_name: str, rows: Iterable[Sequence[Any]]) -> None:
+        """Foglio aggiuntivo (es. "Run Stats") scritto in un colpo solo, stesso stile."""
+        rows = list(rows)
+        ws = self._add_sheet(sheet_name, max((len(r) for r in rows), default=0))
+        for r in rows:
+            self._append(ws, r)
+
+    def close(self) -> None:
+        # file temporaneo + os.replace: chi scarica vede il file completo o nessun file
+        directory = os.path.dirname(self.file_path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".xlsx", dir=directory)
+        os.close(fd)
+        try:
+            self._wb.save(tmp_path)
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, self.file_path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+def _excel_value(v: Any) -> Any:
+    # NaN/None -> cella vuota, come faceva DataFrame.to_excel
+    if v is None:
+        return None
+    if isinstance(v, float) and v != v:
+        return None
+    if isinstance(v, (list, dict)):
+        return json.dumps(v, ensure_ascii=False)
+    return v
+
+
+# ----------------- pianificazione gruppi (budget token) -----------------
+def _estimate_tokens(text: str) -> int:
+    """
+    Stima grezza dei token (~4 caratteri per token), sufficiente per dimensionare i gruppi.
+    """
+    return (len(text) + 3) // 4 if text else 0
+
+
+def plan_chunk_groups(
+    texts: Sequence[str],
+    max_input_tokens: int,
+    prompt_tokens: int = 0,
+    max_output_tokens: int = 0,
+    output_ratio: float = 1.3,
+) -> List[Dict[str, int]]:
+    """
+    Raggruppa chunk consecutivi finché stanno nel budget:
+    - token in ingresso (prompt fisso + contenuto) <= max_input_tokens
+    - token in uscita stimati (contenuto * output_ratio) <= max_output_tokens (0 = nessun limite)
+    Un chunk che da solo supera il budget forma comunque un gruppo.
+    Restituisce [{"start", "end", "input_tokens", "output_tokens"}] con end esclusivo.
+    """
+    content_budget = max(1, max_input_tokens - prompt_tokens)
+    plan: List[Dict[str, int]] = []
+    start, content_tokens = 0, 0
+
+    def _close(end: int) -> None:
+        plan.append({
+            "start": start,
+            "end": end,
+            "input_tokens": prompt_tokens + content_tokens,
+            "output_tokens": int(content_tokens * output_ratio),
+        })
+
+    for idx, text in enumerate(texts):
+        tokens = _estimate_tokens(text) + 1  # +1 per il separatore "\n"
+        over_input = content_tokens + tokens > content_budget
+        over_output = max_output_tokens > 0 and (content_tokens + tokens) * output_ratio > max_output_tokens
+        if idx > start and (over_input or over_output):
+            _close(idx)
+            start, content_tokens = idx, 0
+        content_tokens += tokens
+    if len(texts) > start:
+        _close(len(texts))
+    return plan
+
+
+def plan_fixed_groups(texts: Sequence[str], chunk_number: int, prompt_tokens: int = 0, output_ratio: float = 1.3) -> List[Dict[str, int]]:
+    """
+    Piano a gruppi fissi di chunk_number chunk (comportamento storico), stesso formato di plan_chunk_groups.
+    """
+    plan: List[Dict[str, int]] = []
+    for start in range(0, len(texts), max(1, chunk_number)):
+        end = min(start + max(1, chunk_number), len(texts))
+        content_tokens = sum(_estimate_tokens(t) + 1 for t in texts[start:end])
+        plan.append({
+            "start": start,
+            "end": end,
+            "input_tokens": prompt_tokens + content_tokens,
+            "output_tokens": int(content_tokens * output_ratio),
+        })
+    return plan
+
+
+def describe_group_plan(plan: List[Dict[str, int]], n_chunks: int, max_listed: int = 30) -> str:
+    """
+    Riepilogo leggibile del piano (numero gruppi, token per gruppo) da mostrare prima dell'esecuzione.
+    """
+    if not plan:
+        return f"🧮 Piano: nessun gruppo per {n_chunks} chunk."
+    tokens = [g["input_tokens"] for g in plan]
+    listed = ", ".join(str(t) for t in tokens[:max_listed]) + (", …" if len(tokens) > max_listed else "")
+    return (
+        f"🧮 Piano: {len(plan)} gruppi per {n_chunks} chunk. "
+        f"Token in ingresso per gruppo min/medio/max: {min(tokens)}/{sum(tokens) // len(tokens)}/{max(tokens)} "
+        f"(uscita stimata max {max(g['output_tokens'] for g in plan)}). Token per gruppo: [{listed}]"
+    )
+
+# ----------------- utility testo -----------------
+def split_text_into_n_parts(text: str, n: int) -> list[str]:
+    if n <= 1 or not text:
+        return [text]
+    length = len(text)
+    approx = max(1, length // n)
+    parts, start = [], 0
+    for _ in range(n - 1):
+        cut = start + approx
+        newline_pos = text.rfind("\n", start, min(length, cut + approx // 2))
+        if newline_pos != -1 and newline_pos > start:
+            cut = newline_pos + 1
+        parts.append(text[start:cut])
+        start = cut
+    parts.append(text[start:])
+    return parts
+
+
+# ----------------- chunk di memoria per riga -----------------
+def row_memory_text(row: Dict[str, Any], columns: Sequence[str]) -> str:
+    """
+    Testo compatto di una riga per la memoria del Cat (niente JSON né indentazione):
+    "6.4.1 Titolo: descrizione" + dati richiesti e riferimenti se presenti.
+    'columns': numero, titolo, descrizione, dati richiesti, riferimenti.
+    """
+    number, title, description, data, refs = (str(row.get(c, "") or "").strip() for c in columns[:5])
+    head = " ".join(p for p in (number, title) if p)
+    lines = [f"{head}: {description}" if head else description]
+    if data:
+        lines.append(f"Required data: {data}")
+    if refs:
+        lines.append(f"References: {refs}")
+    return "\n".join(lines)
+
+
+def rows_to_memory_chunks(
+    rows: Sequence[Dict[str, Any]],
+    columns: Sequence[str],
+    doc_type: Any,
+    metadata: Dict[str, Any],
+    batch_chars: int = 0,
+) -> list:
+    """
+    Chunk di memoria dalle righe: uno per riga (batch_chars=0) oppure righe consecutive
+    accorpate fino a batch_chars caratteri. Metadata: quelli del gruppo più "clause"
+    (prima clausola), "clauses", "clause_title" (solo chunk di una riga) e "rows".
+    """
+    batches: List[List[tuple]] = []
+    size = 0
+    for r in rows:
+        text = row_memory_text(r, columns)
+        if not text.strip():
+            continue
+        if not batches or batch_chars <= 0 or size + len(text) + 2 > batch_chars:
+            batches.append([])
+            size = 0
+        number = str(r.get(columns[0], "") or "").strip()
+        title = str(r.get(columns[1], "") or "").strip()
+        batches[-1].append((text, number, title))
+        size += len(text) + 2
+
+    out = []
+    for batch in batches:
+        meta = dict(metadata)
+        meta.pop("clause_title", None)
+        meta["clause"] = batch[0][1]
+        meta["clauses"] = ", ".join(dict.fromkeys(n for _, n, _ in batch if n))
+        meta["rows"] = len(batch)
+        if len(batch) == 1:
+            meta["clause_title"] = batch[0][2]
+        out.append(doc_type(page_content="\n\n".join(t for t, _, _ in batch), metadata=meta))
+    return out
@@ -0,0 +1,306 @@
+# job_queue.py
+import os
+import json
+import time
+import uuid
+import threading
+from typing import Any, Callable, Dict, List
+
+from .tools_registry import atomic_write_json
+
+# Stati di un job
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_KEEP_SECONDS = 7 * 24 * 3600       # i job conclusi restano consultabili per una settimana
+_PROGRESS_WRITE_SECONDS = 2.0       # persistenza dell'avanzamento al massimo ogni 2 secondi
+
+
+class JobChunk:
+    """Chunk ricostruito dal payload su disco (stessa interfaccia di un Document: page_content + metadata)."""
+
+    def __init__(self, page_content: str = "", metadata: dict | None = None):
+        self.page_content = page_content
+        self.metadata = metadata or {}
+
+
+class _JobCat:
+    """
+    Proxy di cat per un job in background:
+    - llm (e identità del modello) da un cat del proprietario: quello che ha accodato il job
+      o, dopo un riavvio, l'ultimo con cui il proprietario è tornato (attach)
+    - user_id del proprietario del job
+    - messaggi inoltrati a quel cat; l'ultimo resta nello stato del job
+    """
+
+    def __init__(self, cat, job_id: str, user_id: str, queue: "JobQueue"):
+        self._cat = cat
+        self._job_id = job_id
+        self._queue = queue
+        self.user_id = user_id
+        self.mad_hatter = getattr(cat, "mad_hatter", None)
+        self._llm = getattr(cat, "_llm", None)
+        self._notify = str(getattr(cat, "user_id", "") or "") == user_id
+
+    def llm(self, prompt: str, *args, **kwargs):
+        return self._cat.llm(prompt, *args, **kwargs)
+
+    def send_ws_message(self, content, msg_type: str = "chat") -> None:
+        self._queue._set_message(self._job_id, str(content))
+        if self._notify:
+            try:
+                self._cat.send_ws_message(content, msg_type)
+            except Exception:
+                self._notify = False  # utente disconnesso: resta consultabile lo stato del job
+
+
+class JobQueue:
+    """
+    Coda di elaborazioni persistita su disco (un file JSON per job + payload dei chunk in JSONL),
+    con pool di worker limitato globalmente (max_workers) e per utente (per_user).
+    I job in coda o interrotti da un riavvio vengono ripresi alla prima occasione
+    (il journal dei gruppi evita di ripetere le chiamate già fatte).
+
+    runner(chunks, cat, settings, progress) -> (chunks, risultato) esegue l'estrazione.
+    """
+
+    def __init__(self, jobs_dir: str, runner: Callable, max_workers: int = 2, per_user: int = 1):
+        self.jobs_dir = jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+        self._runner = runner
+        self.max_workers = max(1, max_workers)
+        self.per_user = max(1, per_user)
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._cats: Dict[str, Any] = {}
+        self._running: Dict[str, threading.Thread] = {}
+        self._last_write: Dict[str, float] = {}
+        self._user_cats: Dict[str, Any] = {}    # cat degli utenti con job ripresi ancora in coda
+        self._load()
+
+    # ----------------- persistenza -----------------
+    def _job_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _payload_path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.chunks.jsonl")
+
+    def _save(self, job: Dict[str, Any]) -> None:
+        atomic_write_json(self._job_path(job["id"]), job, indent=2, ensure_ascii=False)
+        self._last_write[job["id"]] = time.monotonic()
+
+    def _load(self) -> None:
+        now = time.time()
+        for name in os.listdir(self.jobs_dir):
+            if not name.endswith(".json") or name.startswith("."):
+                continue
+            path = os.path.join(self.jobs_dir, name)
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    job = json.load(f)
+            except Exception:
+                continue
+            if job.get("state") in (DONE, FAILED):
+                if now - (job.get("finished_at") or now) > _KEEP_SECONDS:
+                    os.remove(path)
+                    self._remove_payload(job["id"])
+                    continue
+            elif job.get("state") == RUNNING:
+                # interrotto da un riavvio: torna in coda
+                job["state"] = QUEUED
+                job["message"] = "Ripreso dopo il riavvio."
+                self._save(job)
+            self._jobs[job["id"]] = job
+
+    def _write_payload(self, job_id: str, chunks: List[Any]) -> None:
+        path = self._payload_path(job_id)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            for c in chunks:
+                f.write(json.dumps(
+                    {"page_content": c.page_content or "", "metadata": dict(getattr(c, "metadata", None) or {})},
+                    ensure_ascii=False,
+                    default=str,
+                ))
+                f.write("\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(path + ".tmp", path)
+
+    def _remove_payload(self, job_id: str) -> None:
+        try:
+            os.remove(self._payload_path(job_id))
+        except OSError:
+            pass
+
+    def _read_payload(self, job_id: str) -> List[JobChunk]:
+        with open(self._payload_path(job_id), "r", encoding="utf-8") as f:
+            return [JobChunk(**json.loads(line)) for line in f if line.strip()]
+
+    # ----------------- API -----------------
+    def configure(self, max_workers: int, per_user: int) -> None:
+        self.max_workers = max(1, max_workers)
+        self.per_user = max(1, per_user)
+
+    def submit(self, cat, chunks: List[Any], settings: Dict[str, Any], document: str = "") -> Dict[str, Any]:
+        """
+        Accoda l'elaborazione: copia dei chunk su disco (i Document originali restano al rabbit hole)
+        e snapshot dei settings. Restituisce una copia dello stato del job.
+        """
+        job_id = uuid.uuid4().hex[:12]
+        self._write_payload(job_id, chunks)
+        job = {
+            "id": job_id,
+            "user_id": str(getattr(cat, "user_id", "") or ""),
+            "document": document,
+            "state": QUEUED,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "progress": {"done": 0, "total": 0, "rows": 0},
+            "message": "",
+            "rows": 0,
+            "download_url": None,
+            "downloads": {},
+            "file_path": None,
+            "error": None,
+            "settings": settings,
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._cats[job_id] = cat
+            self._save(job)
+        self._dispatch()
+        return self.get(job_id)
+
+    def attach(self, cat) -> None:
+        """
+        Fornisce il cat di un utente ai suoi job ripresi dopo un riavvio e li avvia:
+        un job gira solo con un cat del suo proprietario (llm, messaggi, impostazioni dell'utente).
+        """
+        user_id = str(getattr(cat, "user_id", "") or "")
+        with self._lock:
+            self._user_cats[user_id] = cat
+        self._dispatch()
+
+    def get(self, job_id: str) -> Dict[str, Any] | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return json.loads(json.dumps(job, default=str)) if job else None
+
+    def jobs_for_user(self, user_id: str) -> List[Dict[str, Any]]:
+        """Job dell'utente, dal più recente."""
+        with self._lock:
+            ids = [j["id"] for j in sorted(self._jobs.values(), key=lambda j: j["created_at"], reverse=True)
+                   if j["user_id"] == str(user_id)]
+        return [job for job in (self.get(i) for i in ids) if job]
+
+    def position(self, job_id: str) -> int:
+        """Posizione nella coda globale (1 = prossimo a partire), 0 se non in coda."""
+        with self._lock:
+            queued = sorted((j for j in self._jobs.values() if j["state"] == QUEUED), key=lambda j: j["created_at"])
+            for pos, job in enumerate(queued, 1):
+                if job["id"] == job_id:
+                    return pos
+        return 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            out = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for job in self._jobs.values():
+                out[job["state"]] = out.get(job["state"], 0) + 1
+            return out
+
+    # ----------------- scheduling -----------------
+    def _dispatch(self) -> None:
+        """Avvia i job in coda (FIFO) finché ci sono posti liberi, globali e per utente."""
+        with self._lock:
+            per_user: Dict[str, int] = {}
+            for job_id in self._running:
+                uid = self._jobs[job_id]["user_id"]
+                per_user[uid] = per_user.get(uid, 0) + 1
+            queued = sorted((j for j in self._jobs.values() if j["state"] == QUEUED), key=lambda j: j["created_at"])
+            for job in queued:
+                if len(self._running) >= self.max_workers:
+                    break
+                uid = job["user_id"]
+                if per_user.get(uid, 0) >= self.per_user:
+                    continue
+                cat = self._cats.pop(job["id"], None) or self._user_cats.get(uid)
+                if cat is None:
+                    continue  # ripresa dopo riavvio: si aspetta che il proprietario torni (attach)
+                job["state"] = RUNNING
+                job["started_at"] = time.time()
+                self._save(job)
+                per_user[uid] = per_user.get(uid, 0) + 1
+                thread = threading.Thread(
+                    target=self._run, args=(job["id"], cat), name=f"std-analysis-{job['id']}", daemon=True
+                )
+                self._running[job["id"]] = thread
+                thread.start()
+            # il cat di un utente serve solo finché ha job in coda: poi non va trattenuto
+            waiting = {j["user_id"] for j in self._jobs.values() if j["state"] == QUEUED}
+            for uid in [u for u in self._user_cats if u not in waiting]:
+                del self._user_cats[uid]
+
+    def _set_message(self, job_id: str, message: str) -> None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job["message"] = message[:500]
+
+    def _set_progress(self, job_id: str, done: int, total: int, rows: int) -> None:
+        with self._lock:
+            job = self._jobs[job_id]
+            job["progress"] = {"done": done, "total": total, "rows": rows}
+            if time.monotonic() - self._last_write.get(job_id, 0.0) >= _PROGRESS_WRITE_SECONDS:
+                self._save(job)
+
+    def _run(self, job_id: str, cat) -> None:
+        job = self._jobs[job_id]
+        try:
+            chunks = self._read_payload(job_id)
+            proxy = _JobCat(cat, job_id, job["user_id"], self)
+            _, result = self._runner(
+                chunks,
+                proxy,
+                job["settings"],
+                lambda done, total, rows: self._set_progress(job_id, done, total, rows),
+            )
+            with self._lock:
+                job.update(
+                    state=DONE,
+                    rows=result.get("rows", 0),
+                    download_url=result.get("download_url"),
+                    downloads=result.get("downloads") or {},
+                    file_path=result.get("file_path"),
+                )
+        except Exception as e:
+            with self._lock:
+                job.update(state=FAILED, error=f"{type(e).__name__}: {e}")
+        finally:
+            # il testo del documento non serve più, né a job completato né a job fallito
+            self._remove_payload(job_id)
+            with self._lock:
+                job["finished_at"] = time.time()
+                self._running.pop(job_id, None)
+                self._save(job)
+            self._dispatch()
+
+
+# Una coda per cartella e per processo, condivisa tra tutte le richieste
+_queues: Dict[str, JobQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_job_queue(jobs_dir: str, runner: Callable, max_workers: int = 2, per_user: int = 1) -> JobQueue:
+    key = os.path.abspath(jobs_dir)
+    with _queues_lock:
+        queue = _queues.get(key)
+        if queue is None:
+            queue = JobQueue(key, runner, max_workers, per_user)
+            _queues[key] = queue
+        else:
+            queue.configure(max_workers, per_user)
+        return queue
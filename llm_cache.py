@@ -0,0 +1,128 @@
+# llm_cache.py
+import os
+import hashlib
+import threading
+from typing import Dict
+
+
+class LLMResponseCache:
+    """
+    Cache persistente delle risposte LLM, indirizzata per contenuto:
+    - chiave = sha256(identità modello + prompt esatto)
+    - un file per voce in cache_dir (scrittura atomica temp + rename)
+    - LRU sulla mtime dei file: ogni hit "tocca" il file, l'eviction elimina i più vecchi
+      finché la dimensione totale rientra in max_bytes
+    """
+
+    def __init__(self, cache_dir: str, max_bytes: int):
+        self.cache_dir = cache_dir
+        self.max_bytes = max(0, int(max_bytes))
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._total_bytes = sum(size for _, _, size in self._entries())
+
+    @staticmethod
+    def make_key(prompt: str, model_id: str = "") -> str:
+        h = hashlib.sha256()
+        h.update((model_id or "").encode("utf-8"))
+        h.update(b"\x00")
+        h.update((prompt or "").encode("utf-8"))
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.txt")
+
+    def _entries(self) -> list[tuple[float, str, int]]:
+        out = []
+        try:
+            names = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return out
+        for name in names:
+            if not name.endswith(".txt"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            out.append((st.st_mtime, path, st.st_size))
+        return out
+
+    def get(self, key: str) -> str | None:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                value = f.read()
+        except (FileNotFoundError, OSError):
+            return None
+        try:
+            os.utime(path, None)  # aggiorna la posizione LRU
+        except OSError:
+            pass
+        return value
+
+    def put(self, key: str, response: str) -> None:
+        if self.max_bytes <= 0:
+            return
+        path = self._path(key)
+        data = str(response).encode("utf-8")
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        with self._lock:
+            self._total_bytes += len(data) - previous
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def discard(self, key: str) -> None:
+        path = self._path(key)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._total_bytes -= size
+
+    def _evict(self) -> None:
+        # ricalcola dal disco: altri processi possono aver scritto nella stessa cartella
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        for _, path, size in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                continue
+        self._total_bytes = total
+
+
+_CACHES: Dict[str, LLMResponseCache] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def get_llm_cache(cache_dir: str, max_bytes: int) -> LLMResponseCache:
+    """
+    Restituisce l'istanza condivisa per cache_dir (una per processo).
+    """
+    key = os.path.abspath(cache_dir)
+    with _CACHES_LOCK:
+        cache = _CACHES.get(key)
+        if cache is None:
+            cache = LLMResponseCache(cache_dir, max_bytes)
+            _CACHES[key] = cache
+        else:
+            cache.max_bytes = max(0, int(max_bytes))
+        return cache
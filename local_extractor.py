@@ -0,0 +1,153 @@
+# local_extractor.py
+import re
+from bisect import bisect_right
+from typing import Any, Collection, Dict, List, Sequence
+
+from .helpers import _norm_key
+from .segmentation import find_clause_headings
+
+# Campi che in modalità ibrida chiediamo ancora al modello (gli altri sono ricavati qui)
+HYBRID_MODEL_KEYS = ["Requirement/Standard Description", "Required Data / Configuration"]
+
+# ----------------- riferimenti normativi (regex compilate una volta) -----------------
+# Rimando a clausola: numero a più livelli introdotto da una parola di rimando ("see 8.1",
+# "clause 22.3", "vedi 7.12"), escludendo valori con unità di misura ("2.5 mm", "0.75 mm2", "1.1 times").
+# Dopo le preposizioni generiche ("of", "in", "to", "and", "(", ...) un numero è un rimando
+# solo se è un'intestazione nota del documento: "factor of 1.5" non lo è, "and 7.12" sì
+_REF_CLAUSE = re.compile(
+    r"(?:(?P<strong>\b(?:sub)?clauses?|\bparagraphs?|\bsections?|\bsee"
+    r"|\bpunt[oi]|\bparagraf[oi]|\bcapitol[oi]|\bclausol[ae]|\bvedere|\bvedi)"
+    r"|\bof|\bin|\bto|\bper|\band|\bor|\bwith|\be|\bo|\()\s*"
+    r"(?P<ref>\d{1,2}(?:\.\d{1,3}){1,4})(?![.,]?\d)"
+    r"(?!\s*(?:mm[2²]?|cm[2²]?|m[2²]?|µm|kg|g|mA|A|kV|V|kW|W|Hz|N|Nm|°C|K|%|s|min|h|bar|Pa|kPa|MPa|l|ml"
+    r"|times|volte|x)(?!\w))",
+    re.IGNORECASE,
+)
+_REF_ANNEX = re.compile(r"\b(?:Annex|ANNEX|Allegato|ALLEGATO|Appendix|Appendice)\s+[A-Z]{1,2}(?:\.\d{1,3})*\b")
+_REF_STANDARD = re.compile(
+    r"\b(?:EN|IEC|ISO|CEI|UNI|CISPR|ASTM|UL|DIN|BS|NF)(?:[ /](?:EN|IEC|ISO|CEI|UNI|TS|TR))*\s?"
+    r"\d{2,6}(?:-\d{1,4})*(?::\d{4}(?:\+A\d{1,2}(?::\d{4})?)*)?"
+)
+_SPACES = re.compile(r"\s+")
+_PROBE_WORDS = 8
+
+
+def _loose_key(key: Any) -> str:
+    # chiavi del modello confrontate senza maiuscole, underscore e spazi doppi/NBSP
+    return _norm_key(str(key).replace("_", " ")).casefold()
+
+
+_LOOSE_HYBRID_KEYS = {_loose_key(k): k for k in HYBRID_MODEL_KEYS}
+
+
+def _model_fields(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Valori dei campi HYBRID_MODEL_KEYS della riga del modello, qualunque sia la grafia delle chiavi."""
+    out: Dict[str, Any] = {}
+    for k, v in row.items():
+        canon = _LOOSE_HYBRID_KEYS.get(_loose_key(k))
+        if canon is not None and canon not in out:
+            out[canon] = v
+    return out
+
+
+def extract_references(text: str, own_number: str = "", known_clauses: Collection[str] = ()) -> str:
+    """
+    Riferimenti citati nel testo (clausole, allegati, altre norme), senza ripetizioni,
+    nell'ordine in cui compaiono; la clausola della riga stessa non è un riferimento.
+    'known_clauses' sono i numeri delle intestazioni del documento: i numeri introdotti da
+    preposizioni generiche valgono come rimando solo se sono tra questi.
+    """
+    found = []
+    for m in _REF_STANDARD.finditer(text):
+        found.append((m.start(), m.group(0)))
+    for m in _REF_ANNEX.finditer(text):
+        found.append((m.start(), _SPACES.sub(" ", m.group(0))))
+    for m in _REF_CLAUSE.finditer(text):
+        if m.group("strong") or m.group("ref") in known_clauses:
+            found.append((m.start("ref"), m.group("ref")))
+    # un numero dentro una norma ("EN 60335-2.1") non è un rimando a clausola
+    spans = [(m.start(), m.end()) for m in _REF_STANDARD.finditer(text)]
+    refs: List[str] = []
+    for pos, ref in sorted(found):
+        if ref == own_number or ref in refs:
+            continue
+        if ref[0].isdigit() and any(a < pos < b for a, b in spans):
+            continue
+        refs.append(ref)
+    return ", ".join(refs)
+
+
+class ClauseIndex:
+    """
+    Indice delle intestazioni sul testo ripulito dei gruppi: permette di risalire a
+    numero e titolo di clausola di qualsiasi porzione di testo senza chiederli al modello.
+    L'indice copre tutto il documento, quindi un gruppo che inizia a metà clausola
+    eredita l'intestazione del gruppo precedente (anche in modalità parallela).
+    """
+
+    def __init__(self, group_texts: Sequence[str], separator: str = "\n"):
+        self.group_offsets: List[int] = []
+        pos = 0
+        for text in group_texts:
+            self.group_offsets.append(pos)
+            pos += len(text) + len(separator)
+        self.group_texts = list(group_texts)
+        self.headings = find_clause_headings(separator.join(group_texts))
+        self._starts = [h["start"] for h in self.headings]
+        self.numbers = frozenset(h["number"] for h in self.headings)
+
+    def clause_at(self, pos: int) -> tuple[str, str]:
+        """(numero, titolo) della clausola che contiene la posizione assoluta pos."""
+        idx = bisect_right(self._starts, pos) - 1
+        if idx < 0:
+            return "", ""
+        h = self.headings[idx]
+        return h["number"], h["title"]
+
+    def locate(self, group_idx: int, description: str, cursor: int = 0) -> int:
+        """
+        Posizione (relativa al gruppo) della descrizione nel testo del gruppo, cercando da cursor;
+        -1 se il modello ha alterato il testo al punto da non ritrovarlo.
+        """
+        text = self.group_texts[group_idx]
+        words = description.split()[:_PROBE_WORDS]
+        if not words:
+            return -1
+        probe = " ".join(words)
+        for start in (cursor, 0):
+            pos = text.find(probe, start)
+            if pos != -1:
+                return pos
+        pattern = re.compile(r"\s*".join(re.escape(w) for w in words))
+        for start in (cursor, 0):
+            m = pattern.search(text, start)
+            if m:
+                return m.start()
+        return -1
+
+    def complete_rows(self, group_idx: int, rows: List[Dict[str, Any]], columns: Sequence[str]) -> List[Dict[str, Any]]:
+        """
+        Completa le righe ibride del modello (descrizione + dati richiesti) con numero, titolo
+        e riferimenti. 'columns' sono le chiavi finali nell'ordine: numero, titolo,
+        descrizione, dati richiesti, riferimenti. Le righe non ritrovate nel testo ereditano
+        la clausola della riga precedente.
+        """
+        no_key, title_key, desc_key, data_key, refs_key = columns
+        base = self.group_offsets[group_idx]
+        cursor = 0
+        out = []
+        for r in rows:
+            r = _model_fields(r)
+            description = str(r.get(HYBRID_MODEL_KEYS[0], "") or "").strip()
+            pos = self.locate(group_idx, description, cursor)
+            if pos != -1:
+                cursor = pos
+            number, title = self.clause_at(base + cursor)
+            out.append({
+                no_key: number,
+                title_key: title,
+                desc_key: description,
+                data_key: str(r.get(HYBRID_MODEL_KEYS[1], "") or "").strip(),
+                refs_key: extract_references(description, number, self.numbers),
+            })
+        return out
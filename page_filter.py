@@ -0,0 +1,109 @@
+# page_filter.py
+import re
+from typing import Any, Dict, List, Sequence, Tuple
+
+# Tipi di pagina non normativa
+COVER = "cover"
+TOC = "toc"
+FOREWORD = "foreword"
+BIBLIOGRAPHY = "bibliography"
+INDEX = "index"
+BLANK = "blank"
+
+# Il testo arriva senza newline (cleaning): le euristiche lavorano su testo continuo.
+# Intestazioni cercate all'inizio della pagina (dopo l'eventuale intestazione di pagina)
+_HEAD_CHARS = 250
+_HEADINGS = [
+    (TOC, re.compile(r"\b(?:table of contents|contents|sommario|indice generale|sommaire|inhaltsverzeichnis|inhalt)\b", re.I)),
+    (INDEX, re.compile(r"\b(?:alphabetical index|subject index|indice analitico|indice alfabetico|index)\b", re.I)),
+    (FOREWORD, re.compile(r"\b(?:european foreword|national foreword|foreword|premessa|prefazione|avant-propos|vorwort)\b", re.I)),
+    (BIBLIOGRAPHY, re.compile(r"\b(?:bibliography|bibliografia|bibliographie|literaturhinweise)\b", re.I)),
+]
+_INDEX_HEADING = re.compile(r"^\W*(?:index|indice)\b", re.I)
+_COPYRIGHT = re.compile(r"\b(?:all rights reserved|tutti i diritti riservati|copyright|©)", re.I)
+# Voce di sommario: "4.2 Marking ........ 12" (punti di guida seguiti dal numero di pagina)
+_DOT_LEADER = re.compile(r"(?:\.\s?){4,}\s*\d{1,4}\b|…+\s*\d{1,4}\b|(?:_\s?){4,}\s*\d{1,4}\b")
+_PAGE_NUMBER = re.compile(r"(?<![\w.])\d{1,4}(?![\w.])")
+_NORMATIVE = re.compile(r"\b(?:shall|must|deve|devono|doit|doivent|muss|müssen)\b", re.I)
+_SCOPE = re.compile(r"\b1\.?\s+(?:Scope|Campo di applicazione|Scopo|Domaine d'application|Anwendungsbereich)\b")
+_CITATION = re.compile(r"\b(?:EN|IEC|ISO|CEI|UNI|CISPR)\s?\d{2,6}")
+
+
+def classify_page(text: str, min_chars: int = 200) -> str:
+    """
+    Tipo di pagina non normativa ("cover", "toc", "foreword", "bibliography", "index", "blank")
+    oppure "" se la pagina va analizzata. Euristiche prudenti: nel dubbio la pagina resta
+    (una pagina in più al modello costa meno di un requisito perso).
+    """
+    body = " ".join(text.split())
+    length = len(body)
+    if length < 20:
+        return BLANK
+    normative = len(_NORMATIVE.findall(body))
+    leaders = len(_DOT_LEADER.findall(body))
+    words = body.split()
+    numbers = len(_PAGE_NUMBER.findall(body))
+    number_density = numbers / max(1, len(words))
+    head = body[:_HEAD_CHARS]
+
+    # Sommario: molte voci con punti di guida e numero di pagina
+    # (prima del controllo su "1 Scope": ogni sommario ha la voce "1 Scope ........ 7")
+    if leaders >= 5 or (leaders >= 2 and _HEADINGS[0][1].search(head)):
+        return TOC
+    if _SCOPE.search(body):
+        return ""  # inizio della parte normativa
+    for kind, pattern in _HEADINGS:
+        if not pattern.search(head):
+            continue
+        if kind == TOC and number_density >= 0.15 and normative <= 1:
+            return TOC
+        if kind == INDEX and (_INDEX_HEADING.search(head) or number_density >= 0.15) and normative <= 1:
+            return INDEX
+        if kind == FOREWORD and normative <= 3:
+            return FOREWORD
+        if kind == BIBLIOGRAPHY and normative <= 1 and len(_CITATION.findall(body)) >= 2:
+            return BIBLIOGRAPHY
+    # Indice analitico senza intestazione: parole chiave seguite da elenchi di pagine
+    if normative == 0 and len(words) >= 60 and number_density >= 0.3:
+        return INDEX
+    if normative == 0 and length < min_chars:
+        return COVER
+    if normative == 0 and _COPYRIGHT.search(body) and length < 4 * min_chars:
+        return COVER
+    return ""
+
+
+def _page_key(chunk: Any, position: int) -> Tuple[Any, Any]:
+    meta = chunk.metadata or {}
+    if "page" in meta:
+        return meta.get("source") or "", meta["page"]
+    return None, position  # senza numero di pagina: ogni chunk fa da pagina
+
+
+def split_non_normative(chunks: Sequence[Any], min_chars: int = 200) -> Tuple[List[Any], List[Any], Dict[str, int]]:
+    """
+    Classifica le pagine (testo dei chunk della stessa pagina) e separa i chunk:
+    (da analizzare, non normativi, {tipo: pagine}). I chunk scartati ricevono
+    metadata "non_normative" = tipo di pagina.
+    """
+    pages: Dict[Tuple[Any, Any], List[Any]] = {}
+    for pos, c in enumerate(chunks):
+        pages.setdefault(_page_key(c, pos), []).append(c)
+    # la soglia di lunghezza vale solo per pagine intere, non per singoli chunk
+    kind_by_page = {
+        key: classify_page(" ".join(c.page_content or "" for c in group), min_chars if key[0] is not None else 0)
+        for key, group in pages.items()
+    }
+
+    kept, skipped, counts = [], [], {}
+    for key, kind in kind_by_page.items():
+        if kind:
+            counts[kind] = counts.get(kind, 0) + 1
+    for pos, c in enumerate(chunks):
+        kind = kind_by_page[_page_key(c, pos)]
+        if kind:
+            c.metadata = dict(c.metadata or {}, non_normative=kind)
+            skipped.append(c)
+        else:
+            kept.append(c)
+    return kept, skipped, counts
@@ -0,0 +1,76 @@
+# partial_snapshot.py
+import os
+import csv
+import time
+from typing import Any, Dict, Iterable, Sequence
+
+from .exporters import _csv_value
+
+
+class PartialSnapshot:
+    """
+    Anteprima CSV delle righe durante un'elaborazione lunga:
+    - le righe nuove (già de-duplicate) vengono accodate al file man mano, senza riscriverlo
+    - due() indica quando pubblicare il link: ogni every_groups gruppi o every_seconds secondi,
+      solo se ci sono righe nuove dall'ultima pubblicazione (flush + fsync prima del link)
+    - se l'elaborazione si interrompe il CSV resta consultabile; a fine run il file finale
+      lo sostituisce (remove())
+    UTF-8 con BOM: Excel apre il CSV con gli accenti corretti.
+    """
+
+    def __init__(self, file_path: str, columns: Sequence[str], every_groups: int = 10, every_seconds: float = 300.0):
+        self.file_path = file_path
+        self.columns = list(columns)
+        self.every_groups = max(0, int(every_groups))
+        self.every_seconds = max(0.0, float(every_seconds))
+        self.rows_written = 0
+        self.published_rows = 0
+        self._groups_since = 0
+        self._last_publish = time.monotonic()
+        os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+        self._fh = open(file_path, "w", encoding="utf-8-sig", newline="")
+        self._writer = csv.writer(self._fh)
+        self._writer.writerow(self.columns)
+
+    def add(self, rows: Iterable[Dict[str, Any]]) -> None:
+        for r in rows:
+            self._writer.writerow([_csv_value(r.get(c, "")) for c in self.columns])
+            self.rows_written += 1
+        # un flush per gruppo: se il processo muore il CSV contiene tutti i gruppi completati
+        self._fh.flush()
+
+    def due(self) -> bool:
+        """Da chiamare a fine gruppo: True se è il momento di pubblicare il link dell'anteprima."""
+        self._groups_since += 1
+        if self.rows_written == self.published_rows:
+            return False
+        elapsed = time.monotonic() - self._last_publish
+        if (self.every_groups and self._groups_since >= self.every_groups) or (
+            self.every_seconds and elapsed >= self.every_seconds
+        ):
+            self._fh.flush()
+            os.fsync(self._fh.fileno())
+            self.published_rows = self.rows_written
+            self._groups_since = 0
+            self._last_publish = time.monotonic()
+            return True
+        return False
+
+    def close(self) -> None:
+        if not self._fh.closed:
+            self._fh.close()
+
+    def __enter__(self) -> "PartialSnapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        # chiude soltanto: se l'elaborazione si è interrotta il CSV parziale resta su disco
+        self.close()
+
+    def remove(self) -> None:
+        """Chiude e rimuove l'anteprima: il file finale ne prende il posto."""
+        self.close()
+        try:
+            os.remove(self.file_path)
+        except OSError:
+            pass
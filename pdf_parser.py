@@ -0,0 +1,183 @@
+# pdf_parser.py
+import os
+import sys
+import site
+import time
+import logging
+import tempfile
+import importlib.util
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterator, List, Tuple
+
+try:
+    from langchain_core.document_loaders.base import BaseBlobParser
+    from langchain_core.documents import Document
+except ImportError:  # versioni del Cat con langchain < 0.1
+    from langchain.document_loaders.base import BaseBlobParser
+    from langchain.docstore.document import Document
+
+log = logging.getLogger(__name__)
+
+# Origine del testo di una pagina (come nel worker)
+TEXT_LAYER = "text"
+OCR = "ocr"
+EMPTY = "empty"
+
+_PAGES_PER_TASK = 16
+_MAX_WORKERS = 8
+# Il worker sta in una cartella a sé, aggiunta a sys.path: i processi spawn lo importano per nome
+_WORKER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "workers")
+_WORKER_MODULE = "standard_analist_pdf_worker"
+
+
+def pdf_parser_available() -> bool:
+    # PyMuPDF (in requirements.txt) viene importato solo alla prima estrazione, non al caricamento del plugin
+    return importlib.util.find_spec("pymupdf") is not None
+
+
+def _worker():
+    # caricato dal file, senza toccare sys.path del Cat; registrato in sys.modules con il nome
+    # che i processi del pool importano (lì la cartella la aggiunge l'initializer)
+    module = sys.modules.get(_WORKER_MODULE)
+    if module is None:
+        path = os.path.join(_WORKER_DIR, f"{_WORKER_MODULE}.py")
+        spec = importlib.util.spec_from_file_location(_WORKER_MODULE, path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[_WORKER_MODULE] = module
+    return module
+
+
+def _pool_context():
+    # niente fork: il server del Cat è multi-thread (uvicorn, job, pool di chiamate LLM) e un fork
+    # con lock tenuti da altri thread può bloccare il figlio. forkserver (dove esiste) o spawn:
+    # processi nuovi che importano il worker per nome (cartella aggiunta dall'initializer del pool)
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def extract_pdf_pages(
+    source: str | bytes,
+    workers: int = 0,
+    min_chars: int = 50,
+    ocr: bool = True,
+    ocr_language: str = "eng",
+    ocr_dpi: int = 300,
+) -> Tuple[List[Tuple[str, str]], Dict[str, Any]]:
+    """
+    Testo grezzo di ogni pagina del PDF ([(testo, origine)] in ordine di pagina) e statistiche
+    (pagine, secondi, pagine/s, pagine OCR, pagine vuote, processi usati).
+    Le pagine vengono distribuite a blocchi su un pool di processi (workers=0: automatico).
+    """
+    t0 = time.perf_counter()
+    tmp_path = None
+    if isinstance(source, (bytes, bytearray)):
+        # i worker riaprono il file dal disco: nessuna copia dei byte per ogni blocco di pagine
+        fd, tmp_path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, "wb") as f:
+            f.write(source)
+        path = tmp_path
+    else:
+        path = str(source)
+    worker = _worker()
+    try:
+        n_pages = worker.page_count(path)
+        if workers <= 0:
+            workers = min(_MAX_WORKERS, os.cpu_count() or 1)
+        ranges = [(s, min(s + _PAGES_PER_TASK, n_pages)) for s in range(0, n_pages, _PAGES_PER_TASK)]
+        workers = min(workers, len(ranges))
+        args = (min_chars, ocr, ocr_language, ocr_dpi)
+        results: List[Tuple[int, str, str]] = []
+        if workers > 1:
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=workers, mp_context=_pool_context(),
+                    initializer=site.addsitedir, initargs=(_WORKER_DIR,),
+                ) as pool:
+                    futures = [pool.submit(worker.extract_pages, path, s, e, *args) for s, e in ranges]
+                    for fut in futures:
+                        results.extend(fut.result())
+            except (BrokenProcessPool, OSError) as e:
+                # pool non avviabile (limiti di processi, __main__ non reimportabile...): estrazione in processo
+                log.warning(f"Pool PDF non disponibile ({e}): estrazione nel processo del Cat")
+                results, workers = [], 1
+        if workers <= 1:
+            workers = 1
+            for s, e in ranges:
+                results.extend(worker.extract_pages(path, s, e, *args))
+    finally:
+        if tmp_path is not None:
+            os.remove(tmp_path)
+
+    results.sort(key=lambda r: r[0])
+    pages = [(text, origin) for _, text, origin in results]
+    seconds = time.perf_counter() - t0
+    stats = {
+        "pages": n_pages,
+        "seconds": round(seconds, 3),
+        "pages_per_second": round(n_pages / seconds, 1) if seconds > 0 else 0.0,
+        "ocr_pages": sum(1 for _, o in pages if o == OCR),
+        "empty_pages": sum(1 for _, o in pages if o == EMPTY),
+        "workers": workers,
+    }
+    return pages, stats
+
+
+class StandardPDFParser(BaseBlobParser):
+    """
+    Parser PDF per le normative: testo nativo pagina per pagina con PyMuPDF su un pool di
+    processi, OCR solo per le pagine senza layer di testo utilizzabile. Il testo resta grezzo (a capo
+    compresi), come con il parser predefinito: il parser vale per tutti gli utenti e tutti i plugin,
+    la pulizia la fa l'hook di questo plugin. Un Document per pagina, con metadata "page" e "text_source";
+    la prima pagina porta anche "pdf_stats" (l'hook per utente ne fa il messaggio in chat e lo rimuove).
+    Il parser è di processo (registrato per tutti gli utenti): niente messaggi diretti, solo log.
+    Se il PDF non si apre si passa al parser di fallback (quello predefinito del Cat).
+    """
+
+    def __init__(
+        self,
+        fallback: BaseBlobParser | None = None,
+        workers: int = 0,
+        min_chars: int = 50,
+        ocr: bool = True,
+        ocr_language: str = "eng",
+    ):
+        self.fallback = fallback
+        self.workers = workers
+        self.min_chars = min_chars
+        self.ocr = ocr
+        self.ocr_language = ocr_language
+
+    def lazy_parse(self, blob) -> Iterator[Document]:
+        try:
+            pages, stats = extract_pdf_pages(
+                str(blob.path) if blob.path and os.path.isfile(str(blob.path)) else blob.as_bytes(),
+                workers=self.workers,
+                min_chars=self.min_chars,
+                ocr=self.ocr,
+                ocr_language=self.ocr_language,
+            )
+        except Exception as e:
+            if self.fallback is None:
+                raise
+            log.warning("Estrazione PDF veloce non riuscita (%s: %s): uso il parser standard", type(e).__name__, e)
+            yield from self.fallback.lazy_parse(blob)
+            return
+
+        source = blob.source or ""
+        log.info(
+            "PDF %s: %d pagine in %.1fs (%.0f pagine/s, %d processi), OCR su %d pagine, %d senza testo",
+            source, stats["pages"], stats["seconds"], stats["pages_per_second"], stats["workers"],
+            stats["ocr_pages"], stats["empty_pages"],
+        )
+        first = True
+        for pno, (text, origin) in enumerate(pages, 1):
+            if text.strip():
+                metadata = {"source": source, "page": pno, "text_source": origin}
+                if first:
+                    metadata["pdf_stats"] = stats
+                    first = False
+                yield Document(page_content=text, metadata=metadata)
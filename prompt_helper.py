@@ -1,74 +1,183 @@
-# ---------- prompt_helper.py ----------    
-
-PROMPT_STD_ANALYSIS ="""Assumi il ruolo di progettista. Analizza il testo normativo fornito, segmentandolo in modo sistematico per garantire la tracciabilità e la completezza dei requisiti.
-## Task
-
-    Analizza esclusivamente il testo normativo fornito, suddividendo ogni capitolo/paragrafo in un numero congruo di segmenti per garantire una tracciabilità puntuale e non ridondante.
-    Per ogni segmento, popola un oggetto JSON secondo lo schema fornito, senza aggiungere testo extra, commenti, formattazioni o codifiche markdown.
-    Compila rigorosamente i seguenti campi per ogni riga:
-        “Chapter/Paragraph No.”
-        “Chapter/Paragraph Title”
-        “Requirement/Standard Description”
-        “Required Data / Configuration”
-        “Regulatory References”
-    Segui le regole di compilazione dettagliate per ogni campo (vedi sezione Vincoli).
-    Lascia eventuali campi non applicabili come stringa vuota (“”).
-
-## Vincoli
-
-    - Output esclusivamente in formato JSON valido, conforme allo schema fornito.
-    - Nessun testo aggiuntivo, nessun commento, nessun markdown, nessuna intestazione o code-fence.
-    - Il campo “Requirement/Standard Description” deve contenere il testo originale della norma, senza alcuna modifica, sintesi, parafrasi o traduzione.
-    - Segmenta i paragrafi lunghi in più righe, riportando per ciascuna riga la porzione esatta di testo corrispondente, per massimizzare la tracciabilità.
-    - Il campo "Chapter/Paragraph No." deve contenere il numero/codice del capitolo/paragrafo deducibile dall’estratto, inserire un identificativo univoco o lasciarlo vuoto solo se impossibile.
-    - Per "Required Data / Configuration", inserisci solo se strettamente necessario (dati, prove, configurazioni minime richieste dal paragrafo); altrimenti lascia vuoto.
-    - Per "Regulatory References", elenca tutti i riferimenti espliciti (clausole, allegati, altre norme), lasciando vuoto se assenti.
-    - Non inserire dati progettuali, valutazioni, interpretazioni, note personali o informazioni non presenti nel testo normativo fornito.
-    - Se nell’analisi del testo normativo vengono individuate tabelle o formule, non riportare il loro contenuto dettagliato nelle righe del JSON. Limìtati a citarle (“Tabella X” o “Formula Y”) dove sono richiamate all’interno del testo, senza descriverne o trascriverne i dettagli nelle righe.
-
-## Formato dell’output
-
-Restituisci solo un oggetto JSON conforme al seguente schema (nessun testo extra):
-
-{
-  "rows": [
-    {
-      "Chapter/Paragraph No.": "",
-      "Chapter/Paragraph Title": "",
-      "Requirement/Standard Description": "",
-      "Required Data / Configuration": "",
-      "Regulatory References": ""
-    }
-    // ... (una riga per ciascun requisito/segmento)
-  ]
-}
-
-## Best Practice
-
-    - Segmenta i paragrafi lunghi in più righe, mantenendo la massima fedeltà al testo originario per ogni porzione.
-    - Utilizza sempre la numerazione ufficiale e i titoli originali.
-
-## Esempio di output atteso
-
-{
-  "rows": [
-    {
-      "Chapter/Paragraph No.": "6.4.1",
-      "Chapter/Paragraph Title": "Electrical requirements",
-      "Requirement/Standard Description": "The appliance shall be constructed so that live parts are not accessible, ...",
-      "Required Data / Configuration": "",
-      "Regulatory References": ""
-    },
-    {
-      "Chapter/Paragraph No.": "6.4.1",
-      "Chapter/Paragraph Title": "Electrical requirements",
-      "Requirement/Standard Description": "Compliance is checked by inspection and by the test of 8.1, ...",
-      "Required Data / Configuration": "Test method as per 8.1",
-      "Regulatory References": "8.1"
-    }
-  ]
-
-## Ultime righe generate:
-Le ultime righe che hai inserito sono: 
-
-}"""
\ No newline at end of file
+# ---------- prompt_helper.py ----------    
+import json
+
+PROMPT_STD_ANALYSIS ="""Assumi il ruolo di progettista. Analizza il testo normativo fornito, segmentandolo in modo sistematico per garantire la tracciabilità e la completezza dei requisiti.
+## Task
+
+    Analizza esclusivamente il testo normativo fornito, suddividendo ogni capitolo/paragrafo in un numero congruo di segmenti per garantire una tracciabilità puntuale e non ridondante.
+    Per ogni segmento, popola un oggetto JSON secondo lo schema fornito, senza aggiungere testo extra, commenti, formattazioni o codifiche markdown.
+    Compila rigorosamente i seguenti campi per ogni riga:
+        “Chapter/Paragraph No.”
+        “Chapter/Paragraph Title”
+        “Requirement/Standard Description”
+        “Required Data / Configuration”
+        “Regulatory References”
+    Segui le regole di compilazione dettagliate per ogni campo (vedi sezione Vincoli).
+    Lascia eventuali campi non applicabili come stringa vuota (“”).
+
+## Vincoli
+
+    - Output esclusivamente in formato JSON valido, conforme allo schema fornito.
+    - Nessun testo aggiuntivo, nessun commento, nessun markdown, nessuna intestazione o code-fence.
+    - Il campo “Requirement/Standard Description” deve contenere il testo originale della norma, senza alcuna modifica, sintesi, parafrasi o traduzione.
+    - Segmenta i paragrafi lunghi in più righe, riportando per ciascuna riga la porzione esatta di testo corrispondente, per massimizzare la tracciabilità.
+    - Il campo "Chapter/Paragraph No." deve contenere il numero/codice del capitolo/paragrafo deducibile dall’estratto, inserire un identificativo univoco o lasciarlo vuoto solo se impossibile.
+    - Per "Required Data / Configuration", inserisci solo se strettamente necessario (dati, prove, configurazioni minime richieste dal paragrafo); altrimenti lascia vuoto.
+    - Per "Regulatory References", elenca tutti i riferimenti espliciti (clausole, allegati, altre norme), lasciando vuoto se assenti.
+    - Non inserire dati progettuali, valutazioni, interpretazioni, note personali o informazioni non presenti nel testo normativo fornito.
+    - Se nell’analisi del testo normativo vengono individuate tabelle o formule, non riportare il loro contenuto dettagliato nelle righe del JSON. Limìtati a citarle (“Tabella X” o “Formula Y”) dove sono richiamate all’interno del testo, senza descriverne o trascriverne i dettagli nelle righe.
+
+## Formato dell’output
+
+Restituisci solo un oggetto JSON conforme al seguente schema (nessun testo extra):
+
+{
+  "rows": [
+    {
+      "Chapter/Paragraph No.": "",
+      "Chapter/Paragraph Title": "",
+      "Requirement/Standard Description": "",
+      "Required Data / Configuration": "",
+      "Regulatory References": ""
+    }
+    // ... (una riga per ciascun requisito/segmento)
+  ]
+}
+
+## Best Practice
+
+    - Segmenta i paragrafi lunghi in più righe, mantenendo la massima fedeltà al testo originario per ogni porzione.
+    - Utilizza sempre la numerazione ufficiale e i titoli originali.
+
+## Esempio di output atteso
+
+{
+  "rows": [
+    {
+      "Chapter/Paragraph No.": "6.4.1",
+      "Chapter/Paragraph Title": "Electrical requirements",
+      "Requirement/Standard Description": "The appliance shall be constructed so that live parts are not accessible, ...",
+      "Required Data / Configuration": "",
+      "Regulatory References": ""
+    },
+    {
+      "Chapter/Paragraph No.": "6.4.1",
+      "Chapter/Paragraph Title": "Electrical requirements",
+      "Requirement/Standard Description": "Compliance is checked by inspection and by the test of 8.1, ...",
+      "Required Data / Configuration": "Test method as per 8.1",
+      "Regulatory References": "8.1"
+    }
+  ]
+
+## Ultime righe generate:
+Le ultime righe che hai inserito sono: 
+
+}"""
+
+PROMPT_PREVIOUS_TEXT_SECTION = """
+(Nessuna riga disponibile: di seguito la parte finale del testo normativo precedente, fornita SOLO come contesto
+per numerazione e titoli. NON estrarre righe da questo contesto.)
+<<<
+{previous_text}
+>>>
+
+## Testo normativo da analizzare:
+"""
+
+# Modalità ibrida: numerazione, titoli e riferimenti sono estratti localmente,
+# al modello si chiedono solo segmentazione e "Required Data / Configuration"
+PROMPT_STD_ANALYSIS_HYBRID = """Assumi il ruolo di progettista. Analizza il testo normativo fornito, segmentandolo in modo sistematico per garantire la tracciabilità e la completezza dei requisiti.
+## Task
+
+    Suddividi il testo normativo fornito in segmenti (uno per requisito), senza omettere parti e senza ridondanze.
+    Per ogni segmento compila SOLO i due campi dello schema:
+        “Requirement/Standard Description”
+        “Required Data / Configuration”
+    Numero e titolo di capitolo/paragrafo e riferimenti normativi vengono ricavati automaticamente: NON riportarli.
+
+## Vincoli
+
+    - Output esclusivamente in formato JSON valido, conforme allo schema fornito.
+    - Nessun testo aggiuntivo, nessun commento, nessun markdown, nessuna intestazione o code-fence.
+    - Il campo “Requirement/Standard Description” deve contenere il testo originale della norma, senza alcuna modifica, sintesi, parafrasi o traduzione, nello stesso ordine del testo.
+    - Segmenta i paragrafi lunghi in più righe, riportando per ciascuna riga la porzione esatta di testo corrispondente.
+    - Per "Required Data / Configuration", inserisci solo se strettamente necessario (dati, prove, configurazioni minime richieste dal paragrafo); altrimenti lascia vuoto.
+    - Non riportare il contenuto dettagliato di tabelle o formule: limìtati a citarle (“Tabella X” o “Formula Y”).
+
+## Formato dell’output
+
+{
+  "rows": [
+    {
+      "Requirement/Standard Description": "",
+      "Required Data / Configuration": ""
+    }
+  ]
+}
+
+## Ultime righe generate:
+Le ultime righe che hai inserito sono: 
+"""
+
+# Nota aggiunta ai tentativi di recupero dopo una risposta non interpretabile
+# ({attempt} rende diverso ogni tentativo: con temperatura 0 lo stesso prompt darebbe la stessa risposta)
+PROMPT_JSON_RETRY_NOTE = """
+ATTENZIONE (tentativo {attempt}): la risposta precedente a questa richiesta non era JSON valido.
+Restituisci esclusivamente il JSON conforme allo schema, completo e chiuso correttamente.
+
+"""
+
+# Protocollo compatto: righe come array posizionali invece di oggetti con chiavi lunghe
+PROMPT_FIELDS_STD = [
+    "Chapter/Paragraph No.",
+    "Chapter/Paragraph Title",
+    "Requirement/Standard Description",
+    "Required Data / Configuration",
+    "Regulatory References",
+]
+PROMPT_FIELDS_HYBRID = [
+    "Requirement/Standard Description",
+    "Required Data / Configuration",
+]
+_COMPACT_EXAMPLE = {
+    "Chapter/Paragraph No.": "6.4.1",
+    "Chapter/Paragraph Title": "Electrical requirements",
+    "Requirement/Standard Description": "Compliance is checked by inspection and by the test of 8.1, ...",
+    "Required Data / Configuration": "Test method as per 8.1",
+    "Regulatory References": "8.1",
+}
+
+PROMPT_COMPACT_OUTPUT_SECTION = """## Formato dell’output
+
+Restituisci solo un oggetto JSON in cui ogni riga è un array di {n} stringhe (formato compatto, senza chiavi).
+Colonne (in ordine): {columns}
+Ogni riga ha sempre {n} elementi nello stesso ordine; usa "" per i campi non applicabili.
+
+## Esempio di output atteso
+
+{example}
+
+"""
+
+
+def build_compact_prompt(prompt: str, fields: list[str]) -> str:
+    """
+    Variante compatta di un prompt: sostituisce schema ed esempio a oggetti
+    (da "## Formato dell’output" a "## Ultime righe generate:") con il formato ad array.
+    """
+    head, _, rest = prompt.partition("## Formato dell’output")
+    schema, marker, tail = rest.partition("## Ultime righe generate:")
+    # le sezioni intermedie che non riguardano il formato restano (es. "## Best Practice")
+    kept = "".join(
+        "## " + block for block in schema.split("## ")[1:]
+        if not block.startswith("Esempio di output")
+    )
+    example = json.dumps({"rows": [[_COMPACT_EXAMPLE.get(f, "") for f in fields]]}, ensure_ascii=False)
+    section = PROMPT_COMPACT_OUTPUT_SECTION.format(
+        n=len(fields),
+        columns=json.dumps(fields, ensure_ascii=False),
+        example=example,
+    )
+    # la coda dei prompt originali chiude l'esempio a oggetti: non serve nel formato compatto
+    tail = tail.replace("\n\n}", "\n")
+    return head + section + kept + marker + tail.replace("sono: ", "sono (stesso formato compatto): ")
@@ -0,0 +1,182 @@
+# rate_limiter.py
+import time
+import threading
+from collections import deque
+from typing import Any, Deque, Dict
+
+from .run_metrics import _percentile
+
+_WAIT_SAMPLES = 2000       # attese recenti conservate per p50/p95
+
+
+class _Waiter:
+    __slots__ = ("user_id", "tokens", "enqueued", "granted")
+
+    def __init__(self, user_id: str, tokens: int):
+        self.user_id = user_id
+        self.tokens = tokens
+        self.enqueued = time.monotonic()
+        self.granted = False
+
+
+class LLMRateLimiter:
+    """
+    Scheduler di processo per le chiamate LLM di tutte le estrazioni (in linea, parallele, job):
+    - due token bucket: richieste/minuto e token/minuto (0 = nessun limite su quella dimensione),
+      capacità pari a burst_seconds di budget, ricarica continua
+    - acquire() blocca finché c'è budget: le chiamate aspettano in coda invece di essere
+      rifiutate dal provider
+    - coda per utente servita a turno (round-robin su user_id): chi accoda 50 gruppi non
+      fa aspettare chi ne ha accodato uno
+    - i token della risposta si conoscono solo dopo: record_output() li addebita al bucket
+      (anche in negativo, le chiamate successive aspettano di più)
+    - stats(): profondità della coda (totale e per utente) e attese, per dimensionare la quota
+    """
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0, burst_seconds: float = 10.0):
+        self._cond = threading.Condition()
+        self._queues: Dict[str, Deque[_Waiter]] = {}
+        self._turns: Deque[str] = deque()       # utenti con richieste in coda, nell'ordine di turno
+        self._waits: Deque[float] = deque(maxlen=_WAIT_SAMPLES)
+        self._granted = 0
+        self._tokens_granted = 0
+        self._wait_total = 0.0
+        self._max_depth = 0
+        self._per_user: Dict[str, Dict[str, float]] = {}
+        self.configure(requests_per_minute, tokens_per_minute, burst_seconds)
+
+    def configure(self, requests_per_minute: int, tokens_per_minute: int, burst_seconds: float = 10.0) -> None:
+        with self._cond:
+            self.rpm = max(0, int(requests_per_minute))
+            self.tpm = max(0, int(tokens_per_minute))
+            self.burst_seconds = max(1.0, float(burst_seconds))
+            self._req_capacity = max(1.0, self.rpm * self.burst_seconds / 60.0)
+            self._tok_capacity = max(1.0, self.tpm * self.burst_seconds / 60.0)
+            self._req_level = self._req_capacity
+            self._tok_level = self._tok_capacity
+            self._refilled = time.monotonic()
+            self._cond.notify_all()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.rpm or self.tpm)
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._refilled
+        self._refilled = now
+        if self.rpm:
+            self._req_level = min(self._req_capacity, self._req_level + elapsed * self.rpm / 60.0)
+        if self.tpm:
+            self._tok_level = min(self._tok_capacity, self._tok_level + elapsed * self.tpm / 60.0)
+
+    def _delay(self, tokens: int) -> float:
+        """Secondi prima che una richiesta da 'tokens' rientri nel budget (0 = subito)."""
+        delay = 0.0
+        if self.rpm and self._req_level < 1.0:
+            delay = (1.0 - self._req_level) * 60.0 / self.rpm
+        if self.tpm:
+            # una richiesta più grande del bucket passa a bucket pieno
+            need = min(float(tokens), self._tok_capacity)
+            if self._tok_level < need:
+                delay = max(delay, (need - self._tok_level) * 60.0 / self.tpm)
+        return delay
+
+    def _dispatch(self) -> float:
+        """Concede le richieste in testa ai turni finché c'è budget; restituisce l'attesa per la prossima."""
+        now = time.monotonic()
+        self._refill(now)
+        while self._turns:
+            user_id = self._turns[0]
+            waiter = self._queues[user_id][0]
+            delay = self._delay(waiter.tokens)
+            if delay > 0:
+                return delay
+            self._req_level -= 1.0
+            self._tok_level -= waiter.tokens
+            waiter.granted = True
+            self._queues[user_id].popleft()
+            self._turns.popleft()
+            if self._queues[user_id]:
+                self._turns.append(user_id)
+            else:
+                del self._queues[user_id]
+            waited = now - waiter.enqueued
+            self._waits.append(waited)
+            self._wait_total += waited
+            self._granted += 1
+            self._tokens_granted += waiter.tokens
+            user = self._per_user.setdefault(user_id, {"requests": 0, "tokens": 0, "wait_seconds": 0.0})
+            user["requests"] += 1
+            user["tokens"] += waiter.tokens
+            user["wait_seconds"] += waited
+            self._cond.notify_all()
+        return 0.0
+
+    def acquire(self, user_id: str, tokens: int = 0) -> float:
+        """Attende il turno e il budget per una chiamata da 'tokens' (stima del prompt); restituisce i secondi di attesa."""
+        if not self.enabled:
+            return 0.0
+        waiter = _Waiter(str(user_id or ""), max(0, int(tokens)))
+        with self._cond:
+            queue = self._queues.get(waiter.user_id)
+            if queue is None:
+                queue = self._queues[waiter.user_id] = deque()
+                self._turns.append(waiter.user_id)
+            queue.append(waiter)
+            self._max_depth = max(self._max_depth, self._depth())
+            while not waiter.granted:
+                delay = self._dispatch()
+                if waiter.granted:
+                    break
+                self._cond.wait(timeout=delay or None)
+        return time.monotonic() - waiter.enqueued
+
+    def record_output(self, user_id: str, tokens: int) -> None:
+        """Addebita i token della risposta (noti solo a chiamata conclusa)."""
+        if not self.tpm or tokens <= 0:
+            return
+        with self._cond:
+            self._refill(time.monotonic())
+            self._tok_level -= tokens
+            self._tokens_granted += tokens
+            user = self._per_user.setdefault(str(user_id or ""), {"requests": 0, "tokens": 0, "wait_seconds": 0.0})
+            user["tokens"] += tokens
+
+    def _depth(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            waits = list(self._waits)
+            return {
+                "requests_per_minute": self.rpm,
+                "tokens_per_minute": self.tpm,
+                "queue_depth": self._depth(),
+                "queue_depth_by_user": {u: len(q) for u, q in self._queues.items()},
+                "queue_depth_max": self._max_depth,
+                "requests_granted": self._granted,
+                "tokens_granted": self._tokens_granted,
+                "wait_seconds_total": round(self._wait_total, 3),
+                "wait_p50": round(_percentile(waits, 50), 3),
+                "wait_p95": round(_percentile(waits, 95), 3),
+                "wait_max": round(max(waits), 3) if waits else 0.0,
+                "by_user": {u: dict(v, wait_seconds=round(v["wait_seconds"], 3)) for u, v in self._per_user.items()},
+            }
+
+
+# Un limitatore per processo, condiviso da tutte le richieste e da tutti i job
+_limiter: LLMRateLimiter | None = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter(requests_per_minute: int, tokens_per_minute: int, burst_seconds: float = 10.0) -> LLMRateLimiter:
+    """Restituisce il limitatore condiviso, aggiornandone i limiti se le impostazioni sono cambiate."""
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = LLMRateLimiter(requests_per_minute, tokens_per_minute, burst_seconds)
+        elif (_limiter.rpm, _limiter.tpm, _limiter.burst_seconds) != (
+            max(0, int(requests_per_minute)), max(0, int(tokens_per_minute)), max(1.0, float(burst_seconds))
+        ):
+            _limiter.configure(requests_per_minute, tokens_per_minute, burst_seconds)
+        return _limiter
@@ -0,0 +1,255 @@
+# requirement_index.py
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Sequence, Tuple
+
+from .helpers import _norm_key, _canonical_key_map, ExcelStreamWriter
+
+_WS = re.compile(r"\s+")
+_DIGIT = re.compile(r"\d")
+_ALPHA = re.compile(r"[a-z]", re.IGNORECASE)
+# Edizione/anno/revisione nel nome file: "EN60335-1_2019.pdf", "std (ed.3).pdf", "norma_v2.pdf";
+# sempre dopo un separatore, così le cifre del numero della norma restano ("ISO 22000" non perde "2000")
+_EDITION = re.compile(
+    r"([ _\-.(]+(?:19|20)\d{2}(?:[-_]\d{2})?|[ _\-.(]+(?:ed(?:ition|izione)?|rev|v)\.?\s?\d+|\s*\(\d+\)|[)\s_\-.]+)$",
+    re.IGNORECASE,
+)
+
+# Fuori da cat/static (servita pubblicamente): l'indice contiene le righe estratte di tutti gli utenti
+DEFAULT_INDEX_PATH = os.path.join("cat", "data", "standard_analist", "requirement_index.sqlite3")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS clauses (
+    family     TEXT NOT NULL,
+    clause     TEXT NOT NULL,
+    text_hash  TEXT NOT NULL,
+    extractor  TEXT NOT NULL,
+    rows_json  TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (family, clause, text_hash)
+);
+CREATE TABLE IF NOT EXISTS editions (
+    edition_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    family     TEXT NOT NULL,
+    document   TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS edition_clauses (
+    edition_id INTEGER NOT NULL,
+    position   INTEGER NOT NULL,
+    clause     TEXT NOT NULL,
+    text_hash  TEXT NOT NULL,
+    PRIMARY KEY (edition_id, position)
+);
+CREATE INDEX IF NOT EXISTS editions_family ON editions (family, edition_id);
+"""
+
+
+def document_family(source: str) -> str:
+    """
+    Famiglia del documento dal nome file, senza estensione né edizione/anno/revisione finali:
+    "EN_60335-1_2012.pdf" e "EN_60335-1_2021.pdf" -> "en_60335-1".
+    """
+    name = os.path.splitext(os.path.basename(str(source or "")))[0]
+    while True:
+        stripped = _EDITION.sub("", name)
+        # il numero della norma resta: "EN 1990" non è un anno (vale per i suffissi solo numerici, non "ed.3"/"v2")
+        numeric = not _ALPHA.search(name[len(stripped):])
+        if stripped == name or (numeric and _DIGIT.search(name) and not _DIGIT.search(stripped)):
+            break
+        name = stripped
+    return _WS.sub(" ", name).strip().lower() or "default"
+
+
+def clause_text_hashes(chunks: Sequence[Any]) -> Dict[str, str]:
+    """
+    {clausola: sha256 del testo sorgente} in ordine di documento, dai chunk pre-segmentati
+    (metadata "clause"). Il testo è normalizzato negli spazi, così un diverso taglio dei chunk
+    della stessa clausola non cambia l'hash.
+    """
+    texts: Dict[str, List[str]] = {}
+    for c in chunks:
+        clause = str((c.metadata or {}).get("clause", "") or "")
+        texts.setdefault(clause, []).append(c.page_content or "")
+    return {
+        clause: hashlib.sha256(_WS.sub(" ", " ".join(parts)).strip().encode("utf-8")).hexdigest()
+        for clause, parts in texts.items()
+    }
+
+
+def row_clause_number(row: Dict[str, Any], number_key: str) -> str:
+    """Valore del numero di capitolo/paragrafo della riga, qualunque sia la grafia della chiave."""
+    target = _norm_key(number_key)
+    for k, v in row.items():
+        if _norm_key(k) == target:
+            return str(v or "").strip()
+    return ""
+
+
+def assign_rows_to_clauses(
+    rows: Sequence[Dict[str, Any]],
+    group_chunks: Sequence[Any],
+    number_key: str,
+    description_key: str,
+) -> List[str]:
+    """
+    Clausola sorgente di ogni riga del gruppo: il numero indicato dal modello se è una clausola
+    del gruppo, altrimenti quella del chunk in cui si ritrova l'inizio della descrizione,
+    altrimenti quella della riga precedente.
+    """
+    clauses = [str((c.metadata or {}).get("clause", "") or "") for c in group_chunks]
+    known = set(clauses)
+    current = clauses[0] if clauses else ""
+    out = []
+    for r in rows:
+        number = row_clause_number(r, number_key)
+        if number in known:
+            current = number
+        else:
+            probe = " ".join(str(r.get(description_key, "") or "").split()[:8])
+            if probe:
+                for clause, c in zip(clauses, group_chunks):
+                    if probe in " ".join((c.page_content or "").split()):
+                        current = clause
+                        break
+        out.append(current)
+    return out
+
+
+class RequirementIndex:
+    """
+    Indice SQLite delle righe estratte, per famiglia di documento:
+    - clauses: righe per (famiglia, clausola, hash del testo), riusabili se l'estrattore
+      (prompt + modello) è lo stesso
+    - editions / edition_clauses: elenco ordinato delle clausole di ogni edizione, per il diff
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Connessione breve per operazione (commit all'uscita): sicura anche tra job concorrenti."""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def reusable_rows(self, family: str, clause_hashes: Dict[str, str], extractor: str) -> Dict[str, List[Dict[str, Any]]]:
+        """{clausola: righe} per le clausole il cui testo è già indicizzato con lo stesso estrattore."""
+        out: Dict[str, List[Dict[str, Any]]] = {}
+        with self._connect() as conn:
+            cur = conn.execute(
+                "SELECT clause, text_hash, rows_json FROM clauses WHERE family = ? AND extractor = ?",
+                (family, extractor),
+            )
+            for clause, text_hash, rows_json in cur:
+                if clause_hashes.get(clause) == text_hash:
+                    out[clause] = json.loads(rows_json)
+        return out
+
+    def latest_edition(self, family: str) -> List[Tuple[str, str, List[Dict[str, Any]]]]:
+        """Clausole dell'ultima edizione indicizzata: [(clausola, hash, righe)] in ordine di documento."""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT edition_id FROM editions WHERE family = ? ORDER BY edition_id DESC LIMIT 1", (family,)
+            ).fetchone()
+            if row is None:
+                return []
+            cur = conn.execute(
+                "SELECT ec.clause, ec.text_hash, c.rows_json FROM edition_clauses ec "
+                "LEFT JOIN clauses c ON c.family = ? AND c.clause = ec.clause AND c.text_hash = ec.text_hash "
+                "WHERE ec.edition_id = ? ORDER BY ec.position",
+                (family, row[0]),
+            )
+            return [(clause, text_hash, json.loads(rows_json or "[]")) for clause, text_hash, rows_json in cur]
+
+    def store_edition(
+        self,
+        family: str,
+        document: str,
+        clause_hashes: Dict[str, str],
+        rows_by_clause: Dict[str, List[Dict[str, Any]]],
+        extractor: str,
+    ) -> None:
+        """
+        Registra la nuova edizione (tutte le clausole, in ordine) e le righe delle clausole
+        estratte in questa esecuzione. Le clausole assenti da rows_by_clause (es. risposta non
+        interpretabile) non vengono indicizzate: alla prossima esecuzione tornano al modello.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            cur = conn.execute(
+                "INSERT INTO editions (family, document, created_at) VALUES (?, ?, ?)", (family, document, now)
+            )
+            edition_id = cur.lastrowid
+            conn.executemany(
+                "INSERT INTO edition_clauses (edition_id, position, clause, text_hash) VALUES (?, ?, ?, ?)",
+                [(edition_id, pos, clause, h) for pos, (clause, h) in enumerate(clause_hashes.items())],
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO clauses (family, clause, text_hash, extractor, rows_json, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (family, clause, clause_hashes[clause], extractor, json.dumps(rows, ensure_ascii=False), now)
+                    for clause, rows in rows_by_clause.items()
+                    if clause in clause_hashes
+                ],
+            )
+
+
+def diff_editions(
+    previous: Sequence[Tuple[str, str, List[Dict[str, Any]]]],
+    current_hashes: Dict[str, str],
+    current_rows: Dict[str, List[Dict[str, Any]]],
+) -> Iterable[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Differenze per clausola tra l'edizione precedente e quella corrente:
+    (change, clausola, riga) con change in "added", "removed", "modified (previous)", "modified (new)".
+    """
+    old = {clause: (h, rows) for clause, h, rows in previous}
+    for clause, h in current_hashes.items():
+        if clause not in old:
+            for r in current_rows.get(clause, []):
+                yield "added", clause, r
+        elif old[clause][0] != h:
+            for r in old[clause][1]:
+                yield "modified (previous)", clause, r
+            for r in current_rows.get(clause, []):
+                yield "modified (new)", clause, r
+    for clause, (h, rows) in old.items():
+        if clause not in current_hashes:
+            for r in rows:
+                yield "removed", clause, r
+
+
+def write_diff_workbook(
+    file_path: str,
+    diff: Iterable[Tuple[str, str, Dict[str, Any]]],
+    columns: Sequence[str],
+    summary: Dict[str, Any],
+) -> int:
+    """
+    Workbook delle differenze tra edizioni: foglio "Diff" (Change + colonne dei requisiti)
+    e foglio "Summary" con i conteggi per clausola. Restituisce le righe scritte.
+    """
+    norm_to_canon = _canonical_key_map(columns)
+    with ExcelStreamWriter(file_path, ["Change", *columns], sheet_name="Diff") as writer:
+        for change, _, r in diff:
+            row = {"Change": change}
+            for k, v in r.items():
+                row.setdefault(norm_to_canon.get(_norm_key(k), k), v)
+            writer.append_dict(row)
+        writer.add_sheet("Summary", [["Metric", "Value"], *([k, v] for k, v in summary.items())])
+    return writer.rows_written
@@ -0,0 +1,83 @@
+# row_store.py
+import sys
+import hashlib
+from typing import Any, Dict, Iterable, Iterator, List
+
+from .helpers import RowSchema
+
+# Sotto questa lunghezza i valori si ripetono spesso (numero, titolo, riferimenti): stringhe internate
+_INTERN_MAX_CHARS = 160
+# Cella vuota (come il NaN di reindex nel percorso DataFrame: nessun valore in Excel)
+_EMPTY = None
+
+
+def _compact_value(v: Any) -> Any:
+    if isinstance(v, str):
+        return sys.intern(v) if len(v) <= _INTERN_MAX_CHARS else v
+    return v
+
+
+class RowStore:
+    """
+    Accumulatore compatto delle righe di un'elaborazione:
+    - una lista per colonna canonica, creata solo quando la colonna riceve il primo valore
+      (le colonne sempre vuote non occupano memoria); valori brevi internati
+    - righe normalizzate con RowSchema all'ingresso (nomi canonici, spazi nei valori)
+    - dedup su digest blake2b a 16 byte della chiave di dedup dello schema, invece di tuple di stringhe
+    - con keep_rows=False tiene solo i digest (righe già persistite altrove, es. nel journal)
+    - iter_values() alimenta direttamente gli export (exporters.export_rows), senza round-trip JSON
+    """
+
+    def __init__(self, schema: RowSchema, keep_rows: bool = True):
+        self.schema = schema
+        self.columns = schema.columns
+        self._known = frozenset(self.columns)
+        self.keep_rows = keep_rows
+        self._data: Dict[str, List[Any]] = {}
+        self._seen: set = set()
+        self._count = 0
+        self.duplicates = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _digest(self, row: Dict[str, Any]) -> bytes:
+        return hashlib.blake2b("\x1f".join(self.schema.dedup_key(row)).encode("utf-8"), digest_size=16).digest()
+
+    def add(self, row: Dict[str, Any]) -> bool:
+        """
+        Aggiunge una riga già normalizzata con lo schema se non è un duplicato;
+        restituisce True se è nuova. Le chiavi fuori dalle colonne non vengono conservate.
+        """
+        digest = self._digest(row)
+        if digest in self._seen:
+            self.duplicates += 1
+            return False
+        self._seen.add(digest)
+        if self.keep_rows:
+            for col, value in row.items():
+                if col not in self._known or value is None or value == "":
+                    continue
+                value = _compact_value(value)
+                values = self._data.get(col)
+                if values is None:
+                    values = self._data[col] = [_EMPTY] * self._count
+                values.append(value)
+            for values in self._data.values():
+                if len(values) == self._count:
+                    values.append(_EMPTY)
+        self._count += 1
+        return True
+
+    def add_many(self, rows: Iterable[Dict[str, Any]], normalized: bool = False) -> List[Dict[str, Any]]:
+        """Righe nuove (non duplicate) tra 'rows', normalizzate con lo schema se non lo sono già."""
+        if not normalized:
+            rows = self.schema.normalize_rows(rows)
+        return [r for r in rows if self.add(r)]
+
+    def iter_values(self) -> Iterator[List[Any]]:
+        """Righe come liste nell'ordine di self.columns."""
+        empty = [_EMPTY] * self._count
+        cols = [self._data.get(c, empty) for c in self.columns]
+        for i in range(self._count if self.keep_rows else 0):
+            yield [col[i] for col in cols]
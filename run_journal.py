@@ -0,0 +1,176 @@
+# run_journal.py
+import os
+import json
+import uuid
+import weakref
+import hashlib
+import threading
+from typing import Any, Dict, Iterator, List, Sequence
+
+try:
+    import fcntl
+except ImportError:  # Windows: resta solo il controllo tra thread dello stesso processo
+    fcntl = None
+
+# Journal condivisi (per documento) in uso in questo processo
+_claimed: set[str] = set()
+_claimed_lock = threading.Lock()
+
+
+def _release(path: str, lock_fh) -> None:
+    with _claimed_lock:
+        if lock_fh is not None:
+            fcntl.flock(lock_fh.fileno(), fcntl.LOCK_UN)
+            lock_fh.close()
+        _claimed.discard(path)
+
+
+def compute_document_hash(chunk_texts: Sequence[str], plan: Sequence[Dict[str, int]]) -> str:
+    """
+    Hash del documento (testo dei chunk) e del piano dei gruppi:
+    lo stesso documento con lo stesso piano riprende dallo stesso journal.
+    """
+    h = hashlib.sha256()
+    for text in chunk_texts:
+        h.update((text or "").encode("utf-8"))
+        h.update(b"\x1e")
+    for g in plan:
+        h.update(f"{g['start']}:{g['end']};".encode("ascii"))
+    return h.hexdigest()
+
+
+class RunJournal:
+    """
+    Journal append-only (JSONL) di un'elaborazione: una riga per gruppo completato
+        {"doc": <hash>, "group": <indice>, "rows": [...]}
+    - commit() scrive e forza su disco la riga del gruppo appena completato
+    - index() ricostruisce {gruppo: offset} per riprendere dopo un riavvio
+    - iter_rows() rilegge le righe in ordine di gruppo, senza tenerle tutte in memoria
+    Righe troncate (crash durante la scrittura) vengono ignorate.
+    Il journal del documento ({hash}.jsonl) appartiene a una sola elaborazione alla volta (lock esclusivo
+    su {hash}.jsonl.lock): se è già in uso da un'altra, questa scrive su un journal suo ({hash}.<run>.jsonl),
+    senza ripresa. remove()/close() agiscono solo sul journal di questa elaborazione.
+    """
+
+    def __init__(self, journal_dir: str, doc_hash: str):
+        self.doc_hash = doc_hash
+        os.makedirs(journal_dir, exist_ok=True)
+        self.path = os.path.join(journal_dir, f"{doc_hash}.jsonl")
+        self._owned = True
+        self._finalizer = None
+        self.shared = self._claim()
+        if not self.shared:
+            self.path = os.path.join(journal_dir, f"{doc_hash}.{uuid.uuid4().hex[:12]}.jsonl")
+        self._index: Dict[int, int] | None = None
+        self._tail_checked = False
+
+    def _claim(self) -> bool:
+        """Lock esclusivo (non bloccante) sul journal del documento; False se un'altra elaborazione lo usa."""
+        with _claimed_lock:
+            if self.path in _claimed:
+                return False
+            if fcntl is not None:
+                lock_path = f"{self.path}.lock"
+                fh = open(lock_path, "a+")
+                try:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    # il lock file potrebbe essere stato rimosso da chi lo teneva prima: vale solo se è ancora quello
+                    if os.fstat(fh.fileno()).st_ino != os.stat(lock_path).st_ino:
+                        raise OSError("lock file sostituito")
+                except OSError:
+                    fh.close()
+                    return False
+            else:
+                fh = None
+            _claimed.add(self.path)
+        # rilascio anche se l'elaborazione si interrompe senza close() (eccezione, job annullato)
+        self._finalizer = weakref.finalize(self, _release, self.path, fh)
+        return True
+
+    def close(self) -> None:
+        """Rilascia il journal (resta su disco per la ripresa); dopo close() remove() non lo tocca più."""
+        if self._finalizer is not None:
+            self._finalizer()
+        self._owned = False
+
+    def index(self) -> Dict[int, int]:
+        """Gruppi già committati -> offset della riga nel file."""
+        index: Dict[int, int] = {}
+        try:
+            with open(self.path, "rb") as f:
+                offset = 0
+                for line in f:
+                    record = self._decode(line)
+                    if record is not None:
+                        index.setdefault(int(record["group"]), offset)
+                    offset += len(line)
+        except FileNotFoundError:
+            pass
+        self._index = index
+        return index
+
+    @staticmethod
+    def _decode(line: bytes) -> Dict[str, Any] | None:
+        if not line.endswith(b"\n"):
+            return None
+        try:
+            record = json.loads(line)
+        except Exception:
+            return None
+        if not isinstance(record, dict) or "group" not in record or not isinstance(record.get("rows"), list):
+            return None
+        return record
+
+    def _tail_separator(self) -> bytes:
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                return b"" if f.read(1) == b"\n" else b"\n"
+        except OSError:
+            return b""
+
+    def read_group(self, offset: int) -> List[dict]:
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            record = self._decode(f.readline())
+        return record["rows"] if record else []
+
+    def commit(self, group_idx: int, rows: List[dict]) -> None:
+        record = {"doc": self.doc_hash, "group": group_idx, "rows": rows}
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        if not self._tail_checked:
+            # una riga troncata da un crash non deve "incollarsi" alla prossima
+            line = self._tail_separator() + line
+            self._tail_checked = True
+        with open(self.path, "ab") as f:
+            offset = f.tell() + (1 if line.startswith(b"\n") else 0)
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        if self._index is not None:
+            self._index.setdefault(group_idx, offset)
+
+    def iter_rows(self) -> Iterator[dict]:
+        """Righe di tutti i gruppi committati, in ordine di gruppo."""
+        index = self.index()
+        if not index:
+            return
+        with open(self.path, "rb") as f:
+            for group_idx in sorted(index):
+                f.seek(index[group_idx])
+                record = self._decode(f.readline())
+                if record:
+                    yield from record["rows"]
+
+    def remove(self) -> None:
+        """Elimina il journal di questa elaborazione (con il suo lock file) e lo rilascia."""
+        if not self._owned:
+            return
+        # il lock file si elimina mentre lo si tiene ancora: chi lo apre dopo ne crea uno nuovo
+        paths = [self.path, f"{self.path}.lock"] if self.shared else [self.path]
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.close()
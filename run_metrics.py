@@ -0,0 +1,143 @@
+# run_metrics.py
+import os
+import math
+import time
+from typing import Any, Dict, List, Sequence
+
+from .tools_registry import atomic_write_json
+
+
+GROUP_COLUMNS = [
+    "group",
+    "chunks",
+    "prompt_chars",
+    "prompt_tokens_est",
+    "response_chars",
+    "llm_seconds",
+    "parse_seconds",
+    "parse_failed",
+    "truncated",
+    "cached",
+    "resumed",
+    "rows",
+    "duplicates",
+    "retries",
+    "recovered_rows",
+]
+
+
+def _percentile(values: Sequence[float], pct: float) -> float:
+    """Percentile nearest-rank (0 se vuoto)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class RunMetrics:
+    """
+    Telemetria di un'elaborazione: un record per gruppo + aggregati di run
+    (p50/p95 latenza LLM, righe/minuto, tasso di errore di parsing, duplicati scartati).
+    """
+
+    def __init__(self, document: str = "", user_id: str = ""):
+        self.document = document
+        self.user_id = user_id
+        self.started_at = time.time()
+        self._t0 = time.perf_counter()
+        self.finished_seconds: float | None = None
+        self.groups: List[Dict[str, Any]] = []
+        self.extra: Dict[str, Any] = {}
+
+    def record_group(
+        self,
+        group: int,
+        chunks: str,
+        prompt_chars: int = 0,
+        response_chars: int = 0,
+        llm_seconds: float = 0.0,
+        parse_seconds: float = 0.0,
+        parse_failed: bool = False,
+        truncated: bool = False,
+        cached: bool = False,
+        resumed: bool = False,
+        rows: int = 0,
+        duplicates: int = 0,
+        retries: int = 0,
+        recovered_rows: int = 0,
+    ) -> None:
+        self.groups.append({
+            "group": group,
+            "chunks": chunks,
+            "prompt_chars": prompt_chars,
+            "prompt_tokens_est": (prompt_chars + 3) // 4,
+            "response_chars": response_chars,
+            "llm_seconds": round(llm_seconds, 4),
+            "parse_seconds": round(parse_seconds, 6),
+            "parse_failed": parse_failed,
+            "truncated": truncated,
+            "cached": cached,
+            "resumed": resumed,
+            "rows": rows,
+            "duplicates": duplicates,
+            "retries": retries,
+            "recovered_rows": recovered_rows,
+        })
+
+    def finish(self) -> None:
+        self.finished_seconds = time.perf_counter() - self._t0
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = self.finished_seconds if self.finished_seconds is not None else time.perf_counter() - self._t0
+        called = [g for g in self.groups if not g["resumed"] and not g["cached"]]
+        latencies = [g["llm_seconds"] for g in called]
+        attempted = [g for g in self.groups if not g["resumed"]]
+        failures = sum(1 for g in attempted if g["parse_failed"])
+        rows = sum(g["rows"] - g["duplicates"] for g in self.groups)
+        out = {
+            "document": self.document,
+            "user_id": self.user_id,
+            "started_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.started_at)),
+            "elapsed_seconds": round(elapsed, 3),
+            "groups": len(self.groups),
+            "llm_calls": len(called),
+            "cache_hits": sum(1 for g in self.groups if g["cached"]),
+            "resumed_groups": sum(1 for g in self.groups if g["resumed"]),
+            "llm_seconds_total": round(sum(latencies), 3),
+            "llm_latency_p50": round(_percentile(latencies, 50), 3),
+            "llm_latency_p95": round(_percentile(latencies, 95), 3),
+            "llm_latency_max": round(max(latencies), 3) if latencies else 0.0,
+            "parse_seconds_total": round(sum(g["parse_seconds"] for g in self.groups), 4),
+            "parse_failures": failures,
+            "failure_rate": round(failures / len(attempted), 4) if attempted else 0.0,
+            "truncated_responses": sum(1 for g in attempted if g["truncated"]),
+            "prompt_chars_total": sum(g["prompt_chars"] for g in self.groups),
+            "response_chars_total": sum(g["response_chars"] for g in self.groups),
+            "rows_produced": sum(g["rows"] for g in self.groups),
+            "duplicates_dropped": sum(g["duplicates"] for g in self.groups),
+            "rows_kept": rows,
+            "rows_per_minute": round(rows / (elapsed / 60.0), 1) if elapsed > 0 else 0.0,
+        }
+        out.update(self.extra)
+        return out
+
+    def sheet_rows(self) -> List[List[Any]]:
+        """
+        Righe per il foglio "Run Stats": blocco metrica/valore, riga vuota, tabella per gruppo.
+        """
+        rows: List[List[Any]] = [["Metric", "Value"]]
+        rows += [[k, v] for k, v in self.summary().items()]
+        rows.append([])
+        rows.append(list(GROUP_COLUMNS))
+        rows += [[g[c] for c in GROUP_COLUMNS] for g in self.groups]
+        return rows
+
+    def write_json(self, path: str) -> None:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        atomic_write_json(
+            path,
+            {"summary": self.summary(), "groups": self.groups},
+            indent=2,
+            ensure_ascii=False,
+        )
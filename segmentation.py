@@ -0,0 +1,199 @@
+# segmentation.py
+import re
+from typing import Any, Dict, List, Sequence
+
+from .helpers import _estimate_tokens
+
+# ----------------- riconoscimento intestazioni di clausola -----------------
+# Dopo il cleaning il testo non ha più newline: un'intestazione si riconosce da
+# inizio testo / fine frase (o titolo precedente incollato, solo per numerazioni a più livelli),
+# numerazione "6.4.1" o "A.2.1" (o "Annex B"), poi una parola maiuscola.
+_HEADING = re.compile(
+    r"(?:^|(?<=\D[.;:!?)\]])|(?<=[.;:!?)\]]\s)|(?<=[a-z])(?=[A-Z0-9]{1,2}\.\d))\s*"
+    r"(?P<num>(?:Annex|ANNEX|Allegato|ALLEGATO)\s+[A-Z]\b|[A-Z](?:\.\d{1,3}){1,4}|\d{1,2}(?:\.\d{1,3}){0,4})"
+    r"\.?\s+(?=[A-Z(])"
+)
+# Fine del titolo: "requirementsThe" (minuscola+Maiuscola incollate), punto o parentesi
+_TITLE_END = re.compile(r"(?<=[a-z0-9)])(?=[A-Z][a-z])|[.:;]\s|\s{2,}")
+_TITLE_MAX = 120
+_TITLE_MAX_WORDS = 10
+_SENTENCE_END = re.compile(r"(?<=[.;:!?])\s+")
+
+
+def _sort_key(number: str) -> tuple:
+    """Chiave di ordinamento della numerazione: i capitoli in lettera (allegati) vengono dopo quelli numerici."""
+    head = number.split()[-1] if " " in number else number
+    parts = []
+    for p in head.split("."):
+        if p.isdigit():
+            parts.append(int(p))
+        else:
+            parts.append(1000 + ord(p[0].upper()))
+    return tuple(parts)
+
+
+def _is_annex(number: str) -> bool:
+    return " " in number
+
+
+def _plausible_next(last: tuple, key: tuple) -> bool:
+    """
+    La numerazione procede per successori: primo figlio (6.4 -> 6.4.1), fratello successivo
+    (6.4.1 -> 6.4.2) o capitolo/sezione successiva (6.4.3 -> 6.5, 6 -> 7), tollerando un salto
+    di uno (intestazione persa). I nuovi livelli devono ripartire da 1.
+    """
+    if not last:
+        return True
+    if key[0] >= 1000 and last[0] < 1000:
+        return all(k == 1 for k in key[1:])  # primo allegato
+    p = 0
+    while p < len(last) and p < len(key) and last[p] == key[p]:
+        p += 1
+    if p == len(key):
+        return False  # uguale o antenato
+    if p == len(last):
+        return all(k == 1 for k in key[p:])
+    return key[p] - last[p] in (1, 2) and all(k == 1 for k in key[p + 1:])
+
+
+def clause_title(text: str, start: int) -> str:
+    """Titolo dopo l'intestazione che inizia in text[start:] (euristica sul testo senza newline)."""
+    window = text[start:start + _TITLE_MAX]
+    m = _TITLE_END.search(window)
+    title = (window[:m.start()] if m else window).strip(" -–—")
+    return " ".join(title.split()[:_TITLE_MAX_WORDS])
+
+
+def find_clause_headings(text: str) -> List[Dict[str, Any]]:
+    """
+    Intestazioni di clausola in ordine di documento: [{"number", "title", "start", "body_start"}].
+    Per limitare i falsi positivi (riferimenti tipo "see 8.1 Test") un numero è accettato
+    solo se è un successore plausibile dell'ultima intestazione accettata.
+    """
+    headings: List[Dict[str, Any]] = []
+    last_key: tuple = ()
+    for m in _HEADING.finditer(text):
+        number = m.group("num")
+        key = _sort_key(number)
+        if not _plausible_next(last_key, key):
+            continue
+        last_key = key
+        headings.append({
+            "number": number,
+            "title": clause_title(text, m.end()),
+            "start": m.start("num"),
+            "body_start": m.end(),
+        })
+    # il titolo non può sconfinare nell'intestazione successiva ("Marking7.1 General")
+    for h, nxt in zip(headings, headings[1:]):
+        limit = nxt["start"] - h["body_start"]
+        if len(h["title"]) > limit:
+            h["title"] = h["title"][:max(0, limit)].strip(" -–—")
+    return headings
+
+
+# ----------------- testo continuo dai chunk (senza overlap) -----------------
+def _overlap(prev: str, nxt: str, max_overlap: int = 4000, probe_len: int = 48) -> int:
+    """Lunghezza del suffisso di prev che coincide con il prefisso di nxt (overlap del text splitter)."""
+    if not prev or not nxt:
+        return 0
+    probe = nxt[:min(probe_len, len(nxt))]
+    lo = max(0, len(prev) - max_overlap)
+    idx = prev.find(probe, lo)
+    while idx != -1:
+        if nxt.startswith(prev[idx:]):
+            return len(prev) - idx
+        idx = prev.find(probe, idx + 1)
+    return 0
+
+
+def merge_chunk_texts(texts: Sequence[str]) -> tuple[str, List[int]]:
+    """
+    Ricompone il testo eliminando le sovrapposizioni tra chunk consecutivi.
+    Restituisce (testo, offset di inizio di ogni chunk nel testo).
+    """
+    parts: List[str] = []
+    offsets: List[int] = []
+    length = 0
+    prev = ""
+    for text in texts:
+        text = text or ""
+        ov = _overlap(prev, text)
+        sep = "" if ov or not parts else " "
+        offsets.append(max(0, length - ov) if ov else length + len(sep))
+        piece = sep + text[ov:]
+        parts.append(piece)
+        length += len(piece)
+        prev = text
+    return "".join(parts), offsets
+
+
+# ----------------- segmentazione allineata alle clausole -----------------
+def _split_long(text: str, max_tokens: int) -> List[str]:
+    """Spezza una clausola troppo lunga su fine frase, restando entro max_tokens."""
+    if _estimate_tokens(text) <= max_tokens:
+        return [text]
+    max_chars = max_tokens * 4
+    pieces, current = [], ""
+    for sentence in _SENTENCE_END.split(text):
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = ""
+        while len(sentence) > max_chars:
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def segment_by_clause(text: str, max_tokens: int) -> List[Dict[str, Any]]:
+    """
+    Unità di testo allineate alle clausole: [{"number", "title", "text", "start"}].
+    Una clausola oltre max_tokens viene divisa su fine frase (le parti mantengono numero e titolo).
+    Il testo prima della prima intestazione forma un'unità senza numero.
+    """
+    headings = find_clause_headings(text)
+    bounds = [(h["start"], h["number"], h["title"]) for h in headings]
+    if not bounds or bounds[0][0] > 0:
+        bounds.insert(0, (0, "", ""))
+    units: List[Dict[str, Any]] = []
+    for idx, (start, number, title) in enumerate(bounds):
+        end = bounds[idx + 1][0] if idx + 1 < len(bounds) else len(text)
+        body = text[start:end].strip()
+        if not body:
+            continue
+        offset = start
+        for piece in _split_long(body, max_tokens):
+            units.append({"number": number, "title": title, "text": piece, "start": offset})
+            offset += len(piece)
+    return units
+
+
+def resegment_chunks(chunks: List[Any], max_tokens: int) -> List[Any]:
+    """
+    Sostituisce i chunk del text splitter con chunk allineati alle clausole:
+    - testo ricomposto senza le sovrapposizioni tra chunk
+    - un chunk per clausola (o parte di clausola entro max_tokens)
+    - metadata copiati dal chunk sorgente in cui inizia la clausola, più "clause" e "clause_title"
+    Se non viene riconosciuta nessuna intestazione restituisce i chunk originali.
+    """
+    if not chunks:
+        return chunks
+    text, offsets = merge_chunk_texts([c.page_content or "" for c in chunks])
+    units = segment_by_clause(text, max_tokens)
+    if not any(u["number"] for u in units):
+        return chunks
+
+    doc_type = type(chunks[0])
+    new_chunks = []
+    src = 0
+    for u in units:
+        while src + 1 < len(offsets) and offsets[src + 1] <= u["start"]:
+            src += 1
+        metadata = dict(getattr(chunks[src], "metadata", None) or {})
+        metadata["clause"] = u["number"]
+        metadata["clause_title"] = u["title"]
+        new_chunks.append(doc_type(page_content=u["text"], metadata=metadata))
+    return new_chunks
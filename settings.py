@@ -1,15 +1,87 @@
-from pydantic import BaseModel
-from cat.mad_hatter.decorators import plugin
-from pydantic import BaseModel, Field, field_validator
-
-
-class MySettings(BaseModel):
-    tool_name: str = "Analizzatore normative"
-
-@plugin
-def settings_model():
-    """
-    Restituisce il modello Pydantic delle impostazioni.
-    Il framework usa questo per validare e salvare i settings.
-    """
+from pydantic import BaseModel
+from cat.mad_hatter.decorators import plugin
+from pydantic import BaseModel, Field, field_validator
+from typing import Literal
+
+
+class MySettings(BaseModel):
+    tool_name: str = "Analizzatore normative"
+    prompt_last_rows_count: int = 4
+    # Estrazione parallela dei gruppi di chunk (opt-in)
+    parallel_extraction: bool = False
+    max_concurrency: int = 4
+    parallel_context_chars: int = 1500
+    # Cache persistente delle risposte LLM (vuoto = cat/data/standard_analist/llm_cache)
+    llm_cache_enabled: bool = True
+    llm_cache_dir: str = ""
+    llm_cache_max_mb: int = 200
+    # Raggruppamento dei chunk a budget di token (0 = gruppi fissi da 3 chunk)
+    group_max_input_tokens: int = 6000
+    group_max_output_tokens: int = 4000
+    output_tokens_ratio: float = 1.3
+    # Pre-segmentazione dei chunk allineata a capitoli/paragrafi
+    clause_segmentation: bool = True
+    # Journal dei gruppi completati per riprendere le elaborazioni interrotte (vuoto = cat/data/standard_analist/journals)
+    resumable_runs: bool = True
+    journal_dir: str = ""
+    # "hybrid": numero, titolo e riferimenti estratti localmente, al modello solo segmentazione e dati richiesti
+    extraction_mode: Literal["llm", "hybrid"] = "llm"
+    # Righe come array posizionali nel dialogo con il modello (meno token per riga)
+    compact_wire: bool = False
+    # Elaborazione in background: coda su disco con limiti globali e per utente (vuoto = cat/data/standard_analist/jobs)
+    background_jobs: bool = False
+    jobs_max_workers: int = 2
+    jobs_per_user: int = 1
+    jobs_dir: str = ""
+    # Indice SQLite dei requisiti per riusare le clausole invariate tra edizioni (vuoto = cat/data/standard_analist/requirement_index.sqlite3)
+    requirement_index: bool = False
+    requirement_index_path: str = ""
+    # Famiglia del documento (vuoto = dal nome file senza anno/edizione)
+    document_family: str = ""
+    # Recupero dei gruppi con risposta non valida: nuovi tentativi, poi bisezione (budget = chiamate extra per run)
+    max_retries: int = 2
+    retry_backoff_seconds: float = 2.0
+    retry_budget: int = 20
+    # Anteprima CSV parziale pubblicata durante l'elaborazione (ogni N gruppi o T secondi)
+    partial_snapshots: bool = True
+    snapshot_every_groups: int = 10
+    snapshot_every_seconds: float = 300.0
+    # PDF con PyMuPDF su pool di processi (0 = automatico), OCR solo per pagine senza testo utilizzabile
+    fast_pdf_parser: bool = True
+    pdf_workers: int = 0
+    pdf_min_text_chars: int = 50
+    pdf_ocr: bool = True
+    pdf_ocr_language: str = "eng"
+    # Pagine non normative (copertina, sommario, premessa, bibliografia, indice analitico):
+    # "mark" = in memoria ma non al modello, "drop" = scartate, "off" = tutte al modello
+    page_filter: Literal["off", "mark", "drop"] = "mark"
+    page_filter_min_chars: int = 200
+    # Chunk di memoria dopo l'analisi: "json" = JSON delle righe al posto del testo,
+    # "row" = un chunk compatto per requisito, "row_batch" = righe accorpate fino a memory_batch_chars
+    memory_chunk_mode: Literal["json", "row", "row_batch"] = "json"
+    memory_batch_chars: int = 1500
+    # Formati dei file risultato, separati da virgola: xlsx, csv, jsonl, parquet (parquet richiede pyarrow)
+    export_formats: str = "xlsx"
+    # Limite LLM condiviso da tutte le analisi del processo (0 = nessun limite): le chiamate oltre
+    # il budget aspettano in coda, a turno tra gli utenti; burst = secondi di budget spendibili di colpo
+    llm_requests_per_minute: int = 0
+    llm_tokens_per_minute: int = 0
+    llm_burst_seconds: float = 10.0
+
+    @field_validator("export_formats")
+    @classmethod
+    def _check_export_formats(cls, v: str) -> str:
+        allowed = ("xlsx", "csv", "jsonl", "parquet")
+        formats = [f.strip().lower() for f in v.split(",") if f.strip()]
+        unknown = [f for f in formats if f not in allowed]
+        if unknown or not formats:
+            raise ValueError(f"formati non validi: {', '.join(unknown) or v!r} (ammessi: {', '.join(allowed)})")
+        return ", ".join(dict.fromkeys(formats))
+
+@plugin
+def settings_model():
+    """
+    Restituisce il modello Pydantic delle impostazioni.
+    Il framework usa questo per validare e salvare i settings.
+    """
     return MySettings
\ No newline at end of file
@@ -1,217 +1,996 @@
-# standard_analysis_bot.py
-
-from cat.mad_hatter.decorators import hook
-from cat.utils import get_static_url
-
-import os
-import json
-import pandas as pd
-from datetime import datetime
-
-from .prompt_helper import PROMPT_STD_ANALYSIS
-from .helpers import _clean_cid_and_control_chars, _extract_json_object
-from .helpers import normalize_rows_and_write_excel
-from .helpers import split_text_into_n_parts
-
-
-def _format_last_rows_section(last_rows: list[dict] | None, max_rows: int = 4) -> str:
-    """
-    Restituisce le ultime N righe in formato JSON da appendere al prompt.
-    """
-    if not last_rows:
-        return ""
-    try:
-        subset = last_rows[-max_rows:] if max_rows > 0 else []
-        return "\n" + json.dumps(subset, ensure_ascii=False) + "\n"
-    except Exception:
-        return "\n" + str(last_rows[-max_rows:] if max_rows > 0 else []) + "\n"
-
-
-@hook  # default priority = 1
-def before_rabbithole_splits_text(docs, cat):
-    settings = cat.mad_hatter.get_plugin().load_settings()
-    tool_key = settings["tool_name"]    
-    max_rows_for_prompt = int(settings.get("prompt_last_rows_count", 4))
-    # ---- Guard: abilita/disabilita tool per utente; fallback=False ----
-    try:
-        with open("cat/static/tools_status.json", "r", encoding="utf-8") as f:
-            ts = json.load(f) or {}
-    except Exception:
-        ts = {}
-
-    uid = str(getattr(cat, "user_id", "") or "")
-    enabled = bool(
-        ts.get("tools", {})
-          .get(tool_key, {})
-          .get("user_id_tool_status", {})
-          .get(uid, False)
-    )
-    # cat.send_ws_message(
-    #     f"ℹ️ {tool_key} {'abilitato' if enabled else 'disabilitato'}.",
-    #     "chat"
-    # )
-    if not enabled:
-        # cat.send_ws_message(
-        #     f"⚠️ {tool_key} disabilitato. Per abilitarlo usa il comando `/tools {tool_key}`.",
-        #     "chat"
-        # )
-        return docs
-
-
-    cleaned_docs = []
-    for doc in docs:
-        cleaned_content = _clean_cid_and_control_chars(doc.page_content or "")
-        if cleaned_content.strip():
-            doc.page_content = cleaned_content
-            cleaned_docs.append(doc)
-    return cleaned_docs
-
-
-@hook  # default priority = 1
-def after_rabbithole_splitted_text(chunks, cat):
-    """
-    - Estrae righe JSON dai chunk a gruppi non sovrapposti
-    - De-duplica le righe già durante l'accumulo
-    - Scrive Excel formattato
-    - Sostituisce i chunk con il JSON pretty corrispondente
-    """
-    settings = cat.mad_hatter.get_plugin().load_settings()
-    tool_key = settings["tool_name"]    
-    # ---- Guard: abilita/disabilita tool per utente; fallback=False ----
-    try:
-        with open("cat/static/tools_status.json", "r", encoding="utf-8") as f:
-            ts = json.load(f) or {}
-    except Exception:
-        ts = {}
-
-    uid = str(getattr(cat, "user_id", "") or "")
-    enabled = bool(
-        ts.get("tools", {})
-          .get(tool_key, {})
-          .get("user_id_tool_status", {})
-          .get(uid, False)
-    )
-    # cat.send_ws_message(
-    #     f"ℹ️ {tool_key} {'abilitato' if enabled else 'disabilitato'}.",
-    #     "chat"
-    # )
-    if not enabled:
-    #     cat.send_ws_message(
-    #     f"ℹ️ {tool_key} {'abilitato' if enabled else 'disabilitato'}.",
-    #     "chat"
-    # )
-        return chunks
-
-    # --- Config colonne ---
-    REQUIRED_KEYS = [
-        "Chapter/Paragraph  No.",
-        "Chapter/Paragraph Title",
-        "Requirement/Standard Description",
-        "Required Data / Configuration",
-        "Regulatory References",
-    ]
-    EXTRA_EMPTY_COLUMNS = [
-        "Attached Documentation",
-        "Value / Design Choice",
-        "Designer Notes",
-        "Risk Assessment",
-        "Mitigation Measures",
-        "Compliant (YES/NO)",
-    ]
-    FINAL_COLUMNS = REQUIRED_KEYS + EXTRA_EMPTY_COLUMNS
-
-    # cat.send_ws_message(
-    #     f"ℹ️ {tool_key} {'abilitato' if enabled else 'disabilitato'}.",
-    #     "chat"
-    # )
-
-    # --- Naming & path ---
-    username = getattr(cat, "user_id", None) or "user"
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"{username}_requirements_{timestamp}.xlsx"
-    static_dir = "cat/static"
-    os.makedirs(static_dir, exist_ok=True)
-    file_path = os.path.join(static_dir, filename)
-
-    # Accumulatore + set per dedup in tempo reale
-    all_rows = []
-    seen_keys = set()  # dedup su (No., Description, References)
-
-    # Memoria locale dell'ultima riga accettata (per il prompt del gruppo successivo)
-    recent_rows_for_prompt: list[dict] = []
-    max_rows_for_prompt = int(settings.get("prompt_last_rows_count", 4))
-
-    # Gruppi non sovrapposti da 3
-    chunk_number = 3
-
-    for i in range(0, len(chunks), chunk_number):
-        group = chunks[i:i + chunk_number]
-        concatenated_content = "\n".join([c.page_content for c in group])
-
-        # Prompt dinamico: aggiunge l'ultima riga generata (se esiste)
-        dynamic_prompt = PROMPT_STD_ANALYSIS + _format_last_rows_section(recent_rows_for_prompt, max_rows_for_prompt)
-
-        # Puoi lasciare cat.llm o passare a cat.run come da discussione precedente
-        response = cat.llm(dynamic_prompt + concatenated_content)
-
-        try:
-            obj = _extract_json_object(response)
-        except Exception as e:
-            start_idx, end_idx = i + 1, min(i + chunk_number, len(chunks))
-            cat.send_ws_message(f"⚠️ Errore JSON nei chunks {start_idx}-{end_idx}: {e}", "chat")
-            # Scrive comunque la risposta raw nei chunk per non perdere info
-            parts = split_text_into_n_parts(str(response), len(group))
-            for j, c in enumerate(group):
-                c.page_content = parts[j]
-            continue
-
-        # ---- Accumulo UNA SOLA VOLTA con dedup in tempo reale ----
-        rows = obj.get("rows")
-        group_rows = rows if isinstance(rows, list) else [obj]
-        for r in group_rows:
-            key = (
-                (r.get("Chapter/Paragraph  No.", "") or "").strip(),
-                (r.get("Requirement/Standard Description", "") or "").strip(),
-                (r.get("Regulatory References", "") or "").strip(),
-            )
-            if key in seen_keys:
-                continue
-            seen_keys.add(key)
-            all_rows.append(r)
-            recent_rows_for_prompt.append(r)
-            recent_rows_for_prompt = recent_rows_for_prompt[-max_rows_for_prompt:]
-
-        # Sostituisci i chunk del gruppo con JSON pretty della risposta (una sola volta)
-        pretty_json = json.dumps({"rows": group_rows}, ensure_ascii=False, indent=2)
-        parts = split_text_into_n_parts(pretty_json, len(group))
-        for j, c in enumerate(group):
-            c.page_content = parts[j]
-
-        # Log avanzamento
-        start_idx, end_idx = i + 1, min(i + chunk_number, len(chunks))
-        cat.send_ws_message(
-            f"📥 Elaborati {start_idx}-{end_idx} di {len(chunks)}. Righe finora: {len(all_rows)}.",
-            "chat"
-        )
-
-    # --- Serializza/Deserializza (stabilizzazione) ---
-    accumulated_dict = {"rows": all_rows}
-    accumulated_str = json.dumps(accumulated_dict, ensure_ascii=False)
-    final_dict = json.loads(accumulated_str)
-
-    # --- Export Excel (con ulteriore dedup a livello DataFrame, per sicurezza) ---
-    rows = final_dict.get("rows", [])
-    if rows:
-        _ = normalize_rows_and_write_excel(
-            rows=rows,
-            required_keys=REQUIRED_KEYS,
-            extra_empty_columns=EXTRA_EMPTY_COLUMNS,
-            final_columns=FINAL_COLUMNS,
-            file_path=file_path,
-        )
-        download_url = f'{get_static_url()}{filename}?v={timestamp}'
-        cat.send_ws_message(f'Excel file created: <a href="{download_url}">Download</a>', "chat")
-    else:
-        cat.send_ws_message("Nessuna riga prodotta: impossibile creare l’Excel.", "chat")
-
-    return chunks
+# standard_analysis_bot.py
+
+from cat.mad_hatter.decorators import hook, tool
+from cat.utils import get_static_url
+
+import os
+import json
+import time
+import hashlib
+import threading
+import pandas as pd
+from datetime import datetime
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from .prompt_helper import PROMPT_STD_ANALYSIS, PROMPT_STD_ANALYSIS_HYBRID, PROMPT_PREVIOUS_TEXT_SECTION
+from .prompt_helper import PROMPT_FIELDS_STD, PROMPT_FIELDS_HYBRID, build_compact_prompt, PROMPT_JSON_RETRY_NOTE
+from .helpers import _clean_cid_and_control_chars, iter_json_rows, decode_compact_rows, encode_compact_rows
+from .helpers import RowSchema
+from .helpers import split_text_into_n_parts, rows_to_memory_chunks
+from .helpers import _estimate_tokens, plan_chunk_groups, plan_fixed_groups, describe_group_plan
+from .llm_cache import LLMResponseCache, get_llm_cache
+from .run_journal import RunJournal, compute_document_hash
+from .tools_registry import is_tool_enabled
+from .run_metrics import RunMetrics
+from .segmentation import resegment_chunks
+from .local_extractor import ClauseIndex, HYBRID_MODEL_KEYS
+from .job_queue import JobQueue, get_job_queue, QUEUED, RUNNING, DONE
+from .requirement_index import RequirementIndex, DEFAULT_INDEX_PATH, document_family, clause_text_hashes
+from .requirement_index import assign_rows_to_clauses, diff_editions, write_diff_workbook
+from .row_store import RowStore
+from .partial_snapshot import PartialSnapshot
+from .exporters import FORMAT_LABELS, export_rows, iter_unique_values, parse_export_formats, parquet_available
+from .pdf_parser import StandardPDFParser, pdf_parser_available
+from .page_filter import split_non_normative
+from .rate_limiter import LLMRateLimiter, get_rate_limiter
+
+# Dati interni del plugin (testo dei documenti, righe, prompt): fuori da cat/static, servita pubblicamente
+DATA_DIR = os.path.join("cat", "data", "standard_analist")
+
+
+def _format_last_rows_section(last_rows: list | None, max_rows: int = 4) -> str:
+    """
+    Restituisce le ultime N righe in formato JSON da appendere al prompt
+    (oggetti o array posizionali, nello stesso formato richiesto al modello).
+    """
+    if not last_rows:
+        return ""
+    try:
+        subset = last_rows[-max_rows:] if max_rows > 0 else []
+        return "\n" + json.dumps(subset, ensure_ascii=False) + "\n"
+    except Exception:
+        return "\n" + str(last_rows[-max_rows:] if max_rows > 0 else []) + "\n"
+
+
+def _format_previous_text_section(previous_text: str | None, max_chars: int = 1500) -> str:
+    """
+    Contesto per la modalità parallela: coda del testo sorgente del gruppo precedente.
+    Non dipende dalla risposta del modello, quindi i gruppi possono partire insieme.
+    """
+    if not previous_text or max_chars <= 0:
+        return "\n"
+    return PROMPT_PREVIOUS_TEXT_SECTION.format(previous_text=previous_text[-max_chars:])
+
+
+def _llm_identity(cat) -> str:
+    """
+    Identità del modello in uso (classe + nome/parametri principali), parte della chiave di cache.
+    """
+    llm = getattr(cat, "_llm", None)
+    if llm is None:
+        return ""
+    parts = [type(llm).__name__]
+    for attr in ("model_name", "model", "model_id", "deployment_name", "temperature"):
+        value = getattr(llm, attr, None)
+        if value is not None and not callable(value):
+            parts.append(f"{attr}={value}")
+    return "|".join(parts)
+
+
+class LLMResult(NamedTuple):
+    response: str
+    seconds: float
+    cache_key: str | None
+    cached: bool
+    prompt_chars: int
+    error: str | None = None
+    queue_seconds: float = 0.0
+
+
+def _timed_llm(
+    cat,
+    prompt: str,
+    cache: LLMResponseCache | None = None,
+    model_id: str = "",
+    limiter: LLMRateLimiter | None = None,
+) -> LLMResult:
+    """
+    Chiama cat.llm (o la cache) misurando l'attesa.
+    Con il limitatore condiviso la chiamata aspetta turno e budget (queue_seconds, esclusi da seconds).
+    Un errore del modello non interrompe l'elaborazione: torna in LLMResult.error.
+    """
+    cache_key = cache.make_key(prompt, model_id) if cache is not None else None
+    t0 = time.perf_counter()
+    if cache is not None:
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return LLMResult(cached, time.perf_counter() - t0, cache_key, True, len(prompt))
+    queued = 0.0
+    user_id = str(getattr(cat, "user_id", "") or "")
+    if limiter is not None:
+        queued = limiter.acquire(user_id, _estimate_tokens(prompt))
+        t0 = time.perf_counter()
+    try:
+        response = cat.llm(prompt)
+    except Exception as e:
+        return LLMResult(
+            "", time.perf_counter() - t0, cache_key, False, len(prompt), f"{type(e).__name__}: {e}", queued
+        )
+    if limiter is not None:
+        limiter.record_output(user_id, _estimate_tokens(str(response or "")))
+    return LLMResult(response, time.perf_counter() - t0, cache_key, False, len(prompt), None, queued)
+
+
+def _iter_parallel_responses(
+    cat,
+    group_texts: list[str],
+    indices: list[int],
+    max_concurrency: int,
+    context_chars: int,
+    cache: LLMResponseCache | None = None,
+    model_id: str = "",
+    base_prompt: str = PROMPT_STD_ANALYSIS,
+    limiter: LLMRateLimiter | None = None,
+):
+    """
+    Lancia i gruppi in 'indices' su un pool limitato a max_concurrency thread e restituisce
+    i risultati di _timed_llm nell'ordine dei gruppi, non in quello di completamento.
+    """
+    prompts = []
+    for idx in indices:
+        previous_text = group_texts[idx - 1] if idx > 0 else None
+        prompts.append(
+            base_prompt
+            + _format_previous_text_section(previous_text, context_chars)
+            + group_texts[idx]
+        )
+    with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        futures = [executor.submit(_timed_llm, cat, p, cache, model_id, limiter) for p in prompts]
+        for fut in futures:
+            yield fut.result()
+
+
+def _parse_rows(response: str, stats: dict, compact: bool = False, wire_columns: list[str] | None = None) -> list[dict]:
+    """
+    Righe della risposta come dizionari (formato compatto riespanso nei nomi canonici).
+    """
+    parsed = iter_json_rows(response, stats)
+    if compact:
+        return decode_compact_rows(parsed, wire_columns)
+    return [r for r in parsed if isinstance(r, dict)]
+
+
+def _recover_group(
+    cat,
+    prefix: str,
+    texts: list[str],
+    retry: dict,
+    model_id: str = "",
+    compact: bool = False,
+    wire_columns: list[str] | None = None,
+    max_retries: int = 2,
+    backoff: float = 2.0,
+    depth: int = 0,
+    limiter: LLMRateLimiter | None = None,
+) -> list[dict] | None:
+    """
+    Recupero di un gruppo senza righe valide:
+    - fino a max_retries nuovi tentativi del gruppo intero (con nota sul formato JSON)
+    - poi bisezione dei chunk: un tentativo per metà, ricorsivamente, solo sulle parti che falliscono
+    - errori del modello ritentati con backoff esponenziale
+    Ogni chiamata consuma retry["budget"] (budget per run). Restituisce le righe recuperate,
+    anche solo da una parte dei chunk, oppure None.
+    """
+    tries = max_retries if depth == 0 else 1
+    errors = 0
+    while tries > 0 and retry["budget"] > 0:
+        retry["budget"] -= 1
+        retry["extra_calls"] += 1
+        note = PROMPT_JSON_RETRY_NOTE.format(attempt=retry["extra_calls"])
+        result = _timed_llm(cat, prefix + note + "\n".join(texts), None, model_id, limiter)
+        retry["llm_seconds"] += result.seconds
+        retry["queue_seconds"] += result.queue_seconds
+        if result.error:
+            errors += 1
+            if errors > max_retries:
+                break
+            time.sleep(backoff * 2 ** (errors - 1))
+            continue
+        stats: dict = {}
+        rows = _parse_rows(result.response, stats, compact, wire_columns)
+        if rows or stats["complete"]:
+            return rows
+        tries -= 1
+    if len(texts) > 1 and retry["budget"] > 0:
+        mid = len(texts) // 2
+        parts = [
+            _recover_group(
+                cat, prefix, half, retry, model_id, compact, wire_columns, max_retries, backoff, depth + 1, limiter
+            )
+            for half in (texts[:mid], texts[mid:])
+        ]
+        if any(p is not None for p in parts):
+            return [r for p in parts if p for r in p]
+    return None
+
+
+@hook  # default priority = 1
+def rabbithole_instantiates_parsers(file_handlers: dict, cat) -> dict:
+    """
+    PDF con PyMuPDF: testo nativo pagina per pagina su un pool di processi, OCR solo
+    per le pagine senza layer di testo; il parser predefinito resta come fallback.
+    """
+    # Il Cat chiama l'hook quando costruisce i file handler, con il CheshireCat (nessun utente):
+    # il parser vale per tutto il processo, quindi niente guard per utente né messaggi in chat qui
+    settings = cat.mad_hatter.get_plugin().load_settings()
+    if not bool(settings.get("fast_pdf_parser", True)) or not pdf_parser_available():
+        return file_handlers
+    file_handlers["application/pdf"] = StandardPDFParser(
+        fallback=file_handlers.get("application/pdf"),
+        workers=int(settings.get("pdf_workers", 0)),
+        min_chars=int(settings.get("pdf_min_text_chars", 50)),
+        ocr=bool(settings.get("pdf_ocr", True)),
+        ocr_language=settings.get("pdf_ocr_language") or "eng",
+    )
+    return file_handlers
+
+
+@hook  # default priority = 1
+def before_rabbithole_splits_text(docs, cat):
+    settings = cat.mad_hatter.get_plugin().load_settings()
+    tool_key = settings["tool_name"]    
+    # Report di StandardPDFParser (parser di processo): tolto dai metadata per tutti, in chat da qui
+    pdf_reports = [r for r in ((doc.metadata or {}).pop("pdf_stats", None) for doc in docs) if r]
+    max_rows_for_prompt = int(settings.get("prompt_last_rows_count", 4))
+    # ---- Guard: abilita/disabilita tool per utente; fallback=False ----
+    uid = str(getattr(cat, "user_id", "") or "")
+    enabled = is_tool_enabled(tool_key, uid)
+    # cat.send_ws_message(
+    #     f"ℹ️ {tool_key} {'abilitato' if enabled else 'disabilitato'}.",
+    #     "chat"
+    # )
+    if not enabled:
+        # cat.send_ws_message(
+        #     f"⚠️ {tool_key} disabilitato. Per abilitarlo usa il comando `/tools {tool_key}`.",
+        #     "chat"
+        # )
+        return docs
+
+    for stats in pdf_reports:
+        cat.send_ws_message(
+            f"📄 PDF: {stats['pages']} pagine in {stats['seconds']:.1f}s ({stats['pages_per_second']:.0f} pagine/s, "
+            f"{stats['workers']} processi), OCR su {stats['ocr_pages']} pagine, {stats['empty_pages']} senza testo.",
+            "chat"
+        )
+
+    cleaned_docs = []
+    for doc in docs:
+        cleaned_content = _clean_cid_and_control_chars(doc.page_content or "")
+        if cleaned_content.strip():
+            doc.page_content = cleaned_content
+            cleaned_docs.append(doc)
+    return cleaned_docs
+
+
+@hook  # default priority = 1
+def after_rabbithole_splitted_text(chunks, cat):
+    """
+    - Estrae righe JSON dai chunk a gruppi non sovrapposti
+    - De-duplica le righe già durante l'accumulo
+    - Scrive Excel formattato
+    - Sostituisce i chunk con il JSON pretty corrispondente
+    """
+    settings = cat.mad_hatter.get_plugin().load_settings()
+    tool_key = settings["tool_name"]    
+    # ---- Guard: abilita/disabilita tool per utente; fallback=False ----
+    uid = str(getattr(cat, "user_id", "") or "")
+    enabled = is_tool_enabled(tool_key, uid)
+    # cat.send_ws_message(
+    #     f"ℹ️ {tool_key} {'abilitato' if enabled else 'disabilitato'}.",
+    #     "chat"
+    # )
+    if not enabled:
+    #     cat.send_ws_message(
+    #     f"ℹ️ {tool_key} {'abilitato' if enabled else 'disabilitato'}.",
+    #     "chat"
+    # )
+        return chunks
+
+    # ---- Elaborazione in background (opt-in): il job viene accodato e l'hook ritorna subito ----
+    if bool(settings.get("background_jobs", False)) and chunks:
+        queue = _job_queue(settings)
+        source = (chunks[0].metadata or {}).get("source", "") if chunks else ""
+        job = queue.submit(cat, chunks, settings, document=str(source))
+        position = queue.position(job["id"])
+        where = f"posizione in coda {position}" if position else "avviato"
+        cat.send_ws_message(
+            f"🕒 Analisi di {source or 'documento'} accodata (job {job['id']}, {where}). "
+            f"Chiedi lo stato delle analisi in corso per l'avanzamento e il link di download.",
+            "chat"
+        )
+        return chunks
+
+    chunks, _ = _run_extraction(chunks, cat, settings)
+    return chunks
+
+
+_reserved_names: set = set()
+_reserved_lock = threading.Lock()
+
+
+def _reserve_output_name(directory: str, base: str, ext: str) -> str:
+    """
+    Nome file libero in directory (base, base_2, ...): con i job in background lo stesso utente
+    può concludere più elaborazioni nello stesso secondo.
+    """
+    with _reserved_lock:
+        name, n = f"{base}{ext}", 1
+        while name in _reserved_names or os.path.exists(os.path.join(directory, name)):
+            n += 1
+            name = f"{base}_{n}{ext}"
+        _reserved_names.add(name)
+        return name
+
+
+def _rate_limiter(settings: dict) -> LLMRateLimiter | None:
+    """Limitatore LLM di processo, oppure None se nessun limite è configurato."""
+    rpm = int(settings.get("llm_requests_per_minute", 0))
+    tpm = int(settings.get("llm_tokens_per_minute", 0))
+    if rpm <= 0 and tpm <= 0:
+        return None
+    return get_rate_limiter(rpm, tpm, float(settings.get("llm_burst_seconds", 10.0)))
+
+
+def _job_queue(settings: dict) -> JobQueue:
+    return get_job_queue(
+        settings.get("jobs_dir") or os.path.join(DATA_DIR, "jobs"),
+        _run_extraction,
+        max_workers=int(settings.get("jobs_max_workers", 2)),
+        per_user=int(settings.get("jobs_per_user", 1)),
+    )
+
+
+def _run_extraction(chunks, cat, settings: dict, progress=None):
+    """
+    Estrazione completa di un documento (in linea nell'hook o dentro un job in background).
+    'progress(done_groups, total_groups, rows)' viene chiamata dopo ogni gruppo.
+    Restituisce (chunks, risultato) con risultato = {"rows", "file_path", "download_url"}
+    (file e link del formato principale, Excel se richiesto) più "downloads" = {formato: link}.
+    """
+    # i file aperti durante il run (anteprima CSV) vengono chiusi anche se l'estrazione si interrompe
+    with ExitStack() as resources:
+        return _extract_document(chunks, cat, settings, progress, resources)
+
+
+def _extract_document(chunks, cat, settings: dict, progress, resources: ExitStack):
+    """Corpo di _run_extraction; 'resources' chiude i file aperti qui a fine run o in caso di eccezione."""
+    outcome = {"rows": 0, "file_path": None, "download_url": None}
+
+    # --- Config colonne ---
+    REQUIRED_KEYS = [
+        "Chapter/Paragraph  No.",
+        "Chapter/Paragraph Title",
+        "Requirement/Standard Description",
+        "Required Data / Configuration",
+        "Regulatory References",
+    ]
+    EXTRA_EMPTY_COLUMNS = [
+        "Attached Documentation",
+        "Value / Design Choice",
+        "Designer Notes",
+        "Risk Assessment",
+        "Mitigation Measures",
+        "Compliant (YES/NO)",
+    ]
+    FINAL_COLUMNS = REQUIRED_KEYS + EXTRA_EMPTY_COLUMNS
+
+    # cat.send_ws_message(
+    #     f"ℹ️ {tool_key} {'abilitato' if enabled else 'disabilitato'}.",
+    #     "chat"
+    # )
+
+    # --- Naming & path ---
+    username = getattr(cat, "user_id", None) or "user"
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    static_dir = "cat/static"
+    os.makedirs(static_dir, exist_ok=True)
+    filename = _reserve_output_name(static_dir, f"{username}_requirements_{timestamp}", ".xlsx")
+    file_path = os.path.join(static_dir, filename)
+
+    # Accumulatore colonnare con dedup in tempo reale su (No., Description, References);
+    # con il journal attivo le righe stanno su disco e qui restano solo le chiavi di dedup
+    schema = RowSchema(FINAL_COLUMNS)
+    store = RowStore(schema, keep_rows=not bool(settings.get("resumable_runs", True)))
+    total_rows = 0
+
+    # Anteprima CSV accodata gruppo per gruppo; il link va in chat ogni N gruppi o T secondi
+    snapshot = None
+    snapshot_name = os.path.splitext(filename)[0] + "_partial.csv"
+    if bool(settings.get("partial_snapshots", True)):
+        snapshot = resources.enter_context(
+            PartialSnapshot(
+                os.path.join(static_dir, snapshot_name),
+                FINAL_COLUMNS,
+                every_groups=int(settings.get("snapshot_every_groups", 10)),
+                every_seconds=float(settings.get("snapshot_every_seconds", 300.0)),
+            )
+        )
+
+    # Memoria locale dell'ultima riga accettata (per il prompt del gruppo successivo)
+    recent_rows_for_prompt: list[dict] = []
+    max_rows_for_prompt = int(settings.get("prompt_last_rows_count", 4))
+
+    # Modalità parallela (opt-in): il contesto è la coda del testo del gruppo precedente,
+    # così nessuna chiamata aspetta la risposta di quella prima
+    parallel = bool(settings.get("parallel_extraction", False))
+    max_concurrency = max(1, int(settings.get("max_concurrency", 4)))
+    context_chars = int(settings.get("parallel_context_chars", 1500))
+
+    # Modalità di estrazione: "llm" (tutte le colonne dal modello) o "hybrid"
+    # (numero, titolo e riferimenti estratti localmente, al modello solo segmentazione e dati richiesti)
+    hybrid = str(settings.get("extraction_mode", "llm")).strip().lower() == "hybrid"
+    base_prompt = PROMPT_STD_ANALYSIS_HYBRID if hybrid else PROMPT_STD_ANALYSIS
+
+    # Protocollo compatto (opt-in): righe come array posizionali, anche nel contesto delle ultime righe;
+    # le righe vengono riespanse nei nomi canonici subito dopo il parsing
+    compact = bool(settings.get("compact_wire", False))
+    wire_columns = HYBRID_MODEL_KEYS if hybrid else REQUIRED_KEYS
+    if compact:
+        base_prompt = build_compact_prompt(base_prompt, PROMPT_FIELDS_HYBRID if hybrid else PROMPT_FIELDS_STD)
+
+    # --- Budget di token per gruppo ---
+    context_tokens = (context_chars + 3) // 4 if parallel else max_rows_for_prompt * 150
+    prompt_tokens = _estimate_tokens(base_prompt) + context_tokens
+    output_ratio = float(settings.get("output_tokens_ratio", 1.3))
+    max_input_tokens = int(settings.get("group_max_input_tokens", 6000))
+    max_output_tokens = int(settings.get("group_max_output_tokens", 4000))
+
+    # --- Filtro pagine non normative (copertina, sommario, premessa, bibliografia, indice analitico) ---
+    # "mark": restano in memoria ma non vanno al modello; "drop": escono anche dalla memoria
+    page_filter = settings.get("page_filter", "mark")
+    skipped_chunks: list = []
+    skipped_pages: dict[str, int] = {}
+    calls_saved = 0
+    if page_filter in ("mark", "drop") and chunks:
+        chunks, skipped_chunks, skipped_pages = split_non_normative(
+            chunks, min_chars=int(settings.get("page_filter_min_chars", 200))
+        )
+        if skipped_chunks:
+            skipped_texts = [c.page_content or "" for c in skipped_chunks]
+            calls_saved = len(
+                plan_chunk_groups(
+                    skipped_texts,
+                    max_input_tokens=max_input_tokens,
+                    prompt_tokens=prompt_tokens,
+                    max_output_tokens=max_output_tokens,
+                    output_ratio=output_ratio,
+                )
+                if max_input_tokens > 0
+                else plan_fixed_groups(skipped_texts, 3, prompt_tokens, output_ratio)
+            )
+            detail = ", ".join(f"{kind} {n}" for kind, n in sorted(skipped_pages.items()))
+            cat.send_ws_message(
+                f"🧹 Pagine non normative escluse dall'analisi: {sum(skipped_pages.values())} ({detail}), "
+                f"circa {calls_saved} chiamate LLM risparmiate.",
+                "chat"
+            )
+            if page_filter == "drop":
+                skipped_chunks = []
+
+    # --- Pre-segmentazione: chunk ricomposti senza overlap e riallineati alle clausole ---
+    if bool(settings.get("clause_segmentation", True)):
+        unit_tokens = max_input_tokens - prompt_tokens if max_input_tokens > 0 else 800
+        if max_output_tokens > 0:
+            unit_tokens = min(unit_tokens, int(max_output_tokens / max(output_ratio, 0.1)))
+        n_before = len(chunks)
+        chunks = resegment_chunks(chunks, max(200, unit_tokens))
+        if len(chunks) != n_before or any("clause" in (c.metadata or {}) for c in chunks[:1]):
+            n_clauses = len({(c.metadata or {}).get("clause") for c in chunks})
+            cat.send_ws_message(
+                f"✂️ Pre-segmentazione: {n_before} chunk → {len(chunks)} unità allineate a {n_clauses} clausole.",
+                "chat"
+            )
+
+    # --- Indice dei requisiti (opt-in): le clausole con testo invariato rispetto a un'edizione
+    # già analizzata non tornano al modello, le loro righe vengono riusate ---
+    source = (chunks[0].metadata or {}).get("source", "") if chunks else ""
+    memory_chunks = chunks + skipped_chunks
+    # Memoria: "json" riscrive i chunk analizzati con il JSON delle righe; "row" / "row_batch"
+    # li sostituiscono con un chunk compatto per riga (o per lotto di righe entro memory_batch_chars)
+    memory_mode = settings.get("memory_chunk_mode", "json")
+    row_memory = memory_mode in ("row", "row_batch")
+    batch_chars = int(settings.get("memory_batch_chars", 1500)) if memory_mode == "row_batch" else 0
+    memory_rows: list = []
+    raw_chunks: list = []
+    req_index = None
+    reused: dict[str, list[dict]] = {}
+    rows_by_clause: dict[str, list[dict]] = {}
+    if bool(settings.get("requirement_index", False)):
+        if any("clause" in (c.metadata or {}) for c in chunks):
+            family = settings.get("document_family") or document_family(source)
+            req_index = RequirementIndex(
+                settings.get("requirement_index_path") or DEFAULT_INDEX_PATH
+            )
+            clause_hashes = clause_text_hashes(chunks)
+            extractor = hashlib.sha256(f"{base_prompt}|{_llm_identity(cat)}".encode("utf-8")).hexdigest()[:16]
+            previous_edition = req_index.latest_edition(family)
+            reused = req_index.reusable_rows(family, clause_hashes, extractor)
+            for clause in clause_hashes:
+                if clause in reused:
+                    reused[clause] = store.add_many(reused[clause])
+                    total_rows += len(reused[clause])
+                    if snapshot is not None:
+                        snapshot.add(reused[clause])
+            if reused:
+                # i chunk delle clausole riusate ricevono subito il JSON delle righe
+                by_clause: dict[str, list] = {}
+                for c in chunks:
+                    by_clause.setdefault(str((c.metadata or {}).get("clause", "") or ""), []).append(c)
+                for clause, rows_ in reused.items():
+                    if row_memory:
+                        first = by_clause[clause][0]
+                        memory_rows.extend(
+                            rows_to_memory_chunks(rows_, REQUIRED_KEYS, type(first), first.metadata or {}, batch_chars)
+                        )
+                        continue
+                    pretty_json = json.dumps({"rows": rows_}, ensure_ascii=False, indent=2)
+                    for c, part in zip(by_clause[clause], split_text_into_n_parts(pretty_json, len(by_clause[clause]))):
+                        c.page_content = part
+                chunks = [c for c in chunks if str((c.metadata or {}).get("clause", "") or "") not in reused]
+            cat.send_ws_message(
+                f"🗂️ Indice requisiti ({family}): {len(reused)} clausole invariate riusate "
+                f"({total_rows} righe), {len(clause_hashes) - len(reused)} da analizzare.",
+                "chat"
+            )
+        else:
+            cat.send_ws_message("⚠️ Indice requisiti non disponibile: serve la pre-segmentazione per clausole.", "chat")
+
+    # --- Piano dei gruppi: chunk consecutivi entro il budget di token (0 = gruppi fissi da 3) ---
+    chunk_texts = [c.page_content or "" for c in chunks]
+    if max_input_tokens > 0:
+        plan = plan_chunk_groups(
+            chunk_texts,
+            max_input_tokens=max_input_tokens,
+            prompt_tokens=prompt_tokens,
+            max_output_tokens=max_output_tokens,
+            output_ratio=output_ratio,
+        )
+    else:
+        plan = plan_fixed_groups(chunk_texts, 3, prompt_tokens, output_ratio)
+    cat.send_ws_message(describe_group_plan(plan, len(chunks)), "chat")
+
+    groups = [chunks[g["start"]:g["end"]] for g in plan]
+    group_texts = ["\n".join(chunk_texts[g["start"]:g["end"]]) for g in plan]
+    clause_index = ClauseIndex(group_texts) if hybrid else None
+
+    # Cache persistente delle risposte (chiave = prompt esatto + identità modello)
+    cache = None
+    if bool(settings.get("llm_cache_enabled", True)):
+        cache = get_llm_cache(
+            settings.get("llm_cache_dir") or os.path.join(DATA_DIR, "llm_cache"),
+            int(float(settings.get("llm_cache_max_mb", 200)) * 1024 * 1024),
+        )
+    model_id = _llm_identity(cat)
+    cache_hits = cache_misses = 0
+
+    # Journal append-only per riprendere dopo riavvii/timeout: i gruppi già committati
+    # per lo stesso documento non vengono richiesti di nuovo al modello
+    journal = None
+    committed: dict[int, int] = {}
+    if bool(settings.get("resumable_runs", True)):
+        journal = RunJournal(
+            settings.get("journal_dir") or os.path.join(DATA_DIR, "journals"),
+            compute_document_hash(chunk_texts, plan),
+        )
+        committed = journal.index()
+        if not journal.shared:
+            cat.send_ws_message(
+                "ℹ️ Lo stesso documento è già in elaborazione: questa esecuzione usa un journal separato, senza ripresa.",
+                "chat"
+            )
+        elif committed:
+            cat.send_ws_message(
+                f"♻️ Ripresa elaborazione: {len(committed)} gruppi su {len(plan)} già completati.",
+                "chat"
+            )
+    pending = [g for g in range(len(plan)) if g not in committed]
+
+    # Limitatore condiviso da tutte le estrazioni del processo (richieste e token al minuto, turni per utente)
+    limiter = _rate_limiter(settings)
+    queue_seconds = 0.0
+
+    responses = (
+        _iter_parallel_responses(
+            cat, group_texts, pending, max_concurrency, context_chars, cache, model_id, base_prompt, limiter
+        )
+        if parallel and pending else None
+    )
+    llm_seconds = 0.0
+
+    # Recupero dei gruppi falliti: tentativi e bisezione entro un budget di chiamate extra per run
+    max_retries = max(0, int(settings.get("max_retries", 2)))
+    retry_backoff = float(settings.get("retry_backoff_seconds", 2.0))
+    retry = {
+        "budget": max(0, int(settings.get("retry_budget", 20))),
+        "extra_calls": 0,
+        "llm_seconds": 0.0,
+        "queue_seconds": 0.0,
+        "recovered_rows": 0,
+        "recovered_groups": 0,
+    }
+    run_started = time.perf_counter()
+    metrics = RunMetrics(document=str(source), user_id=str(username))
+    metrics.extra["extraction_mode"] = "hybrid" if hybrid else "llm"
+    metrics.extra["wire_format"] = "compact" if compact else "objects"
+    if skipped_pages:
+        metrics.extra.update(
+            non_normative_pages=sum(skipped_pages.values()),
+            **{f"non_normative_{kind}": n for kind, n in sorted(skipped_pages.items())},
+            llm_calls_saved=calls_saved,
+        )
+    if req_index is not None:
+        metrics.extra.update(
+            clauses_total=len(clause_hashes),
+            clauses_reused=len(reused),
+            rows_reused=sum(len(r) for r in reused.values()),
+        )
+    local_seconds = 0.0
+
+    for g_idx, group in enumerate(groups):
+        i = plan[g_idx]["start"]
+        concatenated_content = group_texts[g_idx]
+
+        chunk_range = f"{i + 1}-{plan[g_idx]['end']}"
+        if g_idx in committed:
+            # Gruppo già nel journal: nessuna chiamata al modello
+            group_rows = schema.normalize_rows(journal.read_group(committed[g_idx]))
+            group_metrics = {"resumed": True}
+        else:
+            if responses is not None:
+                result = next(responses)
+            else:
+                # Prompt dinamico: aggiunge l'ultima riga generata (se esiste)
+                last_rows = recent_rows_for_prompt
+                if compact:
+                    last_rows = encode_compact_rows(recent_rows_for_prompt, wire_columns)
+                elif hybrid:
+                    # nel formato che il modello deve produrre (solo i campi richiesti)
+                    last_rows = [
+                        {k: r.get(k, "") for k in HYBRID_MODEL_KEYS} for r in recent_rows_for_prompt
+                    ]
+                dynamic_prompt = base_prompt + _format_last_rows_section(last_rows, max_rows_for_prompt)
+
+                # Puoi lasciare cat.llm o passare a cat.run come da discussione precedente
+                result = _timed_llm(cat, dynamic_prompt + concatenated_content, cache, model_id, limiter)
+            response, cache_key, cached = result.response, result.cache_key, result.cached
+            llm_seconds += result.seconds
+            queue_seconds += result.queue_seconds
+            if cache is not None:
+                if cached:
+                    cache_hits += 1
+                else:
+                    cache_misses += 1
+
+            # Parser a passata singola: recupera tutte le righe complete anche da risposte troncate
+            parse_stats: dict = {}
+            t_parse = time.perf_counter()
+            group_rows = _parse_rows(response, parse_stats, compact, wire_columns)
+            group_metrics = {
+                "prompt_chars": result.prompt_chars,
+                "response_chars": len(str(response or "")),
+                "llm_seconds": result.seconds,
+                "parse_seconds": time.perf_counter() - t_parse,
+                "truncated": not parse_stats["complete"],
+                "cached": cached,
+            }
+            recovered = None
+            if not group_rows and not parse_stats["complete"]:
+                # Non riproporre dalla cache una risposta non interpretabile
+                if cache is not None and cached:
+                    cache.discard(cache_key)
+                # Recupero automatico: nuovi tentativi, poi bisezione del gruppo (entro il budget di run)
+                if result.error:
+                    time.sleep(retry_backoff)
+                calls_before = retry["extra_calls"]
+                prefix = dynamic_prompt if responses is None else (
+                    base_prompt
+                    + _format_previous_text_section(group_texts[g_idx - 1] if g_idx > 0 else None, context_chars)
+                )
+                recovered = _recover_group(
+                    cat,
+                    prefix,
+                    chunk_texts[plan[g_idx]["start"]:plan[g_idx]["end"]],
+                    retry,
+                    model_id,
+                    compact,
+                    wire_columns,
+                    max_retries,
+                    retry_backoff,
+                    limiter=limiter,
+                )
+                group_metrics["retries"] = retry["extra_calls"] - calls_before
+            if recovered is None and not group_rows and not parse_stats["complete"]:
+                start_idx, end_idx = i + 1, plan[g_idx]["end"]
+                reason = result.error or "nessuna riga valida nella risposta"
+                cat.send_ws_message(
+                    f"⚠️ Errore JSON nei chunks {start_idx}-{end_idx}: {reason} "
+                    f"(tentativi extra: {group_metrics['retries']}, budget rimasto: {retry['budget']}).",
+                    "chat"
+                )
+                metrics.record_group(g_idx, chunk_range, parse_failed=True, **group_metrics)
+                # Scrive comunque la risposta raw nei chunk per non perdere info
+                parts = split_text_into_n_parts(str(response), len(group))
+                for j, c in enumerate(group):
+                    c.page_content = parts[j]
+                raw_chunks.extend(group)
+                continue
+
+            if recovered is not None:
+                group_rows = recovered
+                group_metrics["recovered_rows"] = len(recovered)
+                retry["recovered_rows"] += len(recovered)
+                retry["recovered_groups"] += 1
+                start_idx, end_idx = i + 1, plan[g_idx]["end"]
+                cat.send_ws_message(
+                    f"🔁 Chunks {start_idx}-{end_idx} recuperati: {len(recovered)} righe con "
+                    f"{group_metrics['retries']} chiamate extra.",
+                    "chat"
+                )
+            elif not parse_stats["complete"]:
+                start_idx, end_idx = i + 1, plan[g_idx]["end"]
+                cat.send_ws_message(
+                    f"⚠️ Risposta incompleta nei chunks {start_idx}-{end_idx}: recuperate "
+                    f"{parse_stats['rows']} righe ({parse_stats['salvaged_bytes']} di {parse_stats['total_bytes']} byte).",
+                    "chat"
+                )
+            elif cache is not None and not cached:
+                # Solo le risposte complete finiscono in cache
+                cache.put(cache_key, response)
+
+            if hybrid:
+                # Numero, titolo e riferimenti dal testo sorgente: stesse colonne della modalità LLM
+                t_local = time.perf_counter()
+                group_rows = clause_index.complete_rows(g_idx, group_rows, REQUIRED_KEYS)
+                local_seconds += time.perf_counter() - t_local
+
+            # Righe normalizzate all'ingresso: chiavi canoniche e spazi, prima di journal, dedup e prompt
+            group_rows = schema.normalize_rows(group_rows)
+            if journal is not None:
+                journal.commit(g_idx, group_rows)
+
+        # ---- Accumulo UNA SOLA VOLTA con dedup in tempo reale ----
+        new_rows = store.add_many(group_rows, normalized=True)
+        total_rows += len(new_rows)
+        if snapshot is not None:
+            snapshot.add(new_rows)
+        metrics.record_group(
+            g_idx, chunk_range, rows=len(group_rows), duplicates=len(group_rows) - len(new_rows), **group_metrics
+        )
+        if req_index is not None:
+            # righe attribuite alla clausola sorgente; anche le clausole senza righe risultano analizzate
+            for clause in (str((c.metadata or {}).get("clause", "") or "") for c in group):
+                rows_by_clause.setdefault(clause, [])
+            for clause, r in zip(
+                assign_rows_to_clauses(new_rows, group, REQUIRED_KEYS[0], REQUIRED_KEYS[2]), new_rows
+            ):
+                rows_by_clause[clause].append(r)
+        recent_rows_for_prompt.extend(new_rows)
+        recent_rows_for_prompt = recent_rows_for_prompt[-max_rows_for_prompt:]
+
+        if row_memory:
+            # Un chunk compatto per riga nuova (i duplicati sono già in memoria)
+            memory_rows.extend(
+                rows_to_memory_chunks(new_rows, REQUIRED_KEYS, type(group[0]), group[0].metadata or {}, batch_chars)
+            )
+        else:
+            # Sostituisci i chunk del gruppo con JSON pretty della risposta (una sola volta)
+            pretty_json = json.dumps({"rows": group_rows}, ensure_ascii=False, indent=2)
+            parts = split_text_into_n_parts(pretty_json, len(group))
+            for j, c in enumerate(group):
+                c.page_content = parts[j]
+
+        # Log avanzamento
+        start_idx, end_idx = i + 1, plan[g_idx]["end"]
+        cache_info = f" Cache: {cache_hits} hit / {cache_misses} miss." if cache is not None else ""
+        cat.send_ws_message(
+            f"📥 Elaborati {start_idx}-{end_idx} di {len(chunks)}. Righe finora: {total_rows}.{cache_info}",
+            "chat"
+        )
+        if progress is not None:
+            progress(g_idx + 1, len(plan), total_rows)
+        if snapshot is not None and snapshot.due():
+            cat.send_ws_message(
+                f"🧾 Anteprima parziale: {snapshot.rows_written} righe (gruppi {g_idx + 1}/{len(plan)}). "
+                f'<a href="{get_static_url()}{snapshot_name}?v={int(time.time())}">Download CSV</a>',
+                "chat"
+            )
+
+    if parallel and pending:
+        wall_seconds = time.perf_counter() - run_started
+        # stima: il tempo sequenziale non viene misurato, è la somma delle latenze dei singoli gruppi
+        speedup = llm_seconds / wall_seconds if wall_seconds > 0 else 1.0
+        cat.send_ws_message(
+            f"⏱️ Estrazione parallela ({max_concurrency} in contemporanea): {wall_seconds:.1f}s effettivi "
+            f"contro ~{llm_seconds:.1f}s stimati in sequenza, somma delle attese LLM per gruppo "
+            f"(speedup stimato ×{speedup:.1f}).",
+            "chat"
+        )
+
+    if row_memory:
+        # restano come testo solo le risposte raw dei gruppi falliti e le pagine non normative ("mark")
+        memory_chunks = memory_rows + raw_chunks + skipped_chunks
+        metrics.extra.update(memory_chunks=len(memory_chunks), memory_chars=sum(len(c.page_content) for c in memory_chunks))
+
+    # --- Statistiche di run: sidecar JSON in cat/static + foglio "Run Stats" nell'Excel ---
+    if hybrid:
+        metrics.extra["local_extract_seconds"] = round(local_seconds, 4)
+    metrics.extra.update(
+        retry_calls=retry["extra_calls"],
+        retry_llm_seconds=round(retry["llm_seconds"], 3),
+        recovered_groups=retry["recovered_groups"],
+        recovered_rows=retry["recovered_rows"],
+        retry_budget_left=retry["budget"],
+    )
+    if limiter is not None:
+        queue_seconds += retry["queue_seconds"]
+        shared = limiter.stats()
+        metrics.extra.update(
+            rate_limit_wait_seconds=round(queue_seconds, 3),
+            rate_limit_queue_depth_max=shared["queue_depth_max"],
+            rate_limit_wait_p95=shared["wait_p95"],
+        )
+        if queue_seconds >= 1.0:
+            cat.send_ws_message(
+                f"🚦 Limite LLM condiviso ({limiter.rpm or '∞'} richieste/min, {limiter.tpm or '∞'} token/min): "
+                f"{queue_seconds:.0f}s di attesa in coda per questa analisi.",
+                "chat"
+            )
+    metrics.finish()
+    metrics.write_json(os.path.splitext(file_path)[0] + "_stats.json")
+    stats = metrics.summary()
+    cat.send_ws_message(
+        f"📊 {stats['llm_calls']} chiamate LLM in {stats['elapsed_seconds']:.0f}s "
+        f"(latenza p50 {stats['llm_latency_p50']:.1f}s, p95 {stats['llm_latency_p95']:.1f}s), "
+        f"{stats['rows_per_minute']:.0f} righe/min, errori di parsing {stats['failure_rate']:.0%}, "
+        f"duplicati scartati {stats['duplicates_dropped']}."
+        + (
+            f" Recuperate {stats['recovered_rows']} righe in {stats['recovered_groups']} gruppi "
+            f"con {stats['retry_calls']} chiamate extra."
+            if stats["retry_calls"] else ""
+        ),
+        "chat"
+    )
+    extra_sheets = {"Run Stats": metrics.sheet_rows()}
+
+    # --- Indice dei requisiti: nuova edizione, workbook delle differenze, righe in ordine di documento ---
+    if req_index is not None:
+        req_index.store_edition(family, str(source), clause_hashes, rows_by_clause, extractor)
+        current_rows = {c: reused.get(c) or rows_by_clause.get(c, []) for c in clause_hashes}
+        if previous_edition:
+            previous_hashes = {c: h for c, h, _ in previous_edition}
+            summary = {
+                "family": family,
+                "clauses_added": sum(1 for c in clause_hashes if c not in previous_hashes),
+                "clauses_removed": sum(1 for c in previous_hashes if c not in clause_hashes),
+                "clauses_modified": sum(
+                    1 for c, h in clause_hashes.items() if c in previous_hashes and previous_hashes[c] != h
+                ),
+                "clauses_unchanged": sum(1 for c, h in clause_hashes.items() if previous_hashes.get(c) == h),
+            }
+            diff_name = os.path.splitext(filename)[0] + "_diff.xlsx"
+            write_diff_workbook(
+                os.path.join(static_dir, diff_name),
+                diff_editions(previous_edition, clause_hashes, current_rows),
+                REQUIRED_KEYS,
+                summary,
+            )
+            cat.send_ws_message(
+                f"🔀 Rispetto all'edizione precedente: {summary['clauses_added']} clausole aggiunte, "
+                f"{summary['clauses_removed']} rimosse, {summary['clauses_modified']} modificate. "
+                f'<a href="{get_static_url()}{diff_name}?v={timestamp}">Download diff</a>',
+                "chat"
+            )
+        ordered_rows = [r for c in clause_hashes for r in current_rows[c]]
+        if journal is not None:
+            journal.remove()
+            journal = None
+        store = RowStore(schema)
+        store.add_many(ordered_rows, normalized=True)
+        total_rows = len(store)
+
+    # --- Export: stesse righe (ordine FINAL_COLUMNS, de-duplicate) in ogni formato scelto ---
+    formats = parse_export_formats(settings.get("export_formats", "xlsx")) or ["xlsx"]
+    if "parquet" in formats and not parquet_available():
+        formats.remove("parquet")
+        formats = formats or ["xlsx"]
+        cat.send_ws_message("⚠️ Export Parquet non disponibile (pyarrow non installato): salto il formato.", "chat")
+    if journal is not None:
+        # righe rilette in streaming dal journal per ogni formato, dedup durante la scrittura
+        n_rows = total_rows
+        values = lambda: iter_unique_values(journal.iter_rows(), schema)
+    else:
+        # direttamente dalle colonne dello store (righe già canoniche e de-duplicate)
+        n_rows = len(store)
+        values = store.iter_values
+
+    if n_rows:
+        exports = export_rows(values, FINAL_COLUMNS, os.path.splitext(file_path)[0], formats, extra_sheets=extra_sheets)
+        downloads = {}
+        links = []
+        for fmt, res in exports.items():
+            if "error" in res:
+                cat.send_ws_message(f"⚠️ Export {fmt} non riuscito: {res['error']}.", "chat")
+                continue
+            url = f'{get_static_url()}{os.path.basename(res["path"])}?v={timestamp}'
+            downloads[fmt] = url
+            links.append(f'<a href="{url}">{FORMAT_LABELS[fmt]}</a> ({res["bytes"] / 1024:.0f} KB, {res["seconds"]:.1f}s)')
+        if len(downloads) == 1:
+            fmt, url = next(iter(downloads.items()))
+            cat.send_ws_message(f'{FORMAT_LABELS[fmt]} file created: <a href="{url}">Download</a>', "chat")
+        elif downloads:
+            cat.send_ws_message(f"Files created: {' · '.join(links)}", "chat")
+        if downloads:
+            primary = "xlsx" if "xlsx" in downloads else next(iter(downloads))
+            outcome.update(
+                rows=n_rows, file_path=exports[primary]["path"], download_url=downloads[primary], downloads=downloads
+            )
+    else:
+        cat.send_ws_message("Nessuna riga prodotta: impossibile creare l’Excel.", "chat")
+
+    # Run concluso, anche senza righe: il journal non deve essere ripreso dalla prossima esecuzione
+    if journal is not None:
+        journal.remove()
+    if snapshot is not None:
+        snapshot.remove()
+
+    return memory_chunks, outcome
+
+
+def _describe_job(job: dict, position: int = 0) -> str:
+    name = job.get("document") or "documento"
+    progress = job.get("progress") or {}
+    if job["state"] == QUEUED:
+        return f"🕒 {name} (job {job['id']}): in coda, posizione {position}."
+    if job["state"] == RUNNING:
+        total = progress.get("total") or "?"
+        return (
+            f"⚙️ {name} (job {job['id']}): in corso, gruppi {progress.get('done', 0)}/{total}, "
+            f"righe {progress.get('rows', 0)}."
+        )
+    if job["state"] == DONE:
+        downloads = job.get("downloads") or {}
+        if len(downloads) > 1:
+            links = " · ".join(f'<a href="{url}">{FORMAT_LABELS.get(fmt, fmt)}</a>' for fmt, url in downloads.items())
+            return f'✅ {name} (job {job["id"]}): completato, {job.get("rows", 0)} righe. {links}'
+        if job.get("download_url"):
+            return f'✅ {name} (job {job["id"]}): completato, {job.get("rows", 0)} righe. <a href="{job["download_url"]}">Download</a>'
+        return f"✅ {name} (job {job['id']}): completato, nessuna riga prodotta."
+    return f"❌ {name} (job {job['id']}): errore — {job.get('error') or 'sconosciuto'}."
+
+
+@tool(return_direct=True)
+def standard_analysis_jobs(tool_input, cat):
+    """Stato delle analisi di normative in background dell'utente: in coda, in corso con avanzamento,
+    completate con link di download. Input: id del job, oppure stringa vuota per tutti i job."""
+    settings = cat.mad_hatter.get_plugin().load_settings()
+    uid = str(getattr(cat, "user_id", "") or "")
+    if not is_tool_enabled(settings["tool_name"], uid):
+        return f"⚠️ {settings['tool_name']} disabilitato."
+
+    queue = _job_queue(settings)
+    queue.attach(cat)  # riprende i job dell'utente rimasti in coda dopo un riavvio
+    wanted = str(tool_input or "").strip()
+    jobs = [j for j in queue.jobs_for_user(uid) if not wanted or j["id"] == wanted]
+    if not jobs:
+        return "Nessuna analisi in background trovata."
+    lines = [_describe_job(j, queue.position(j["id"])) for j in jobs[:20]]
+    limiter = _rate_limiter(settings)
+    if limiter is not None:
+        shared = limiter.stats()
+        lines.append(
+            f"🚦 Limite LLM condiviso: {shared['queue_depth']} chiamate in coda, "
+            f"attesa p95 {shared['wait_p95']:.1f}s (max {shared['wait_max']:.1f}s)."
+        )
+    return "\n".join(lines)
@@ -0,0 +1,49 @@
+# tests/conftest.py
+import os
+import sys
+import types
+import importlib
+
+import pytest
+
+PLUGIN_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Stesso nome di package dei benchmark: i moduli del plugin usano import relativi
+PLUGIN_PACKAGE = "standard_analist_plugin"
+
+
+def plugin_module(name: str):
+    if PLUGIN_PACKAGE not in sys.modules:
+        pkg = types.ModuleType(PLUGIN_PACKAGE)
+        pkg.__path__ = [PLUGIN_DIR]
+        sys.modules[PLUGIN_PACKAGE] = pkg
+    return importlib.import_module(f"{PLUGIN_PACKAGE}.{name}")
+
+
+@pytest.fixture(scope="session")
+def helpers():
+    return plugin_module("helpers")
+
+
+@pytest.fixture(scope="session")
+def row_store():
+    return plugin_module("row_store")
+
+
+@pytest.fixture(scope="session")
+def page_filter():
+    return plugin_module("page_filter")
+
+
+@pytest.fixture(scope="session")
+def rate_limiter():
+    return plugin_module("rate_limiter")
+
+
+@pytest.fixture(scope="session")
+def tools_registry():
+    return plugin_module("tools_registry")
+
+
+@pytest.fixture(scope="session")
+def local_extractor():
+    return plugin_module("local_extractor")
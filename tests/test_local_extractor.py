@@ -0,0 +1,40 @@
+# tests/test_local_extractor.py
+import pytest
+
+COLUMNS = [
+    "Chapter/Paragraph  No.",
+    "Chapter/Paragraph Title",
+    "Requirement/Standard Description",
+    "Required Data / Configuration",
+    "Regulatory References",
+]
+TEXT = (
+    "7.1 Rated voltage marking\nAppliances shall be marked with the rated voltage and the nature of supply.\n"
+    "7.2 Means for disconnection\nStationary appliances shall be provided with means for disconnection, see 22.2.\n"
+)
+
+
+@pytest.mark.parametrize(
+    "desc_key, data_key",
+    [
+        ("Requirement/Standard Description", "Required Data / Configuration"),
+        ("requirement/standard description", "REQUIRED DATA / CONFIGURATION"),
+        ("Requirement/Standard_Description", "Required_Data_/_Configuration"),
+        ("Requirement/Standard\xa0 Description", " Required Data /  Configuration "),
+    ],
+)
+def test_complete_rows_accepts_key_variants(local_extractor, desc_key, data_key):
+    # le chiavi del modello possono differire per maiuscole, underscore e spazi/NBSP
+    index = local_extractor.ClauseIndex([TEXT])
+    rows = index.complete_rows(
+        0,
+        [{desc_key: "Stationary appliances shall be provided with means for disconnection, see 22.2.", data_key: "isolator"}],
+        COLUMNS,
+    )
+    assert rows == [{
+        "Chapter/Paragraph  No.": "7.2",
+        "Chapter/Paragraph Title": rows[0]["Chapter/Paragraph Title"],
+        "Requirement/Standard Description": "Stationary appliances shall be provided with means for disconnection, see 22.2.",
+        "Required Data / Configuration": "isolator",
+        "Regulatory References": "22.2",
+    }]
@@ -0,0 +1,46 @@
+# tests/test_page_filter.py
+
+TOC_PAGE = """Contents
+Foreword ........................................ 4
+Introduction .................................... 5
+1 Scope ......................................... 7
+2 Normative references .......................... 7
+3 Terms and definitions ......................... 8
+4 General requirement ........................... 9
+5 General conditions for the tests .............. 10
+"""
+
+SCOPE_PAGE = """1 Scope
+This International Standard deals with the safety of electric household appliances.
+Appliances not intended for normal household use but which nevertheless may be a source
+of danger to the public are within the scope of this standard. The appliance shall be
+constructed so that it operates safely.
+2 Normative references
+The following documents are referred to in the text.
+"""
+
+
+def test_toc_listing_scope_is_filtered(page_filter):
+    assert page_filter.classify_page(TOC_PAGE) == page_filter.TOC
+
+
+def test_toc_without_heading_is_filtered(page_filter):
+    body = TOC_PAGE.split("\n", 1)[1]
+    assert page_filter.classify_page(body) == page_filter.TOC
+
+
+def test_scope_page_is_kept(page_filter):
+    assert page_filter.classify_page(SCOPE_PAGE) == ""
+
+
+def test_toc_pages_are_split_off(page_filter):
+    class Chunk:
+        def __init__(self, text, page):
+            self.page_content = text
+            self.metadata = {"source": "std.pdf", "page": page}
+
+    chunks = [Chunk(TOC_PAGE, 2), Chunk(SCOPE_PAGE, 7)]
+    kept, skipped, counts = page_filter.split_non_normative(chunks)
+    assert [c.metadata["page"] for c in kept] == [7]
+    assert skipped[0].metadata["non_normative"] == page_filter.TOC
+    assert counts == {page_filter.TOC: 1}
@@ -0,0 +1,83 @@
+# tests/test_rate_limiter.py
+import time
+import threading
+
+
+def _wait_depth(limiter, depth: int, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while limiter.stats()["queue_depth"] < depth:
+        assert time.monotonic() < deadline, "richiesta non accodata"
+        time.sleep(0.002)
+
+
+def _fake_llm_user(limiter, user_id: str, tokens: int, calls: list, lock: threading.Lock) -> None:
+    limiter.acquire(user_id, tokens)
+    with lock:
+        calls.append((user_id, time.monotonic()))
+
+
+def test_queued_users_are_served_round_robin(rate_limiter):
+    # 1000 token/s, bucket da 1000: l'addebito di 1100 token lo porta a -100,
+    # così le 7 richieste da 100 token restano in coda e poi passano una ogni ~0.1s
+    limiter = rate_limiter.LLMRateLimiter(tokens_per_minute=60_000, burst_seconds=1.0)
+    limiter.record_output("warmup", 1100)
+    calls, lock, threads = [], threading.Lock(), []
+    for n, user_id in enumerate(["alice"] * 4 + ["bob"] * 2 + ["carol"], 1):
+        t = threading.Thread(target=_fake_llm_user, args=(limiter, user_id, 100, calls, lock))
+        t.start()
+        threads.append(t)
+        _wait_depth(limiter, n)
+    for t in threads:
+        t.join(timeout=5)
+
+    # chi accoda quattro richieste non fa aspettare chi ne ha accodata una
+    assert [u for u, _ in calls] == ["alice", "bob", "carol", "alice", "bob", "alice", "alice"]
+    stats = limiter.stats()
+    assert stats["queue_depth"] == 0
+    assert stats["queue_depth_max"] == 7
+    assert {u: v["requests"] for u, v in stats["by_user"].items() if v["requests"]} == {
+        "alice": 4, "bob": 2, "carol": 1,
+    }
+
+
+def test_token_bucket_paces_requests(rate_limiter):
+    limiter = rate_limiter.LLMRateLimiter(tokens_per_minute=60_000, burst_seconds=1.0)
+    limiter.record_output("warmup", 1100)
+    calls, lock = [], threading.Lock()
+    threads = [
+        threading.Thread(target=_fake_llm_user, args=(limiter, u, 100, calls, lock))
+        for u in ("alice", "bob", "alice", "bob", "alice")
+    ]
+    start = time.monotonic()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(timeout=5)
+
+    times = [t - start for _, t in calls]
+    # 100 token di debito + 5 richieste da 100 token a 1000 token/s: ~0.6s, una ogni ~0.1s
+    assert times[-1] >= 0.5
+    assert times[-1] < 3.0
+    gaps = [b - a for a, b in zip(times, times[1:])]
+    assert min(gaps) >= 0.07
+
+
+def test_requests_per_minute_burst_then_refill(rate_limiter):
+    # 600 richieste/minuto, burst di 1s: 10 passano subito, le altre a 10 al secondo
+    limiter = rate_limiter.LLMRateLimiter(requests_per_minute=600, burst_seconds=1.0)
+    start = time.monotonic()
+    for _ in range(10):
+        limiter.acquire("alice")
+    assert time.monotonic() - start < 0.2
+    for _ in range(5):
+        limiter.acquire("alice")
+    elapsed = time.monotonic() - start
+    assert 0.4 <= elapsed < 2.0
+    assert limiter.stats()["requests_granted"] == 15
+
+
+def test_disabled_limiter_never_waits(rate_limiter):
+    limiter = rate_limiter.LLMRateLimiter()
+    assert not limiter.enabled
+    assert limiter.acquire("alice", 10_000) == 0.0
+    assert limiter.stats()["requests_granted"] == 0
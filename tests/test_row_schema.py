@@ -0,0 +1,84 @@
+# tests/test_row_schema.py
+import pytest
+
+REQUIRED_KEYS = [
+    "Chapter/Paragraph  No.",
+    "Chapter/Paragraph Title",
+    "Requirement/Standard Description",
+    "Required Data / Configuration",
+    "Regulatory References",
+]
+NO = REQUIRED_KEYS[0]
+DESC = REQUIRED_KEYS[2]
+REFS = REQUIRED_KEYS[4]
+
+
+@pytest.fixture
+def schema(helpers):
+    return helpers.RowSchema(REQUIRED_KEYS)
+
+
+@pytest.mark.parametrize(
+    "raw_key",
+    [
+        "Chapter/Paragraph No.",          # uno spazio invece di due
+        "Chapter/Paragraph\xa0\xa0No.",   # NBSP
+        " Chapter / Paragraph No. ",
+        "Chapter/Paragraph  No.",
+    ],
+)
+def test_normalize_row_maps_number_key_variants(schema, raw_key):
+    row = schema.normalize_row({raw_key: "5.1", DESC: "text"})
+    assert row == {NO: "5.1", DESC: "text"}
+
+
+def test_normalize_row_first_variant_wins(schema):
+    row = schema.normalize_row({"Chapter/Paragraph No.": "5.1", "Chapter/Paragraph  No.": "9.9"})
+    assert row[NO] == "5.1"
+
+
+def test_normalize_row_values(schema):
+    row = schema.normalize_row({
+        DESC: "  The\xa0appliance \t shall\r\nbe  earthed ",
+        "Chapter/Paragraph\xa0Title": "Earthing",
+        "Unknown  column": "  kept as is  ",
+        REFS: 3,
+    })
+    # spazi orizzontali e NBSP collassati, a capo conservato; chiavi sconosciute invariate
+    assert row[DESC] == "The appliance shall\nbe earthed"
+    assert row["Chapter/Paragraph Title"] == "Earthing"
+    assert row["Unknown  column"] == "kept as is"
+    assert row[REFS] == 3
+
+
+def test_dedup_key_ignores_whitespace_and_missing(schema):
+    a = schema.normalize_row({"Chapter/Paragraph No.": "5.1", DESC: "The appliance shall\nbe earthed"})
+    b = schema.normalize_row({NO: " 5.1", DESC: "The  appliance\xa0shall be   earthed", REFS: ""})
+    assert schema.dedup_key(a) == schema.dedup_key(b) == ("5.1", "The appliance shall be earthed", "")
+
+
+def test_dedup_key_keeps_distinct_rows(schema):
+    a = schema.normalize_row({NO: "5.1", DESC: "text", REFS: "8.1"})
+    b = schema.normalize_row({NO: "5.1", DESC: "text", REFS: "8.2"})
+    assert schema.dedup_key(a) != schema.dedup_key(b)
+
+
+def test_row_store_add_many_drops_whitespace_only_repeats(helpers, row_store):
+    store = row_store.RowStore(helpers.RowSchema(REQUIRED_KEYS))
+    rows = [
+        {NO: "5.1", DESC: "The appliance shall be earthed", REFS: "IEC 60335-1"},
+        {"Chapter/Paragraph No.": "5.1 ", DESC: "The  appliance shall\nbe earthed", REFS: "IEC\xa060335-1"},
+        {"Chapter/Paragraph\xa0No.": "5.1", DESC: "\tThe appliance shall be earthed\n", REFS: " IEC 60335-1"},
+        {NO: "5.2", DESC: "The appliance shall be earthed", REFS: "IEC 60335-1"},
+    ]
+    added = store.add_many(rows)
+    assert [r[NO] for r in added] == ["5.1", "5.2"]
+    assert len(store) == 2
+    assert store.duplicates == 2
+    # il secondo lotto con gli stessi requisiti non aggiunge nulla
+    assert store.add_many(rows[1:3]) == []
+    assert store.duplicates == 4
+    assert [v[:3] for v in store.iter_values()] == [
+        ["5.1", None, "The appliance shall be earthed"],
+        ["5.2", None, "The appliance shall be earthed"],
+    ]
@@ -0,0 +1,111 @@
+# tests/test_tools_registry.py
+import os
+import json
+import threading
+import multiprocessing
+
+import pytest
+
+TOOL = "Analizzatore normative"
+WRITERS = 4
+INCREMENTS = 25
+
+fork = pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="serve il fork per i processi writer"
+)
+
+
+def _increment(tools_registry, worker: int) -> None:
+    for _ in range(INCREMENTS):
+        def _mutate(data):
+            users = data["tools"].setdefault(TOOL, {}).setdefault("user_id_tool_status", {})
+            users["always_on"] = True
+            counters = data.setdefault("counters", {})
+            counters[f"w{worker}"] = counters.get(f"w{worker}", 0) + 1
+            # padding: file abbastanza grande da rendere visibile una scrittura a metà
+            data["padding"] = "x" * 20000
+        tools_registry.update_tools_status(_mutate)
+
+
+def _read_loop(tools_registry, path: str, stop: threading.Event, errors: list) -> None:
+    while not stop.is_set():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if not data["tools"][TOOL]["user_id_tool_status"]["always_on"]:
+                errors.append("always_on perso")
+        except FileNotFoundError:
+            continue
+        except Exception as e:  # file troncato o vuoto
+            errors.append(f"{type(e).__name__}: {e}")
+        if not tools_registry.is_tool_enabled(TOOL, "always_on"):
+            errors.append("is_tool_enabled ha visto un file incompleto")
+
+
+@fork
+def test_concurrent_writers_lose_no_update_and_tear_no_read(tools_registry, tmp_path, monkeypatch):
+    monkeypatch.setenv("CCAT_ROOT", str(tmp_path))
+    path = tools_registry._compute_path()
+    tools_registry.update_tools_status(
+        lambda d: d["tools"].setdefault(TOOL, {}).setdefault("user_id_tool_status", {}).update(always_on=True)
+    )
+
+    stop, errors = threading.Event(), []
+    readers = [threading.Thread(target=_read_loop, args=(tools_registry, path, stop, errors)) for _ in range(2)]
+    for t in readers:
+        t.start()
+    # writer in processi separati (lock fcntl) e thread nello stesso processo (lock tra thread)
+    ctx = multiprocessing.get_context("fork")
+    procs = [ctx.Process(target=_increment, args=(tools_registry, w)) for w in range(WRITERS)]
+    threads = [threading.Thread(target=_increment, args=(tools_registry, w)) for w in range(WRITERS, WRITERS + 2)]
+    for p in procs:
+        p.start()
+    for t in threads:
+        t.start()
+    for p in procs:
+        p.join(timeout=60)
+    for t in threads:
+        t.join(timeout=60)
+    stop.set()
+    for t in readers:
+        t.join(timeout=10)
+
+    assert all(p.exitcode == 0 for p in procs)
+    assert errors == []
+    with open(path, "r", encoding="utf-8") as f:
+        counters = json.load(f)["counters"]
+    assert counters == {f"w{w}": INCREMENTS for w in range(WRITERS + 2)}
+    assert not [n for n in os.listdir(os.path.dirname(path)) if n.startswith(".tmp_")]
+
+
+def test_atomic_write_json_readers_see_whole_documents(tools_registry, tmp_path):
+    path = str(tmp_path / "state.json")
+    tools_registry.atomic_write_json(path, {"n": 0, "size": 0, "pad": ""})
+    stop, errors = threading.Event(), []
+
+    def writer(worker: int):
+        for i in range(60):
+            size = (i * 7919 + worker * 104729) % 50000
+            tools_registry.atomic_write_json(path, {"n": i, "size": size, "pad": "y" * size})
+
+    def reader():
+        while not stop.is_set():
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if len(data["pad"]) != data["size"]:
+                    errors.append("contenuto incoerente")
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+
+    readers = [threading.Thread(target=reader) for _ in range(3)]
+    writers = [threading.Thread(target=writer, args=(w,)) for w in range(3)]
+    for t in readers + writers:
+        t.start()
+    for t in writers:
+        t.join(timeout=60)
+    stop.set()
+    for t in readers:
+        t.join(timeout=10)
+    assert errors == []
+    assert os.listdir(tmp_path) == ["state.json"]
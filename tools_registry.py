@@ -0,0 +1,147 @@
+# tools_registry.py
+import os
+import json
+import threading
+import tempfile
+from typing import Any, Callable, Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows: nessun lock tra processi, restano le scritture atomiche
+    fcntl = None
+
+
+def _compute_path(create_dir: bool = True) -> str:
+    root_dir = os.environ.get("CCAT_ROOT", os.getcwd())
+    static_dir = os.path.join(root_dir, "cat", "static")
+    if create_dir:
+        os.makedirs(static_dir, exist_ok=True)
+    return os.path.join(static_dir, "tools_status.json")
+
+
+# Cache in memoria validata su (path, inode, mtime_ns, size): il file si rilegge solo se cambia
+_cache_lock = threading.Lock()
+_cache: Dict[str, Any] = {"key": None, "data": None}
+_stats = {"lookups": 0, "file_reads": 0}
+
+
+def _stat_key(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return (path, None)
+    return (path, st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _read_file(path: str) -> Dict[str, Any]:
+    _stats["file_reads"] += 1
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f) or {}
+            if not isinstance(data, dict):
+                data = {}
+    except FileNotFoundError:
+        data = {}
+    except Exception:
+        data = {}
+    data.setdefault("tools", {})
+    return data
+
+
+def load_tools_status() -> Dict[str, Any]:
+    """
+    Contenuto di tools_status.json, servito dalla cache finché il file non cambia.
+    Il dizionario restituito è condiviso: non modificarlo (usare update_tools_status).
+    """
+    path = _compute_path(create_dir=False)
+    key = _stat_key(path)
+    with _cache_lock:
+        _stats["lookups"] += 1
+        if key[1] is not None and _cache["key"] == key:
+            return _cache["data"]
+        data = _read_file(path)
+        # il file potrebbe essere cambiato durante la lettura: in quel caso non si memorizza
+        if key[1] is not None and _stat_key(path) == key:
+            _cache["key"], _cache["data"] = key, data
+        return data
+
+
+def is_tool_enabled(tool_key: str, user_id: str) -> bool:
+    """
+    Stato del tool per l'utente; fallback=False.
+    """
+    ts = load_tools_status()
+    return bool(
+        ts.get("tools", {})
+          .get(tool_key, {})
+          .get("user_id_tool_status", {})
+          .get(str(user_id or ""), False)
+    )
+
+
+def registry_stats() -> Dict[str, int]:
+    return dict(_stats)
+
+
+class _FileLock:
+    """
+    Lock esclusivo tra processi su <path>.lock (fcntl.flock), più un lock tra thread.
+    """
+    _thread_lock = threading.Lock()
+
+    def __init__(self, path: str):
+        self.lock_path = f"{path}.lock"
+        self._fh = None
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        if fcntl is not None:
+            self._fh = open(self.lock_path, "a+")
+            fcntl.flock(self._fh.fileno(), fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self._fh is not None:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+                self._fh.close()
+                self._fh = None
+        finally:
+            self._thread_lock.release()
+
+
+def atomic_write_json(path: str, data: Any, **dump_kwargs) -> None:
+    """
+    Scrive su file temporaneo nella stessa cartella e poi os.replace: i lettori vedono
+    sempre il vecchio o il nuovo contenuto, mai un file a metà.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".tmp_", suffix=".json", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, **dump_kwargs)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def update_tools_status(mutate: Callable[[Dict[str, Any]], None]) -> Dict[str, Any]:
+    """
+    Read-modify-write di tools_status.json sotto lock, con scrittura atomica.
+    'mutate' riceve una copia fresca letta dal disco e la modifica sul posto.
+    """
+    path = _compute_path()
+    with _FileLock(path):
+        data = _read_file(path)
+        mutate(data)
+        atomic_write_json(path, data, indent=4, ensure_ascii=False)
+        with _cache_lock:
+            _cache["key"], _cache["data"] = _stat_key(path), data
+    return data
@@ -0,0 +1,67 @@
+# workers/standard_analist_pdf_worker.py
+"""
+Worker di estrazione PDF per i processi del pool (spawn): modulo autonomo, importabile per nome
+senza il package del plugin (la cartella workers/ la aggiunge a sys.path l'initializer del pool).
+PyMuPDF viene importato solo alla prima estrazione.
+"""
+import re
+from typing import List, Tuple
+
+# Origine del testo di una pagina
+TEXT_LAYER = "text"
+OCR = "ocr"
+EMPTY = "empty"
+
+# Oltre questa quota di glifi "(cid:NN)" il layer di testo è inutilizzabile: meglio l'OCR
+_MAX_CID_RATIO = 0.2
+_CID = re.compile(r"\(cid:\d+\)")
+
+
+def page_count(path: str) -> int:
+    import pymupdf
+
+    with pymupdf.open(path) as doc:
+        return doc.page_count
+
+
+def _usable(raw: str, min_chars: int) -> bool:
+    if len(_CID.sub("", raw).strip()) < min_chars:
+        return False
+    cid_chars = raw.count("(cid:") * 8
+    return cid_chars <= _MAX_CID_RATIO * max(1, len(raw))
+
+
+def extract_pages(
+    path: str,
+    start: int,
+    end: int,
+    min_chars: int,
+    ocr: bool,
+    ocr_language: str,
+    ocr_dpi: int,
+) -> List[Tuple[int, str, str]]:
+    """
+    Testo grezzo delle pagine [start, end) con origine (text/ocr/empty); la pulizia la fa l'hook
+    del plugin. Le pagine senza layer di testo utilizzabile passano all'OCR di PyMuPDF (Tesseract);
+    se l'OCR non è disponibile resta il testo nativo, anche se scarso.
+    """
+    import pymupdf
+
+    out = []
+    with pymupdf.open(path) as doc:
+        for pno in range(start, end):
+            page = doc[pno]
+            raw = page.get_text("text")
+            source = TEXT_LAYER
+            if not _usable(raw, min_chars):
+                source = EMPTY if not _CID.sub("", raw).strip() else TEXT_LAYER
+                if ocr:
+                    try:
+                        textpage = page.get_textpage_ocr(language=ocr_language, dpi=ocr_dpi, full=True)
+                        ocr_text = page.get_text("text", textpage=textpage)
+                        if len(_CID.sub("", ocr_text).strip()) > len(_CID.sub("", raw).strip()):
+                            raw, source = ocr_text, OCR
+                    except Exception:
+                        pass  # Tesseract assente o pagina non rasterizzabile
+            out.append((pno, raw, source))
+    return out